@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Stock
+from .models import Alert, AnalysisJob, Stock, FundamentalSnapshot, PriceChunk, ScreenRule, Sparkline
 
 # Register your models here.
 
@@ -10,3 +10,51 @@ class StockAdmin(admin.ModelAdmin):
     search_fields = ['symbol', 'name', 'sector', 'industry']
     readonly_fields = ['last_updated']
 
+
+@admin.register(FundamentalSnapshot)
+class FundamentalSnapshotAdmin(admin.ModelAdmin):
+    list_display = ['symbol', 'date', 'values', 'recorded_at']
+    list_filter = ['date']
+    search_fields = ['symbol']
+    readonly_fields = ['recorded_at']
+
+
+@admin.register(PriceChunk)
+class PriceChunkAdmin(admin.ModelAdmin):
+    list_display = ['symbol', 'interval', 'start', 'end', 'rows', 'updated_at']
+    list_filter = ['interval']
+    search_fields = ['symbol']
+    exclude = ['data']
+    readonly_fields = ['updated_at']
+
+
+@admin.register(AnalysisJob)
+class AnalysisJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'kind', 'status', 'progress', 'worker', 'created_at', 'finished_at']
+    list_filter = ['kind', 'status']
+    search_fields = ['key']
+    readonly_fields = ['created_at', 'started_at', 'finished_at']
+
+
+@admin.register(ScreenRule)
+class ScreenRuleAdmin(admin.ModelAdmin):
+    list_display = ['name', 'expression', 'enabled', 'created_at']
+    list_filter = ['enabled']
+    search_fields = ['name', 'expression']
+    readonly_fields = ['created_at']
+
+
+@admin.register(Alert)
+class AlertAdmin(admin.ModelAdmin):
+    list_display = ['symbol', 'rule', 'triggered_at']
+    list_filter = ['triggered_at']
+    search_fields = ['symbol', 'rule__name']
+    readonly_fields = ['triggered_at']
+
+
+@admin.register(Sparkline)
+class SparklineAdmin(admin.ModelAdmin):
+    list_display = ['stock', 'change', 'updated_at']
+    search_fields = ['stock__symbol']
+    exclude = ['svg']
+    readonly_fields = ['updated_at']
@@ -0,0 +1,145 @@
+"""Alert engine: saved screen rules evaluated whenever prices refresh.
+
+Each stock gets a row of features (see ``rules.NUMERIC_FEATURES`` and
+``rules.TEXT_FEATURES``): fundamentals from the Stock table, and last close,
+daily change, RSI and moving averages from its stored daily bars. The rows
+are kept in the shared cache, so an evaluation only recomputes the symbols
+whose data changed since the previous one and evaluates every enabled rule
+over that slice as vectorized masks.
+
+``ScreenRule.matches`` holds the symbols currently matching a rule; an
+``Alert`` is recorded when a symbol starts matching, not again on every
+refresh while it still does.
+
+``refresh_prices`` evaluates the rules after downloading bars;
+``manage.py evaluate_alerts`` picks up any other change (run it every few
+minutes from cron).
+"""
+from collections import namedtuple
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import analytics, cache, queries
+from . import prices as price_store
+from .db import retry_on_lock
+from .models import Alert, PriceChunk, ScreenRule, Stock
+from .rules import Panel, RuleError, compile_rule
+
+STOCK_FEATURES = (
+    'market_cap',
+    'pe_ratio',
+    'dividend_yield',
+    'fifty_two_week_high',
+    'fifty_two_week_low',
+    'volume',
+    'max_drawdown',
+    'max_drawdown_duration',
+    'cvar_95',
+    'ulcer_index',
+    'omega_ratio',
+    'sector',
+    'industry',
+)
+BARS_PERIOD = '1y'
+
+Evaluation = namedtuple('Evaluation', 'symbols rules alerts')
+
+
+def compute_features(symbols):
+    """Feature rows of the given stocks, keyed by symbol (symbols not in the Stock table are skipped)"""
+    stocks = Stock.objects.filter(symbol__in=list(symbols)).values('symbol', 'current_price', *STOCK_FEATURES)
+    features = {}
+    for stock in stocks:
+        row = {field: stock[field] for field in STOCK_FEATURES}
+        row['price'] = stock['current_price']
+        bars = price_store.load_bars(stock['symbol'], '1d', period=BARS_PERIOD)
+        if bars is not None:
+            row.update(analytics.latest_indicators(bars['Close'].to_numpy(dtype=float)))
+        features[stock['symbol']] = row
+    return features
+
+
+def changed_symbols(since):
+    """Symbols whose fundamentals or price bars were written since a time"""
+    stocks = Stock.objects.filter(last_updated__gte=since).values_list('symbol', flat=True)
+    bars = PriceChunk.objects.filter(updated_at__gte=since).values_list('symbol', flat=True).distinct()
+    return set(stocks) | set(bars)
+
+
+def _load_features():
+    """Cached feature rows of the whole universe, rebuilding those that are missing"""
+    universe = queries.universe_symbols()
+    features = cache.get('alerts', 'features') or {}
+    missing = [symbol for symbol in universe if symbol not in features]
+    if missing:
+        features.update(compute_features(missing))
+    return {symbol: features[symbol] for symbol in universe if symbol in features}, missing
+
+
+def _apply(rules, features, symbols):
+    """Evaluate rules over some symbols; returns the new, unsaved alerts"""
+    panel = Panel(symbols, [features[symbol] for symbol in symbols])
+    evaluated = set(symbols)
+    alerts = []
+    changed = []
+    for rule in rules:
+        try:
+            compiled = compile_rule(rule.expression)
+        except RuleError:
+            continue
+        matched = set(compiled.matches(panel))
+        previous = set(rule.matches)
+        for symbol in sorted(matched - previous):
+            values = {field: features[symbol].get(field) for field in sorted(compiled.fields)}
+            alerts.append(Alert(rule=rule, symbol=symbol, values=values))
+        current = (previous - evaluated) | matched
+        if current != previous:
+            rule.matches = sorted(current)
+            changed.append(rule)
+
+    _save(changed, alerts)
+    return alerts
+
+
+@retry_on_lock
+def _save(rules, alerts):
+    with transaction.atomic():
+        ScreenRule.objects.bulk_update(rules, ['matches'], batch_size=500)
+        Alert.objects.bulk_create(alerts, batch_size=500)
+
+
+def evaluate(symbols=None):
+    """Re-evaluate every enabled rule for the stocks whose data changed
+
+    ``symbols=None`` evaluates whatever changed since the previous call
+    (everything the first time, or when the cached features were lost);
+    otherwise only the given symbols are refreshed and evaluated.
+    """
+    started = timezone.now()
+    since = cache.get('alerts', 'evaluated_at')
+    features, missing = _load_features()
+    if symbols is None and since is None:
+        features.update(compute_features([s for s in features if s not in missing]))
+        targets = list(features)
+    else:
+        changed = changed_symbols(since) if symbols is None else {symbol.upper() for symbol in symbols}
+        fresh = compute_features([s for s in features if s in changed and s not in missing])
+        features.update(fresh)
+        targets = sorted(set(fresh) | {s for s in missing if s in features})
+
+    rules = list(ScreenRule.objects.filter(enabled=True).only('id', 'name', 'expression', 'matches'))
+    alerts = _apply(rules, features, targets) if targets and rules else []
+    cache.set('alerts', 'features', features, timeout=None)
+    if symbols is None:
+        cache.set('alerts', 'evaluated_at', started, timeout=None)
+    return Evaluation(len(targets), len(rules), alerts)
+
+
+def evaluate_rule(rule):
+    """Evaluate one (new or re-enabled) rule over the whole universe"""
+    features, missing = _load_features()
+    if missing:
+        cache.set('alerts', 'features', features, timeout=None)
+    alerts = _apply([rule], features, list(features))
+    return Evaluation(len(features), 1, alerts)
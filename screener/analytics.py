@@ -0,0 +1,411 @@
+"""Analytics kernels for the analysis page.
+
+These functions take plain NumPy arrays and return plain Python values so
+they can run in the request thread or in a worker process of
+``screener.compute`` (they import no Django code).
+"""
+from . import risk
+from .lazy import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+RISK_FREE_RATE = 0.04
+
+
+def _value(x):
+    return None if x is None or np.isnan(x) else float(x)
+
+
+def clean_series(series):
+    """Series to a JSON-friendly list: NaN becomes None, values rounded to 2 decimals"""
+    return [None if np.isnan(x) else round(x, 2) for x in np.asarray(series, dtype=float).tolist()]
+
+
+def price_metrics(closes, bars_per_year, risk_free_rate=RISK_FREE_RATE):
+    """Performance and risk metrics of a close price array
+
+    Drawdowns start at the second close, as in ``risk.profile``: the first
+    close is only the base of the first return.
+    """
+    closes = pd.Series(np.asarray(closes, dtype=float))
+    returns = closes.pct_change().dropna()
+
+    # Drawdown
+    cumulative = (1 + returns).cumprod()
+    running_max = cumulative.cummax()
+    drawdown = ((cumulative - running_max) / running_max * 100).tolist()
+    max_drawdown = min(drawdown) if drawdown else 0
+    current_drawdown = drawdown[-1] if drawdown else 0
+
+    # Performance
+    total_return = ((closes.iloc[-1] / closes.iloc[0]) - 1) * 100
+    bar_count = len(returns)
+    annualized_return = ((1 + total_return/100) ** (bars_per_year/bar_count) - 1) * 100 if bar_count > 0 else 0
+
+    # Risk
+    volatility = returns.std() * np.sqrt(bars_per_year) * 100
+    excess_return = annualized_return/100 - risk_free_rate
+    sharpe_ratio = excess_return / (volatility/100) if volatility > 0 else 0
+
+    negative_returns = returns[returns < 0]
+    downside_std = negative_returns.std() * np.sqrt(bars_per_year)
+    sortino_ratio = excess_return / downside_std if downside_std > 0 else 0
+
+    var_95 = np.percentile(returns, 5) * 100
+    calmar_ratio = abs(annualized_return / max_drawdown) if max_drawdown != 0 else None
+
+    return {
+        'drawdown': drawdown,
+        'max_drawdown': float(max_drawdown),
+        'current_drawdown': float(current_drawdown),
+        'total_return': float(total_return),
+        'annualized_return': float(annualized_return),
+        'volatility': float(volatility),
+        'sharpe_ratio': float(sharpe_ratio),
+        'sortino_ratio': float(sortino_ratio),
+        'var_95': float(var_95),
+        'calmar_ratio': _value(calmar_ratio),
+    }
+
+
+def technical_indicators(closes):
+    """Moving averages, RSI (14) and MACD (12, 26, 9), as last values and chart series"""
+    closes = pd.Series(np.asarray(closes, dtype=float))
+
+    # Moving Averages
+    sma_20_series = closes.rolling(window=20).mean()
+    sma_50_series = closes.rolling(window=50).mean()
+    sma_200_series = closes.rolling(window=200).mean()
+
+    # RSI
+    delta = closes.diff()
+    gain = delta.where(delta > 0, 0).rolling(window=14).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
+    rs = gain / loss
+    rsi = 100 - (100 / (1 + rs))
+
+    # MACD
+    ema_12 = closes.ewm(span=12, adjust=False).mean()
+    ema_26 = closes.ewm(span=26, adjust=False).mean()
+    macd_line = ema_12 - ema_26
+    signal_line = macd_line.ewm(span=9, adjust=False).mean()
+    macd_histogram = macd_line - signal_line
+
+    return {
+        'current_close': float(closes.iloc[-1]),
+        'sma_20': _value(sma_20_series.iloc[-1]) if len(closes) >= 20 else None,
+        'sma_50': _value(sma_50_series.iloc[-1]) if len(closes) >= 50 else None,
+        'sma_200': _value(sma_200_series.iloc[-1]) if len(closes) >= 200 else None,
+        'rsi_value': _value(rsi.iloc[-1]) if len(rsi) >= 14 else None,
+        'macd_value': _value(macd_line.iloc[-1]) if len(macd_line) >= 26 else None,
+        'macd_signal': _value(signal_line.iloc[-1]) if len(signal_line) >= 26 else None,
+        'macd_hist_value': _value(macd_histogram.iloc[-1]) if len(macd_histogram) >= 26 else None,
+        'sma_20_series': clean_series(sma_20_series),
+        'sma_50_series': clean_series(sma_50_series),
+        'sma_200_series': clean_series(sma_200_series),
+        'rsi_series': clean_series(rsi),
+        'macd_line_series': clean_series(macd_line),
+        'signal_line_series': clean_series(signal_line),
+        'macd_histogram_series': clean_series(macd_histogram),
+    }
+
+
+def latest_indicators(closes):
+    """Last close, daily change (%), RSI (14) and moving averages, as in ``technical_indicators``
+
+    Only the last values are computed, so the alert engine can refresh a
+    symbol without building the chart series.
+    """
+    closes = np.asarray(closes, dtype=float)
+    if not len(closes):
+        return {}
+    delta = np.diff(closes, prepend=np.nan)
+    gain = np.where(delta > 0, delta, 0)[-14:].mean()
+    loss = np.where(delta < 0, -delta, 0)[-14:].mean()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = 100 - 100 / (1 + gain / loss)
+    return {
+        'price': float(closes[-1]),
+        'change': _value((closes[-1] / closes[-2] - 1) * 100) if len(closes) >= 2 else None,
+        'rsi': _value(rsi) if len(closes) >= 14 else None,
+        'sma_20': float(closes[-20:].mean()) if len(closes) >= 20 else None,
+        'sma_50': float(closes[-50:].mean()) if len(closes) >= 50 else None,
+        'sma_200': float(closes[-200:].mean()) if len(closes) >= 200 else None,
+    }
+
+
+def analyze_prices(closes, bars_per_year, risk_free_rate=RISK_FREE_RATE):
+    """All price-based metrics of the analysis page in one call"""
+    return {
+        **price_metrics(closes, bars_per_year, risk_free_rate),
+        **technical_indicators(closes),
+        'risk': risk.profile(closes),
+    }
+
+
+def returns_panel(returns_by_symbol):
+    """Align return series on their dates: (symbols, 2-D array with NaN for gaps)"""
+    panel = pd.concat(returns_by_symbol, axis=1, sort=True)
+    return list(panel.columns), panel.to_numpy(dtype=float)
+
+
+def correlation_matrix(returns, symbols, min_periods=11):
+    """Pairwise correlations of aligned return columns, over their common dates
+
+    Pairs with fewer than ``min_periods`` common observations are None.
+    """
+    corr = pd.DataFrame(np.asarray(returns, dtype=float), columns=symbols).corr(min_periods=min_periods)
+    values = corr.to_numpy()
+    return {
+        sym1: {
+            sym2: None if np.isnan(values[i, j]) else round(float(values[i, j]), 2)
+            for j, sym2 in enumerate(symbols)
+        }
+        for i, sym1 in enumerate(symbols)
+    }
+
+
+def portfolio_backtest(returns, weights, bars_per_year, risk_free_rate=RISK_FREE_RATE):
+    """Rebalanced-every-bar portfolio of aligned return columns: metrics and equity curve
+
+    A missing bar (NaN) counts as a flat return for that asset. Weights must
+    be positive; they are normalised to sum to 1.
+    """
+    returns = np.nan_to_num(np.asarray(returns, dtype=float))
+    weights = np.asarray(weights, dtype=float)
+    if not (weights > 0).all():
+        raise ValueError('weights must be positive')
+    weights = weights / weights.sum()
+    equity = np.concatenate([[100.0], 100 * np.cumprod(1 + returns @ weights)])
+    metrics = price_metrics(equity, bars_per_year, risk_free_rate)
+    metrics['drawdown'] = clean_series(metrics['drawdown'])
+    metrics['equity'] = clean_series(equity)
+    return metrics
+
+
+def compare_panel(closes, benchmark, bars_per_year, risk_free_rate=RISK_FREE_RATE):
+    """``price_metrics``, beta and last indicators of every column of a close panel at once
+
+    ``closes`` is a 2-D array (bars x symbols) aligned with the ``benchmark``
+    close array; NaN marks a missing bar (before a listing, or a gap, where
+    the previous close carries over). Scalars come back as one array per
+    metric (NaN when undefined) and series as 2-D arrays: ``normalized``
+    (performance since the first close, in percent), ``drawdown`` and
+    ``returns``.
+    A gapless column gets the values ``analyze_prices`` gives it alone.
+    """
+    closes = pd.DataFrame(np.asarray(closes, dtype=float))
+    benchmark = pd.Series(np.asarray(benchmark, dtype=float))
+    filled = closes.ffill()
+    returns = (filled / filled.shift() - 1).where(closes.notna())
+    first = filled.bfill().iloc[0].to_numpy()
+    count = returns.count().to_numpy()
+
+    # Drawdown of the closes from the second bar on, as in price_metrics
+    levels = filled.where(returns.notna())
+    drawdown = (levels / levels.cummax() - 1) * 100
+    max_drawdown = drawdown.min().fillna(0).to_numpy()
+    current_drawdown = drawdown.ffill().iloc[-1].fillna(0).to_numpy()
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        total_return = (filled.iloc[-1].to_numpy() / first - 1) * 100
+        annualized_return = np.where(
+            count > 0, ((1 + total_return / 100) ** (bars_per_year / np.maximum(count, 1)) - 1) * 100, 0
+        )
+        volatility = returns.std().to_numpy() * np.sqrt(bars_per_year) * 100
+        excess_return = annualized_return / 100 - risk_free_rate
+        sharpe_ratio = np.where(volatility > 0, excess_return / (volatility / 100), 0)
+        downside_std = returns.where(returns < 0).std().to_numpy() * np.sqrt(bars_per_year)
+        sortino_ratio = np.where(downside_std > 0, excess_return / downside_std, 0)
+        calmar_ratio = np.where(max_drawdown != 0, np.abs(annualized_return / max_drawdown), np.nan)
+
+        # Beta and correlation over the bars where both have a return
+        benchmark_returns = benchmark.ffill()
+        benchmark_returns = (benchmark_returns / benchmark_returns.shift() - 1).where(benchmark.notna())
+        x = returns.to_numpy()
+        y = np.broadcast_to(benchmark_returns.to_numpy()[:, None], x.shape)
+        valid = ~(np.isnan(x) | np.isnan(y))
+        n = valid.sum(axis=0)
+        x, y = np.where(valid, x, 0), np.where(valid, y, 0)
+        cov = ((x * y).sum(axis=0) - x.sum(axis=0) * y.sum(axis=0) / n) / (n - 1)
+        var_x = ((x * x).sum(axis=0) - x.sum(axis=0) ** 2 / n) / (n - 1)
+        var_y = ((y * y).sum(axis=0) - y.sum(axis=0) ** 2 / n) / (n - 1)
+        enough = n > 10
+        beta = np.where(enough & (var_y > 0), cov / var_y, np.nan)
+        correlation = np.where(enough & (var_x > 0) & (var_y > 0), cov / np.sqrt(var_x * var_y), np.nan)
+
+        benchmark_filled = benchmark.ffill()
+        benchmark_first = benchmark_filled.bfill().iloc[0]
+        benchmark_normalized = (benchmark_filled / benchmark_first - 1) * 100
+
+    # Indicators on the carried-over closes, as in technical_indicators
+    delta = filled.diff()
+    gain = delta.where(delta > 0, 0).rolling(window=14).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
+    rsi = 100 - (100 / (1 + gain / loss))
+    macd_line = filled.ewm(span=12, adjust=False).mean() - filled.ewm(span=26, adjust=False).mean()
+    signal_line = macd_line.ewm(span=9, adjust=False).mean()
+    bars = closes.count().to_numpy()
+
+    return {
+        'total_return': total_return,
+        'annualized_return': annualized_return,
+        'volatility': volatility,
+        'sharpe_ratio': sharpe_ratio,
+        'sortino_ratio': sortino_ratio,
+        'calmar_ratio': calmar_ratio,
+        'max_drawdown': max_drawdown,
+        'current_drawdown': current_drawdown,
+        'var_95': returns.quantile(0.05).to_numpy() * 100,
+        'beta': beta,
+        'correlation': np.clip(correlation, -1, 1),
+        'current_close': filled.iloc[-1].to_numpy(),
+        'sma_20': filled.rolling(window=20).mean().iloc[-1].to_numpy(),
+        'sma_50': filled.rolling(window=50).mean().iloc[-1].to_numpy(),
+        'sma_200': filled.rolling(window=200).mean().iloc[-1].to_numpy(),
+        'rsi_value': rsi.iloc[-1].to_numpy(),
+        'macd_value': np.where(bars >= 26, macd_line.iloc[-1].to_numpy(), np.nan),
+        'macd_signal': np.where(bars >= 26, signal_line.iloc[-1].to_numpy(), np.nan),
+        'benchmark_return': float(benchmark_normalized.iloc[-1]),
+        'normalized': ((filled / first - 1) * 100).to_numpy(),
+        'drawdown': drawdown.to_numpy(),
+        'benchmark_normalized': benchmark_normalized.to_numpy(),
+        'returns': returns.to_numpy(),
+    }
+
+
+def _window_sums(values, window):
+    """Trailing ``window``-row sums of every column in O(n), via a prefix sum"""
+    prefix = np.concatenate([np.zeros((1,) + values.shape[1:]), np.cumsum(values, axis=0)])
+    start = np.maximum(np.arange(1, len(values) + 1) - window, 0)
+    return prefix[1:] - prefix[start]
+
+
+def rolling_statistics(returns, benchmark, window, bars_per_year, min_periods=None,
+                       risk_free_rate=RISK_FREE_RATE):
+    """Rolling beta, correlation, volatility and Sharpe ratio of return columns
+
+    ``returns`` is a 2-D array (bars x symbols) aligned with the ``benchmark``
+    return array; NaN marks a missing bar. Every statistic comes from window
+    sums of x, y, x², y² and xy, so the cost is O(bars x symbols) whatever the
+    window. A window with fewer than ``min_periods`` (default: ``window``)
+    bars where both the symbol and the benchmark have a return is NaN.
+    Volatility is annualized in percent; the Sharpe ratio uses the
+    annualized mean return.
+    """
+    x = np.asarray(returns, dtype=float)
+    y = np.broadcast_to(np.asarray(benchmark, dtype=float)[:, None], x.shape)
+    valid = ~(np.isnan(x) | np.isnan(y))
+    count = np.maximum(valid.sum(axis=0), 1)
+    # Centre each column first: the statistics are shift-invariant and the
+    # running sums of squares then lose far less precision
+    shift = np.where(valid, x, 0).sum(axis=0) / count
+    x = np.where(valid, x - shift, 0.0)
+    y = np.where(valid, y - np.where(valid, y, 0).sum(axis=0) / count, 0.0)
+
+    n = _window_sums(valid.astype(float), window)
+    sx, sy = _window_sums(x, window), _window_sums(y, window)
+    sxx, syy, sxy = _window_sums(x * x, window), _window_sums(y * y, window), _window_sums(x * y, window)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        enough = n >= max(min_periods or window, 2)
+        var_x = np.maximum(sxx - sx * sx / n, 0) / (n - 1)
+        var_y = np.maximum(syy - sy * sy / n, 0) / (n - 1)
+        cov = (sxy - sx * sy / n) / (n - 1)
+        mean_x = sx / n + shift
+
+        beta = np.where(enough & (var_y > 0), cov / var_y, np.nan)
+        correlation = np.where(enough & (var_x > 0) & (var_y > 0), cov / np.sqrt(var_x * var_y), np.nan)
+        volatility = np.where(enough, np.sqrt(var_x * bars_per_year), np.nan)
+        sharpe = np.where(enough & (volatility > 0), (mean_x * bars_per_year - risk_free_rate) / volatility, np.nan)
+
+    return {
+        'beta': beta,
+        'correlation': np.clip(correlation, -1, 1),
+        'volatility': volatility * 100,
+        'sharpe': sharpe,
+    }
+
+
+def unit_vectors(returns, min_observations):
+    """Centred, unit-length return columns, so a dot product is a correlation
+
+    Missing bars count as the column mean and add nothing, which slightly
+    shrinks correlations over gaps. Columns with fewer than
+    ``min_observations`` returns or no variance are dropped. Returns the
+    mask of kept columns and a (kept x bars) float32 array.
+    """
+    x = np.asarray(returns, dtype=float)
+    valid = ~np.isnan(x)
+    count = valid.sum(axis=0)
+    centred = np.where(valid, x - np.where(valid, x, 0).sum(axis=0) / np.maximum(count, 1), 0.0)
+    norm = np.sqrt((centred * centred).sum(axis=0))
+    keep = (count >= min_observations) & (norm > 0)
+    vectors = (centred[:, keep] / norm[keep]).T
+    return keep, np.ascontiguousarray(vectors, dtype=np.float32)
+
+
+def top_k(vectors, row, k):
+    """The k rows most and least similar to ``row`` (itself excluded)
+
+    One matrix-vector product and two partial sorts: returns
+    ``(most, most_scores), (least, least_scores)`` ordered by score.
+    """
+    scores = vectors @ vectors[row]
+    k = min(k, len(scores) - 1)
+    if k < 1:
+        empty = np.empty(0, dtype=int)
+        return (empty, scores[empty]), (empty, scores[empty])
+
+    highest = scores.copy()
+    highest[row] = -np.inf
+    most = np.argpartition(-highest, k - 1)[:k]
+    most = most[np.argsort(-highest[most])]
+
+    lowest = scores.copy()
+    lowest[row] = np.inf
+    least = np.argpartition(lowest, k - 1)[:k]
+    least = least[np.argsort(lowest[least])]
+    return (most, scores[most]), (least, scores[least])
+
+
+def spherical_kmeans(vectors, k, iterations=50, seed=0):
+    """Cluster unit vectors by cosine similarity (return correlation)
+
+    k-means++ seeding, then Lloyd iterations with normalized centroids.
+    Returns one label per row; labels are numbered by decreasing cluster size.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    n = len(vectors)
+    k = min(k, n)
+    if k < 1:
+        return np.empty(0, dtype=int)
+    rng = np.random.default_rng(seed)
+
+    centres = np.empty((k, vectors.shape[1]), dtype=np.float32)
+    centres[0] = vectors[rng.integers(n)]
+    distance = 1 - vectors @ centres[0]
+    for j in range(1, k):
+        weights = np.maximum(distance, 0)
+        total = weights.sum()
+        centres[j] = vectors[rng.choice(n, p=weights / total) if total > 0 else rng.integers(n)]
+        distance = np.minimum(distance, 1 - vectors @ centres[j])
+
+    labels = np.full(n, -1)
+    for _ in range(iterations):
+        assigned = np.argmax(vectors @ centres.T, axis=1)
+        if np.array_equal(assigned, labels):
+            break
+        labels = assigned
+        sums = np.zeros_like(centres)
+        np.add.at(sums, labels, vectors)
+        norms = np.linalg.norm(sums, axis=1)
+        # An emptied cluster keeps its previous centre
+        filled = norms > 0
+        centres[filled] = sums[filled] / norms[filled, None]
+
+    sizes = np.bincount(labels, minlength=k)
+    rank = np.empty(k, dtype=int)
+    rank[np.argsort(-sizes, kind='stable')] = np.arange(k)
+    return rank[labels]
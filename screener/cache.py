@@ -0,0 +1,204 @@
+"""Shared market-data cache.
+
+Wraps the default Django cache (shared between worker processes, see
+``CACHES`` in settings) with:
+
+- namespaced, versioned keys: bump ``NAMESPACE_VERSIONS`` when the formula
+  behind a namespace changes and every old entry is ignored;
+- transparent compression of large payloads (lz4 when installed, else zlib);
+- per-namespace hit/miss counters, kept per process and added to counters
+  in the shared ``state`` cache in batches, so the hit rate covers every
+  worker without a shared write per read;
+- optional long-lived stale copies that ``screener.provider`` falls back to
+  while Yahoo Finance is unavailable.
+"""
+import pickle
+import threading
+import time
+import zlib
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.utils.connection import ConnectionProxy
+
+try:
+    import lz4.frame as lz4
+except ImportError:  # lz4 is optional
+    lz4 = None
+
+# Bump a version to invalidate everything cached under that namespace
+NAMESPACE_VERSIONS = {
+    'history': 1,
+    'info': 1,
+    'calendar': 1,
+    'news': 1,
+    'analysis': 2,
+    'similarity': 1,
+    'alerts': 1,
+    'pages': 1,
+}
+
+_RAW, _ZLIB, _LZ4 = b'R', b'Z', b'L'
+_MISSING = object()
+
+# Cache alias for small shared state that must never be culled with market
+# data: data versions, circuit breakers and counters (see CACHES in settings)
+state = ConnectionProxy(caches, 'state')
+
+# Counters for this process only; the shared ones live in the state cache
+local_stats = Counter()
+
+# Hit/miss counts are added to the shared counters every FLUSH_EVERY counts
+# or FLUSH_SECONDS, whichever comes first
+FLUSH_EVERY = 100
+FLUSH_SECONDS = 10
+_pending = Counter()
+_pending_lock = threading.Lock()
+_last_flush = time.monotonic()
+
+
+def _key(namespace, key):
+    return f'md:{namespace}:{key}'
+
+
+def _stale_key(namespace, key):
+    return f'md-stale:{namespace}:{key}'
+
+
+def _version(namespace):
+    return NAMESPACE_VERSIONS.get(namespace, 1)
+
+
+def _dumps(value):
+    payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+    if len(payload) < settings.SCREENER_CACHE_COMPRESS_MIN_BYTES:
+        return _RAW + payload
+    if lz4 is not None:
+        return _LZ4 + lz4.compress(payload)
+    return _ZLIB + zlib.compress(payload, 6)
+
+
+def _loads(blob):
+    kind, payload = blob[:1], blob[1:]
+    if kind == _LZ4:
+        payload = lz4.decompress(payload)
+    elif kind == _ZLIB:
+        payload = zlib.decompress(payload)
+    return pickle.loads(payload)
+
+
+def incr_counter(key, delta=1):
+    """Add to a counter shared by all workers through the state cache
+
+    Atomic on redis and locmem. The file and db backends read, modify and
+    write, so concurrent increments from several processes can be lost.
+    """
+    try:
+        if not state.add(key, delta, timeout=None):
+            state.incr(key, delta)
+    except ValueError:
+        # The counter was deleted between add() and incr()
+        state.set(key, delta, timeout=None)
+
+
+def flush_stats():
+    """Add this process's pending hit/miss counts to the shared counters"""
+    global _last_flush
+    with _pending_lock:
+        pending = dict(_pending)
+        _pending.clear()
+        _last_flush = time.monotonic()
+    for name, count in pending.items():
+        incr_counter(f'md-stats:{name}', count)
+
+
+def _count(namespace, outcome):
+    name = f'{namespace}:{outcome}'
+    with _pending_lock:
+        local_stats[name] += 1
+        _pending[name] += 1
+        due = sum(_pending.values()) >= FLUSH_EVERY or time.monotonic() - _last_flush >= FLUSH_SECONDS
+    if due:
+        flush_stats()
+
+
+def get(namespace, key, default=None):
+    """Return a cached value, or ``default`` on a miss"""
+    blob = cache.get(_key(namespace, key), _MISSING, version=_version(namespace))
+    if blob is _MISSING:
+        _count(namespace, 'misses')
+        return default
+    _count(namespace, 'hits')
+    return _loads(blob)
+
+
+def set(namespace, key, value, timeout=None, stale_timeout=None):
+    """Store a value; ``timeout`` defaults to the cache's TIMEOUT
+
+    With ``stale_timeout`` a second copy is kept that long for ``get_stale``.
+    """
+    blob = _dumps(value)
+    kwargs = {} if timeout is None else {'timeout': timeout}
+    cache.set(_key(namespace, key), blob, version=_version(namespace), **kwargs)
+    if stale_timeout:
+        cache.set(_stale_key(namespace, key), blob, version=_version(namespace), timeout=stale_timeout)
+
+
+def get_stale(namespace, key, default=None):
+    """Last value stored with a ``stale_timeout``, even if it has expired"""
+    blob = cache.get(_stale_key(namespace, key), _MISSING, version=_version(namespace))
+    return default if blob is _MISSING else _loads(blob)
+
+
+def delete(namespace, key):
+    cache.delete_many([_key(namespace, key), _stale_key(namespace, key)], version=_version(namespace))
+
+
+def get_or_set(namespace, key, compute, timeout=None):
+    """Return the cached value or compute, store and return it
+
+    ``None`` results are not cached so failed fetches are retried.
+    """
+    value = get(namespace, key, _MISSING)
+    if value is _MISSING:
+        value = compute()
+        if value is not None:
+            set(namespace, key, value, timeout)
+    return value
+
+
+def stats():
+    """Return {namespace: {'hits', 'misses', 'hit_rate'}} across all workers
+
+    Counts other workers have not flushed yet (at most ``FLUSH_SECONDS`` old)
+    are not included.
+    """
+    flush_stats()
+    counters = state.get_many([
+        f'md-stats:{namespace}:{outcome}' for namespace in NAMESPACE_VERSIONS for outcome in ('hits', 'misses')
+    ])
+    result = {}
+    for namespace in NAMESPACE_VERSIONS:
+        hits = counters.get(f'md-stats:{namespace}:hits', 0)
+        misses = counters.get(f'md-stats:{namespace}:misses', 0)
+        total = hits + misses
+        result[namespace] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / total if total else None,
+        }
+    return result
+
+
+def reset_stats():
+    global _last_flush
+    with _pending_lock:
+        _pending.clear()
+        local_stats.clear()
+        _last_flush = time.monotonic()
+    state.delete_many([
+        f'md-stats:{namespace}:{outcome}'
+        for namespace in NAMESPACE_VERSIONS
+        for outcome in ('hits', 'misses')
+    ])
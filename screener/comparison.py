@@ -0,0 +1,107 @@
+"""Side-by-side comparison of a few stocks against one benchmark.
+
+The closes of every symbol are aligned on one timeline, with the benchmark
+fetched once, and handed as a single panel to ``analytics.compare_panel``
+on the compute executor: returns, drawdowns, risk ratios, indicators and
+normalized performance of all the symbols come from one vectorized pass
+instead of one analysis page per symbol.
+"""
+from . import analytics, compute
+from . import prices as price_store
+from .lazy import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+MIN_SYMBOLS = 2
+MAX_SYMBOLS = 20
+BENCHMARKS = {'^GSPC': 'S&P 500', '^IXIC': 'NASDAQ'}
+DEFAULT_BENCHMARK = '^GSPC'
+
+METRICS = (
+    'total_return',
+    'annualized_return',
+    'volatility',
+    'sharpe_ratio',
+    'sortino_ratio',
+    'calmar_ratio',
+    'max_drawdown',
+    'current_drawdown',
+    'var_95',
+    'beta',
+    'correlation',
+    'current_close',
+    'sma_20',
+    'sma_50',
+    'sma_200',
+    'rsi_value',
+    'macd_value',
+    'macd_signal',
+)
+
+
+def _closes(symbol, period, interval):
+    try:
+        hist = price_store.get_history(symbol, period, interval)
+    except Exception:
+        return None
+    if hist is None or hist.empty:
+        return None
+    return hist['Close']
+
+
+def compare(symbols, period='1y', interval='1d', benchmark=DEFAULT_BENCHMARK):
+    """Metrics and chart series of some symbols against a benchmark
+
+    Returns ``{'symbols': [...], 'missing': [symbols without history],
+    'dates': [...], 'rows': [{'symbol': ..., metric: value}],
+    'normalized': {symbol: [...]}, 'drawdown': {symbol: [...]},
+    'correlation': {symbol: {symbol: value}}, 'benchmark': {...}}``. The
+    benchmark's ``return`` and series are None when it has no history.
+    """
+    closes = {}
+    missing = []
+    for symbol in symbols:
+        series = _closes(symbol, period, interval)
+        if series is None:
+            missing.append(symbol)
+        else:
+            closes[symbol] = series
+
+    result = {
+        'symbols': list(closes),
+        'missing': missing,
+        'dates': [],
+        'rows': [],
+        'normalized': {},
+        'drawdown': {},
+        'correlation': {},
+        'benchmark': {'symbol': benchmark, 'name': BENCHMARKS.get(benchmark, benchmark), 'return': None, 'normalized': []},
+    }
+    if not closes:
+        return result
+
+    panel = pd.concat(closes, axis=1, sort=True)
+    benchmark_closes = _closes(benchmark, period, interval)
+    if benchmark_closes is None:
+        benchmark_closes = pd.Series(np.nan, index=panel.index)
+    metrics = compute.run(
+        analytics.compare_panel,
+        panel.to_numpy(dtype=float), benchmark_closes.reindex(panel.index).to_numpy(dtype=float),
+        args=(price_store.periods_per_year(interval),),
+    )
+
+    date_format = '%Y-%m-%d %H:%M' if price_store.is_intraday(interval) else '%Y-%m-%d'
+    result['dates'] = [d.strftime(date_format) for d in panel.index]
+    for column, symbol in enumerate(result['symbols']):
+        result['rows'].append({
+            'symbol': symbol,
+            **{name: None if np.isnan(metrics[name][column]) else float(metrics[name][column]) for name in METRICS},
+        })
+        result['normalized'][symbol] = analytics.clean_series(metrics['normalized'][:, column])
+        result['drawdown'][symbol] = analytics.clean_series(metrics['drawdown'][:, column])
+    result['correlation'] = analytics.correlation_matrix(metrics['returns'], result['symbols'])
+    if not np.isnan(metrics['benchmark_return']):
+        result['benchmark']['return'] = metrics['benchmark_return']
+        result['benchmark']['normalized'] = analytics.clean_series(metrics['benchmark_normalized'])
+    return result
@@ -0,0 +1,169 @@
+"""Compute executor for heavy analytics.
+
+Analytics kernels (see ``screener.analytics``) are submitted to a process
+pool so pandas/NumPy work does not hold the GIL of web worker threads.
+Price arrays are handed over through shared memory instead of being pickled,
+and callers stop waiting for a task after a timeout.
+
+Cancelling only stops tasks that have not started: a process pool cannot
+interrupt a running task without killing the worker and breaking every
+other task in the pool. A running task that timed out or was cancelled
+keeps its worker (and its shared arrays) until it finishes, and its result
+is dropped. Kernels should therefore be bounded by their input size.
+
+``SCREENER_COMPUTE_WORKERS = 0`` (the default) runs tasks inline in the
+calling thread with the same API.
+"""
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from multiprocessing.shared_memory import SharedMemory
+
+from django.conf import settings
+
+from .lazy import lazy_import
+
+np = lazy_import('numpy')
+
+
+class ComputeTimeout(Exception):
+    """An analytics task did not finish in time; its result will be dropped"""
+
+
+class SharedArray:
+    """A NumPy array copied into a named shared memory block"""
+
+    def __init__(self, array):
+        array = np.ascontiguousarray(array)
+        self._shm = SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=self._shm.buf)[...] = array
+        self.spec = (self._shm.name, array.shape, array.dtype.str)
+
+    def release(self):
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+
+def _run_shared(fn, specs, args, kwargs):
+    """Worker entry point: attach the shared arrays and run the kernel"""
+    # Spawned workers share the parent's resource tracker, which unlinks the
+    # blocks once the parent releases them
+    blocks = [SharedMemory(name=name) for name, shape, dtype in specs]
+    try:
+        arrays = [
+            np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+            for shm, (name, shape, dtype) in zip(blocks, specs)
+        ]
+        result = fn(*arrays, *args, **kwargs)
+        del arrays
+        return result
+    finally:
+        for shm in blocks:
+            try:
+                shm.close()
+            except BufferError:
+                # The kernel kept a view on the block; it goes away with the process
+                pass
+
+
+class ComputeTask:
+    """Handle on a submitted task: wait for its result or cancel it"""
+
+    def __init__(self, future, shared=()):
+        self.future = future
+        self._shared = list(shared)
+        future.add_done_callback(lambda f: self._release())
+
+    def _release(self):
+        while self._shared:
+            self._shared.pop().release()
+
+    def result(self, timeout=None):
+        try:
+            return self.future.result(timeout=timeout)
+        except FutureTimeout:
+            self.cancel()
+            raise ComputeTimeout(f'Computation exceeded {timeout}s')
+
+    def cancel(self):
+        """Cancel the task if it has not started and return whether it was
+
+        A running task cannot be interrupted: it finishes in its worker,
+        which releases the shared arrays, and nobody reads its result.
+        """
+        cancelled = self.future.cancel()
+        if cancelled:
+            self._release()
+        return cancelled
+
+
+class ComputeExecutor:
+    """Process pool for analytics; ``workers=0`` runs tasks inline"""
+
+    def __init__(self, workers=0):
+        self.workers = workers
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                # spawn: forking a threaded web worker is unsafe
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                )
+            return self._pool
+
+    def submit(self, fn, *arrays, args=(), kwargs=None):
+        """Submit ``fn(*arrays, *args, **kwargs)``; arrays travel via shared memory"""
+        kwargs = kwargs or {}
+        if not self.workers:
+            future = Future()
+            try:
+                future.set_result(fn(*arrays, *args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+            return ComputeTask(future)
+
+        shared = [SharedArray(array) for array in arrays]
+        try:
+            future = self._get_pool().submit(_run_shared, fn, [s.spec for s in shared], args, kwargs)
+        except Exception:
+            for block in shared:
+                block.release()
+            raise
+        return ComputeTask(future, shared)
+
+    def run(self, fn, *arrays, args=(), kwargs=None, timeout=None):
+        """Submit a task and wait for its result, raising ComputeTimeout after ``timeout`` seconds"""
+        return self.submit(fn, *arrays, args=args, kwargs=kwargs).result(timeout=timeout)
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=wait, cancel_futures=True)
+                self._pool = None
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """The process-wide executor sized by ``SCREENER_COMPUTE_WORKERS``"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ComputeExecutor(getattr(settings, 'SCREENER_COMPUTE_WORKERS', 0))
+        return _executor
+
+
+def run(fn, *arrays, args=(), kwargs=None, timeout=None):
+    """Run an analytics kernel on the shared executor with the configured timeout"""
+    if timeout is None:
+        timeout = getattr(settings, 'SCREENER_COMPUTE_TIMEOUT', 30)
+    return get_executor().run(fn, *arrays, args=args, kwargs=kwargs, timeout=timeout)
@@ -0,0 +1,121 @@
+"""SQLite production profile.
+
+- Every connection is tuned on creation (``SCREENER_SQLITE_TUNING``): WAL
+  journal so readers never wait for the writer, ``synchronous=NORMAL``, a
+  larger page cache, memory-mapped I/O and in-memory temp tables.
+- ``OPTIONS['timeout']`` (``SCREENER_SQLITE_TIMEOUT``) makes a connection
+  wait for the write lock instead of failing at once. Transactions on the
+  writable connection start with ``BEGIN IMMEDIATE``: a deferred one that
+  reads before writing fails without waiting when another writer committed
+  in between (its WAL snapshot is stale), which ``update_or_create`` and
+  the Stock signals always do. The settings ask for it with
+  ``OPTIONS['transaction_mode']`` on Django 5.1 and later, and with the
+  ``screener.sqlite_backend`` engine on Django 4.2. ``retry_on_lock``
+  re-runs a whole write transaction that SQLite still rejected after the
+  timeout.
+- GET and HEAD requests read from the ``replica`` alias
+  (``SCREENER_READ_REPLICA``), a read-only connection to the same file, so
+  page views use their own connection while a refresh is writing. Reads in
+  a transaction on ``default`` stay there to see its uncommitted writes.
+"""
+import contextvars
+import functools
+import random
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+REPLICA = 'replica'
+
+PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('cache_size', -64000),  # KiB: 64 MB per connection
+    ('mmap_size', 256 * 1024 * 1024),
+    ('temp_store', 'MEMORY'),
+)
+
+LOCK_RETRIES = 5
+LOCK_RETRY_DELAY = 0.05
+
+_read_only_request = contextvars.ContextVar('read_only_request', default=False)
+
+
+def _is_read_only(connection):
+    return 'mode=ro' in str(connection.settings_dict['NAME'])
+
+
+@receiver(connection_created)
+def tune_sqlite(sender, connection, **kwargs):
+    """Apply the production pragmas to a new SQLite connection"""
+    if connection.vendor != 'sqlite' or not settings.SCREENER_SQLITE_TUNING:
+        return
+    read_only = _is_read_only(connection)
+    with connection.cursor() as cursor:
+        for name, value in PRAGMAS:
+            if name == 'journal_mode' and read_only:
+                continue  # set by the writer; it persists in the file
+            cursor.execute(f'PRAGMA {name} = {value}')
+        if read_only:
+            cursor.execute('PRAGMA query_only = ON')
+
+
+def is_locked(error):
+    message = str(error)
+    return 'database is locked' in message or 'database table is locked' in message
+
+
+def retry_on_lock(func):
+    """Retry a function writing in its own transaction while SQLite reports the database locked
+
+    Inside an outer transaction the error is raised at once: only the
+    outermost transaction can be retried.
+    """
+    @functools.wraps(func)
+    def wrapped(*args, **kwargs):
+        delay = LOCK_RETRY_DELAY
+        for attempt in range(LOCK_RETRIES + 1):
+            try:
+                return func(*args, **kwargs)
+            except OperationalError as e:
+                if attempt == LOCK_RETRIES or not is_locked(e) or transaction.get_connection().in_atomic_block:
+                    raise
+            time.sleep(delay * (1 + random.random()))
+            delay *= 2
+    return wrapped
+
+
+class ReadConnectionMiddleware:
+    """Mark GET and HEAD requests as read-only so the router sends their reads to the replica"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _read_only_request.set(request.method in ('GET', 'HEAD'))
+        try:
+            return self.get_response(request)
+        finally:
+            _read_only_request.reset(token)
+
+
+class ReadReplicaRouter:
+    """Reads of read-only requests go to the replica, everything else to default"""
+
+    def db_for_read(self, model, **hints):
+        if (_read_only_request.get() and REPLICA in connections.databases
+                and not transaction.get_connection(DEFAULT_DB_ALIAS).in_atomic_block):
+            return REPLICA
+        return None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
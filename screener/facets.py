@@ -0,0 +1,167 @@
+"""Screener facets: stock counts per sector, industry and numeric bucket.
+
+Unfiltered counts live in the FacetCount table, which is updated incrementally
+whenever a Stock is saved or deleted (see ``screener.signals``) and rebuilt
+after bulk refreshes. Counts for a filtered screen are computed with a single
+grouped query over the matching stocks.
+"""
+from django.db import transaction
+from django.db.models import Case, CharField, Count, F, Q, Value, When
+
+from .models import FacetCount, Stock
+
+MISSING = 'N/A'
+
+# Numeric buckets: (label, lower bound inclusive, upper bound exclusive)
+PE_BUCKETS = [
+    ('< 0', None, 0),
+    ('0-15', 0, 15),
+    ('15-25', 15, 25),
+    ('25-40', 25, 40),
+    ('> 40', 40, None),
+]
+
+MARKET_CAP_BANDS = [
+    ('Micro (< 300M)', None, 300e6),
+    ('Small (300M-2B)', 300e6, 2e9),
+    ('Mid (2B-10B)', 2e9, 10e9),
+    ('Large (10B-200B)', 10e9, 200e9),
+    ('Mega (> 200B)', 200e9, None),
+]
+
+# Facet name -> (Stock field, buckets or None for categorical fields)
+FACETS = {
+    'sector': ('sector', None),
+    'industry': ('industry', None),
+    'pe_bucket': ('pe_ratio', PE_BUCKETS),
+    'market_cap_band': ('market_cap', MARKET_CAP_BANDS),
+}
+
+
+def _bucket_label(value, buckets):
+    if value is None:
+        return MISSING
+    for label, low, high in buckets:
+        if (low is None or value >= low) and (high is None or value < high):
+            return label
+    return MISSING
+
+
+def _bucket_case(field, buckets):
+    whens = []
+    for label, low, high in buckets:
+        condition = Q(**{f'{field}__isnull': False})
+        if low is not None:
+            condition &= Q(**{f'{field}__gte': low})
+        if high is not None:
+            condition &= Q(**{f'{field}__lt': high})
+        whens.append(When(condition, then=Value(label)))
+    return Case(*whens, default=Value(MISSING), output_field=CharField())
+
+
+def _facets_of(row):
+    values = {}
+    for facet, (field, buckets) in FACETS.items():
+        value = row[field]
+        values[facet] = _bucket_label(value, buckets) if buckets else (value or MISSING)
+    return values
+
+
+def facet_values(stock):
+    """Return {facet: value} for a single stock"""
+    return _facets_of({field: getattr(stock, field) for field, buckets in FACETS.values()})
+
+
+def stored_facet_values(stock):
+    """Return {facet: value} of a stock as stored in the database, or None if it is not stored
+
+    A stock loaded from the database remembers its stored values (see
+    ``Stock.from_db``); only stocks built in memory with a primary key, or
+    loaded without the facet fields, are read again.
+    """
+    if stock.pk is None:
+        return None
+    fields = [field for field, buckets in FACETS.values()]
+    row = getattr(stock, '_loaded_values', {})
+    if not all(field in row for field in fields):
+        row = Stock.objects.filter(pk=stock.pk).values(*fields).first()
+        if row is None:
+            return None
+    return _facets_of(row)
+
+
+def sort_counts(facet, counts):
+    """Sort counts by bucket order for numeric facets, by count otherwise"""
+    buckets = FACETS[facet][1]
+    if buckets:
+        order = {label: i for i, (label, low, high) in enumerate(buckets)}
+        return sorted(counts.items(), key=lambda item: order.get(item[0], len(order)))
+    return sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+
+
+def facet_counts(queryset=None):
+    """Return {facet: [(value, count), ...]} for the given Stock queryset
+
+    Without a queryset the maintained FacetCount table is read; otherwise all
+    facets are computed in one grouped query and marginalised in Python.
+    """
+    counts = {facet: {} for facet in FACETS}
+
+    if queryset is None:
+        for facet, value, count in FacetCount.objects.filter(count__gt=0).values_list('facet', 'value', 'count'):
+            if facet in counts:
+                counts[facet][value] = count
+    else:
+        annotations = {
+            f'_{facet}': _bucket_case(field, buckets)
+            for facet, (field, buckets) in FACETS.items() if buckets
+        }
+        group_by = [
+            f'_{facet}' if buckets else field
+            for facet, (field, buckets) in FACETS.items()
+        ]
+        rows = (
+            queryset.order_by()
+            .annotate(**annotations)
+            .values(*group_by)
+            .annotate(n=Count('id'))
+        )
+        for row in rows:
+            for facet, key in zip(FACETS, group_by):
+                value = row[key] or MISSING
+                counts[facet][value] = counts[facet].get(value, 0) + row['n']
+
+    return {facet: sort_counts(facet, values) for facet, values in counts.items()}
+
+
+def _adjust(values, delta):
+    for facet, value in values.items():
+        updated = FacetCount.objects.filter(facet=facet, value=value).update(count=F('count') + delta)
+        if not updated and delta > 0:
+            FacetCount.objects.get_or_create(facet=facet, value=value, defaults={'count': 0})
+            FacetCount.objects.filter(facet=facet, value=value).update(count=F('count') + delta)
+
+
+def update_facets(old_values, new_values):
+    """Move one stock from its old facet values to its new ones"""
+    old_values = old_values or {}
+    new_values = new_values or {}
+    removed = {f: v for f, v in old_values.items() if new_values.get(f) != v}
+    added = {f: v for f, v in new_values.items() if old_values.get(f) != v}
+    if not removed and not added:
+        return
+    with transaction.atomic():
+        _adjust(removed, -1)
+        _adjust(added, 1)
+
+
+def rebuild_facets():
+    """Recompute the FacetCount table from scratch (after bulk refreshes)"""
+    counts = facet_counts(Stock.objects.all())
+    with transaction.atomic():
+        FacetCount.objects.all().delete()
+        FacetCount.objects.bulk_create([
+            FacetCount(facet=facet, value=value, count=count)
+            for facet, values in counts.items()
+            for value, count in values
+        ])
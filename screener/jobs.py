@@ -0,0 +1,271 @@
+"""Database-backed job queue for long-running analyses.
+
+Views hand slow work to ``enqueue`` and return straight away; the
+``run_workers`` management command claims queued ``AnalysisJob`` rows, runs
+the registered handler and writes its progress back to the row so pages can
+poll ``api/jobs/<id>/``. Results of keyed jobs also go to the shared cache
+(``analysis`` namespace) so later requests are served without the queue.
+"""
+import logging
+import threading
+import traceback
+from datetime import timedelta
+
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+
+from . import analytics, cache, compute, market_data, similarity
+from . import prices as price_store
+from .db import retry_on_lock
+from .models import AnalysisJob, Stock
+
+logger = logging.getLogger(__name__)
+
+# How long a finished result is served before it is recomputed
+RESULT_TIMEOUT = market_data.HISTORY_TIMEOUT
+
+# Seconds between heartbeats of a running job; ``requeue_stale`` must wait
+# several of them before deciding that the worker died
+HEARTBEAT_SECONDS = 15
+
+HANDLERS = {}
+
+
+def handler(kind):
+    """Register ``fn(params, report)`` as the handler of a job kind"""
+    def register(fn):
+        HANDLERS[kind] = fn
+        return fn
+    return register
+
+
+def enqueue(kind, params, key=''):
+    """Queue a job, reusing a queued or running job with the same key"""
+    if kind not in HANDLERS:
+        raise ValueError(f'Unknown job kind: {kind}')
+    if key:
+        # Two requests racing here may queue the same work twice; both
+        # produce the same result, so that is only wasted effort
+        existing = (
+            AnalysisJob.objects
+            .filter(key=key, status__in=[AnalysisJob.QUEUED, AnalysisJob.RUNNING])
+            .order_by('created_at')
+            .first()
+        )
+        if existing is not None:
+            return existing
+    return AnalysisJob.objects.create(kind=kind, key=key, params=params)
+
+
+def cached_result(key):
+    """Result of the latest finished job with this key, if still fresh"""
+    result = cache.get('analysis', key)
+    if result is not None:
+        return result
+    job = (
+        AnalysisJob.objects
+        .filter(key=key, status=AnalysisJob.DONE,
+                finished_at__gte=timezone.now() - timedelta(seconds=RESULT_TIMEOUT))
+        .order_by('-finished_at')
+        .only('result')
+        .first()
+    )
+    return job.result if job is not None else None
+
+
+def run_now(kind, params, key=''):
+    """Run a handler in the calling thread, caching its result like a worker would"""
+    result = HANDLERS[kind](params, lambda fraction, message='': None)
+    if key:
+        cache.set('analysis', key, result, RESULT_TIMEOUT)
+    return result
+
+
+def claim_next(worker):
+    """Atomically mark the oldest queued job as running, or None if the queue is empty"""
+    while True:
+        job_id = (
+            AnalysisJob.objects
+            .filter(status=AnalysisJob.QUEUED)
+            .order_by('created_at')
+            .values_list('pk', flat=True)
+            .first()
+        )
+        if job_id is None:
+            return None
+        # Filtering on the status makes this a compare-and-swap: if another
+        # worker claimed the job first, nothing is updated and we try the next one
+        now = timezone.now()
+        claimed = AnalysisJob.objects.filter(pk=job_id, status=AnalysisJob.QUEUED).update(
+            status=AnalysisJob.RUNNING, worker=worker, started_at=now, heartbeat_at=now,
+        )
+        if claimed:
+            return AnalysisJob.objects.get(pk=job_id)
+
+
+def _claimed(job):
+    """The job's row while this worker still holds it (it may have been requeued and claimed again)"""
+    return AnalysisJob.objects.filter(pk=job.pk, status=AnalysisJob.RUNNING, worker=job.worker)
+
+
+def _reporter(job):
+    def report(fraction, message=''):
+        _claimed(job).update(
+            progress=min(max(fraction, 0.0), 1.0), message=message[:200], heartbeat_at=timezone.now(),
+        )
+    return report
+
+
+def _beat(job, stop, interval):
+    """Touch the job's heartbeat every ``interval`` seconds until ``stop`` is set"""
+    try:
+        while not stop.wait(interval):
+            _claimed(job).update(heartbeat_at=timezone.now())
+    except Exception:
+        logger.exception('Heartbeat of job %s failed', job.pk)
+    finally:
+        # Connections are per thread: this one would otherwise stay open
+        connection.close()
+
+
+def run_job(job, heartbeat=HEARTBEAT_SECONDS):
+    """Run a claimed job and store its result or the traceback of its failure
+
+    A background thread keeps the job's heartbeat fresh while the handler
+    runs, so that a long computation that reports no progress is not
+    mistaken for the job of a dead worker. If the job was requeued in the
+    meantime, its outcome is dropped: the row belongs to its new run.
+    Returns whether the job succeeded and its outcome was stored.
+    """
+    stop = threading.Event()
+    beat = threading.Thread(target=_beat, args=(job, stop, heartbeat), daemon=True)
+    beat.start()
+    try:
+        result = HANDLERS[job.kind](job.params, _reporter(job))
+    except Exception:
+        logger.exception('Job %s (%s) failed', job.pk, job.kind)
+        _claimed(job).update(status=AnalysisJob.FAILED, error=traceback.format_exc(), finished_at=timezone.now())
+        return False
+    finally:
+        stop.set()
+        beat.join()
+    
+    stored = _claimed(job).update(
+        status=AnalysisJob.DONE, progress=1.0, message='', result=result, finished_at=timezone.now(),
+    )
+    if not stored:
+        logger.warning('Job %s (%s) was requeued while running; its result is dropped', job.pk, job.kind)
+        return False
+    if job.key:
+        cache.set('analysis', job.key, result, RESULT_TIMEOUT)
+    return True
+
+
+def requeue_stale(seconds):
+    """Put back running jobs without a heartbeat for ``seconds``; returns how many"""
+    cutoff = timezone.now() - timedelta(seconds=seconds)
+    return AnalysisJob.objects.filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff),
+        status=AnalysisJob.RUNNING,
+    ).update(status=AnalysisJob.QUEUED, worker='', progress=0, message='', heartbeat_at=None)
+
+
+def prune(days):
+    """Delete finished jobs older than ``days``; returns how many"""
+    deleted, _ = AnalysisJob.objects.filter(
+        status__in=[AnalysisJob.DONE, AnalysisJob.FAILED],
+        finished_at__lt=timezone.now() - timedelta(days=days),
+    ).delete()
+    return deleted
+
+
+def _fetch_returns(symbols, period, interval, report, required=False):
+    """Bar returns per symbol, reporting progress after each download"""
+    returns_by_symbol = {}
+    for i, symbol in enumerate(symbols, 1):
+        try:
+            hist = price_store.get_history(symbol, period, interval)
+            if hist is not None and not hist.empty:
+                returns_by_symbol[symbol] = hist['Close'].pct_change().dropna()
+        except Exception:
+            if required:
+                raise
+        if required and symbol not in returns_by_symbol:
+            raise ValueError(f'Aucune donnée de prix pour {symbol}')
+        # The last 10% of the progress bar is left for the computation itself
+        report(0.9 * i / len(symbols), f'Chargement de {symbol} ({i}/{len(symbols)})')
+    return returns_by_symbol
+
+
+@handler('correlation')
+def correlation(params, report):
+    """Return correlations between a stock and the other stocks"""
+    symbols = [params['symbol']] + list(params['others'])
+    returns_by_symbol = _fetch_returns(symbols, params['period'], params['interval'], report)
+    if not returns_by_symbol:
+        return {'symbols': [], 'matrix': {}}
+    
+    # Align every series once, then correlate the panel on the compute executor
+    report(0.9, 'Calcul des corrélations')
+    symbols, panel = analytics.returns_panel(returns_by_symbol)
+    return {
+        'symbols': symbols,
+        'matrix': compute.run(analytics.correlation_matrix, panel, args=(symbols,)),
+    }
+
+
+@handler('backtest')
+def backtest(params, report):
+    """Portfolio of several stocks rebalanced to fixed weights every bar"""
+    symbols = [s.upper() for s in params['symbols']]
+    weights = params.get('weights') or [1] * len(symbols)
+    if len(weights) != len(symbols):
+        raise ValueError('Il faut autant de poids que de symboles.')
+    try:
+        weights = [float(weight) for weight in weights]
+    except (TypeError, ValueError):
+        raise ValueError('Les poids doivent être des nombres.') from None
+    if not all(0 < weight < float('inf') for weight in weights):
+        raise ValueError('Les poids doivent être strictement positifs.')
+    interval = params.get('interval', '1d')
+    returns_by_symbol = _fetch_returns(symbols, params.get('period', '1y'), interval, report, required=True)
+    
+    report(0.9, 'Calcul du backtest')
+    symbols, panel = analytics.returns_panel(returns_by_symbol)
+    weight_of = dict(zip([s.upper() for s in params['symbols']], weights))
+    total = sum(weight_of[symbol] for symbol in symbols)
+    weights = [weight_of[symbol] / total for symbol in symbols]
+    result = compute.run(
+        analytics.portfolio_backtest, panel,
+        args=(weights, price_store.periods_per_year(interval)),
+    )
+    result.update({'symbols': symbols, 'weights': weights})
+    return result
+
+
+@handler('similarity')
+def build_similarity(params, report):
+    """Similarity index of the universe, published to every process"""
+    report(0, "Construction de l'index de similarité")
+    index = similarity.build(period=params.get('period', similarity.PERIOD))
+    return {'symbols': len(index), 'observations': index.observations}
+
+
+@handler('import')
+def import_stocks(params, report):
+    """Create or update stocks from Yahoo Finance"""
+    imported = []
+    failed = {}
+    symbols = [s.upper() for s in params['symbols']]
+    for i, symbol in enumerate(symbols, 1):
+        try:
+            info = market_data.get_info(symbol, fresh=True)
+            if 'symbol' not in info or info.get('regularMarketPrice') is None:
+                raise ValueError('symbole introuvable ou invalide')
+            retry_on_lock(Stock.objects.update_or_create)(symbol=symbol, defaults=market_data.stock_fields(symbol, info))
+            imported.append(symbol)
+        except Exception as e:
+            failed[symbol] = str(e)
+        report(i / len(symbols), f'Import de {symbol} ({i}/{len(symbols)})')
+    return {'imported': imported, 'failed': failed}
@@ -0,0 +1,39 @@
+"""Deferred imports of heavy dependencies.
+
+NumPy, pandas and yfinance account for most of the time it takes to start a
+worker or run a management command, and many of those never touch market
+data. Modules bind them with ``np = lazy_import('numpy')`` instead of
+``import numpy as np``: the real import runs on first attribute access,
+under the interpreter's normal import lock.
+"""
+import importlib
+import sys
+import types
+
+
+class LazyModule(types.ModuleType):
+    """Stand-in for a module that is imported the first time it is used"""
+
+    def __init__(self, name):
+        super().__init__(name)
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self.__name__)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = 'loaded' if self._module is not None else 'not loaded'
+        return f"<lazy module '{self.__name__}' ({state})>"
+
+
+def lazy_import(name):
+    """The module if it is already imported, else a ``LazyModule`` for it"""
+    return sys.modules.get(name) or LazyModule(name)
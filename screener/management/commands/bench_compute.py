@@ -0,0 +1,59 @@
+import os
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from screener import analytics
+from screener.compute import ComputeExecutor
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks analytics throughput of the compute executor by number of worker processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tasks', type=int, default=64, help='Analytics tasks per run')
+        parser.add_argument('--length', type=int, default=5000, help='Price bars per task')
+        parser.add_argument('--symbols', type=int, default=50, help='Columns of the correlation panel')
+        parser.add_argument(
+            '--workers', default='',
+            help='Comma-separated worker counts (default: 0, 1, 2, 4, ... up to the CPU count; 0 = inline)',
+        )
+
+    def handle(self, *args, **options):
+        cpus = os.cpu_count() or 1
+        if options['workers']:
+            counts = [int(n) for n in options['workers'].split(',')]
+        else:
+            counts = [0] + [n for n in (1, 2, 4, 8, 16, 32, 64) if n < cpus] + [cpus]
+        
+        rng = np.random.default_rng(0)
+        length = options['length']
+        closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, (options['tasks'], length)), axis=1))
+        panel = rng.normal(0, 0.01, (length, options['symbols']))
+        symbols = [f'S{i}' for i in range(options['symbols'])]
+        
+        self.stdout.write(f"{options['tasks']} tasks of {length} bars (+ {options['symbols']}-symbol correlation), {cpus} CPUs")
+        baseline = None
+        for workers in counts:
+            executor = ComputeExecutor(workers)
+            # Warm up the pool so process start-up is not measured
+            executor.run(analytics.analyze_prices, closes[0], args=(252,))
+            
+            start = time.perf_counter()
+            tasks = []
+            for i, series in enumerate(closes):
+                tasks.append(executor.submit(analytics.analyze_prices, series, args=(252,)))
+                if i % 8 == 0:
+                    tasks.append(executor.submit(analytics.correlation_matrix, panel, args=(symbols,)))
+            for task in tasks:
+                task.result()
+            elapsed = time.perf_counter() - start
+            executor.shutdown()
+            
+            throughput = len(tasks) / elapsed
+            baseline = baseline or throughput
+            label = 'inline' if workers == 0 else f'{workers} worker(s)'
+            self.stdout.write(
+                f'{label:<14} {elapsed:8.2f} s  {throughput:8.1f} tasks/s  x{throughput / baseline:.2f}'
+            )
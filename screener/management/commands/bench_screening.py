@@ -0,0 +1,116 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from screener.models import Stock
+from screener.screening import ScreeningIndex, TEXT_FIELDS, NUMERIC_FIELDS
+from screener.screens import apply_criteria
+
+SECTORS = [
+    'Technology', 'Financial Services', 'Healthcare', 'Consumer Cyclical', 'Consumer Defensive',
+    'Energy', 'Industrials', 'Communication Services', 'Real Estate', 'Utilities', 'Basic Materials',
+]
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks home screens on the ORM path against the in-memory columnar index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=50000, help='Number of synthetic stocks')
+        parser.add_argument('--screens', type=int, default=50, help='Number of random screens to run')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        size = options['size']
+        
+        # Synthetic rows live in a transaction that is rolled back at the end
+        try:
+            with transaction.atomic():
+                self._run(rng, size, options['screens'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def _run(self, rng, size, screen_count):
+        self.stdout.write(f'Creating {size} synthetic stocks...')
+        Stock.objects.bulk_create([self._stock(rng, i) for i in range(size)], batch_size=2000)
+        
+        screens = [self._criteria(rng) for _ in range(screen_count)]
+        
+        start = time.perf_counter()
+        index = ScreeningIndex()
+        index.build(list(Stock.objects.values(*TEXT_FIELDS, *NUMERIC_FIELDS)))
+        # Sort every column the screens filter on, as the first screens of a
+        # served index would, so that the timings below are steady-state
+        index.screen({name: value for criteria in screens for name, value in criteria.items()})
+        build_time = time.perf_counter() - start
+        
+        orm_times, index_times = [], []
+        for criteria in screens:
+            start = time.perf_counter()
+            orm_rows = list(apply_criteria(Stock.objects.all(), criteria).values(*TEXT_FIELDS, *NUMERIC_FIELDS))
+            orm_times.append(time.perf_counter() - start)
+            
+            start = time.perf_counter()
+            mask = index.mask(criteria)
+            index_rows = index.rows(mask)
+            index_times.append(time.perf_counter() - start)
+            
+            if [row['symbol'] for row in index_rows] != [row['symbol'] for row in orm_rows]:
+                self.stdout.write(self.style.ERROR(f'Result mismatch for {criteria}'))
+        
+        def summary(times):
+            times = sorted(times)
+            return (
+                f'mean {sum(times) / len(times) * 1000:8.3f} ms  '
+                f'p50 {times[len(times) // 2] * 1000:8.3f} ms  '
+                f'max {times[-1] * 1000:8.3f} ms'
+            )
+        
+        self.stdout.write(f'Index build:   {build_time * 1000:8.1f} ms ({len(index)} rows)')
+        self.stdout.write(f'ORM screens:   {summary(orm_times)}')
+        self.stdout.write(f'Index screens: {summary(index_times)}')
+        
+        # Mask evaluation alone, excluding row materialisation
+        start = time.perf_counter()
+        for criteria in screens:
+            index.mask(criteria)
+        mask_time = (time.perf_counter() - start) / len(screens)
+        self.stdout.write(self.style.SUCCESS(f'Index mask only: {mask_time * 1000:.3f} ms per screen'))
+
+    def _stock(self, rng, i):
+        price = rng.lognormvariate(4, 1)
+        return Stock(
+            symbol=f'S{i:06d}',
+            name=f'Synthetic {i}',
+            sector=rng.choice(SECTORS),
+            industry=f'Industry {rng.randint(1, 120)}',
+            market_cap=rng.lognormvariate(22, 2) if rng.random() > 0.05 else None,
+            current_price=price,
+            pe_ratio=rng.uniform(-20, 120) if rng.random() > 0.15 else None,
+            dividend_yield=rng.uniform(0, 8) if rng.random() > 0.4 else None,
+            fifty_two_week_high=price * rng.uniform(1, 1.6),
+            fifty_two_week_low=price * rng.uniform(0.5, 1),
+            volume=rng.randint(1000, 100000000),
+        )
+
+    def _criteria(self, rng):
+        criteria = {}
+        if rng.random() < 0.6:
+            criteria['min_price'] = rng.uniform(1, 100)
+        if rng.random() < 0.5:
+            criteria['max_price'] = rng.uniform(100, 1000)
+        if rng.random() < 0.5:
+            criteria['min_market_cap'] = rng.lognormvariate(21, 2)
+        if rng.random() < 0.5:
+            criteria['max_pe'] = rng.uniform(5, 60)
+        if rng.random() < 0.4:
+            criteria['sector'] = rng.choice(['Technology', 'Financial', 'Consumer', 'Energy'])
+        return criteria
@@ -0,0 +1,141 @@
+import random
+import statistics
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from screener.db import is_locked, retry_on_lock
+from screener.models import FundamentalSnapshot, Stock
+
+PREFIX = 'ZZB'
+
+
+class Command(BaseCommand):
+    help = (
+        'Concurrent read/write load test of the database: page views against '
+        'Stock writes like those of search_stock and refreshes'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8, help='Threads requesting pages (default: 8)')
+        parser.add_argument('--writers', type=int, default=2, help='Threads updating stocks (default: 2)')
+        parser.add_argument('--seconds', type=float, default=10, help='Duration of the run (default: 10)')
+        parser.add_argument('--stocks', type=int, default=200, help='Synthetic stocks to write (default: 200)')
+
+    def handle(self, *args, **options):
+        symbols = [f'{PREFIX}{i:04d}' for i in range(options['stocks'])]
+        if Stock.objects.filter(symbol__startswith=PREFIX).exists():
+            raise CommandError(f'Stocks starting with {PREFIX} already exist; remove them first.')
+
+        engine = settings.DATABASES['default']['ENGINE'].rsplit('.', 1)[-1]
+        replica = 'replica' in settings.DATABASES
+        self.stdout.write(
+            f"Database: {engine}, tuning {'on' if settings.SCREENER_SQLITE_TUNING else 'off'}, "
+            f"read replica {'on' if replica else 'off'}"
+        )
+        self.stdout.write(f'Creating {len(symbols)} synthetic stocks...')
+        for symbol in symbols:
+            Stock.objects.create(symbol=symbol, name=f'Load test {symbol}', sector='Technology', current_price=100)
+
+        try:
+            # Pages are rendered on every request: measure the database, not the page cache
+            with override_settings(SCREENER_PAGE_CACHE_SECONDS=0):
+                results = self._run(symbols, options)
+        finally:
+            Stock.objects.filter(symbol__startswith=PREFIX).delete()
+            FundamentalSnapshot.objects.filter(symbol__startswith=PREFIX).delete()
+
+        self._report(results, options['seconds'])
+        if results['errors']:
+            raise CommandError(f"{len(results['errors'])} request(s) failed, first: {results['errors'][0]}")
+
+    def _run(self, symbols, options):
+        results = {'read': [], 'write': [], 'errors': [], 'locked': 0}
+        lock = threading.Lock()
+        deadline = time.monotonic() + options['seconds']
+        urls = [reverse('screener:all_stocks'), reverse('screener:facets_api')]
+
+        def record(kind, started, error=None):
+            with lock:
+                if error is None:
+                    results[kind].append(time.perf_counter() - started)
+                else:
+                    results['errors'].append(f'{kind}: {error}')
+                    results['locked'] += is_locked(error)
+
+        def reader(seed):
+            rng = random.Random(seed)
+            client = Client(HTTP_HOST=settings.ALLOWED_HOSTS[0])
+            try:
+                while time.monotonic() < deadline:
+                    url = rng.choice(urls)
+                    if url == urls[1]:
+                        url += f'?min_price={rng.randint(1, 200)}'
+                    started = time.perf_counter()
+                    try:
+                        response = client.get(url)
+                        error = None if response.status_code == 200 else f'HTTP {response.status_code}'
+                    except Exception as e:
+                        error = e
+                    record('read', started, error)
+            finally:
+                connections.close_all()
+
+        def writer(seed):
+            rng = random.Random(seed)
+            update = retry_on_lock(Stock.objects.update_or_create)
+            try:
+                while time.monotonic() < deadline:
+                    symbol = rng.choice(symbols)
+                    started = time.perf_counter()
+                    try:
+                        update(symbol=symbol, defaults={
+                            'current_price': rng.uniform(1, 500),
+                            'market_cap': rng.uniform(1e8, 1e12),
+                            'pe_ratio': rng.uniform(5, 60),
+                            'volume': rng.randint(1000, 10 ** 8),
+                        })
+                        error = None
+                    except OperationalError as e:
+                        error = e
+                    record('write', started, error)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=reader, args=(i,)) for i in range(options['readers'])]
+        threads += [threading.Thread(target=writer, args=(1000 + i,)) for i in range(options['writers'])]
+        self.stdout.write(
+            f"Running {options['readers']} reader(s) and {options['writers']} writer(s) "
+            f"for {options['seconds']:.0f}s..."
+        )
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def _report(self, results, seconds):
+        for kind in ('read', 'write'):
+            times = sorted(results[kind])
+            if not times:
+                self.stdout.write(f'{kind.capitalize()}s:  none completed')
+                continue
+
+            def percentile(p):
+                return times[min(len(times) - 1, int(p / 100 * len(times)))] * 1000
+
+            self.stdout.write(
+                f'{kind.capitalize()}s: {len(times):6d} ({len(times) / seconds:7.1f}/s)  '
+                f'p50 {percentile(50):7.1f} ms  p95 {percentile(95):7.1f} ms  '
+                f'p99 {percentile(99):7.1f} ms  max {times[-1] * 1000:7.1f} ms  '
+                f'mean {statistics.mean(times) * 1000:7.1f} ms'
+            )
+        style = self.style.ERROR if results['errors'] else self.style.SUCCESS
+        self.stdout.write(style(
+            f"Errors: {len(results['errors'])} ({results['locked']} \"database is locked\")"
+        ))
@@ -0,0 +1,77 @@
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+# What a web worker imports before serving its first request
+BOOT_SCRIPT = (
+    'import django; django.setup(); '
+    'from django.urls import get_resolver; get_resolver().url_patterns'
+)
+
+# Must only be imported when a request or command actually needs them
+HEAVY_MODULES = ('numpy', 'pandas', 'yfinance', 'anthropic')
+
+DEFAULT_BUDGET_MS = 500
+
+
+def parse_importtime(stderr):
+    """``-X importtime`` output as (module, self_us, cumulative_us, depth) tuples"""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        imports.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return imports
+
+
+class Command(BaseCommand):
+    help = 'Measures worker start-up import time with python -X importtime and checks it against a budget'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help='Interpreter starts to measure (default: 5)')
+        parser.add_argument(
+            '--budget', type=float, default=DEFAULT_BUDGET_MS,
+            help=f'Fail when the median import time exceeds this many ms (default: {DEFAULT_BUDGET_MS})',
+        )
+        parser.add_argument('--top', type=int, default=10, help='Slowest top-level imports to list')
+
+    def handle(self, *args, **options):
+        env = dict(os.environ, PYTHONDONTWRITEBYTECODE='1')
+        totals = []
+        walls = []
+        imports = []
+        for _ in range(max(options['runs'], 1)):
+            started = time.perf_counter()
+            proc = subprocess.run(
+                [sys.executable, '-X', 'importtime', '-c', BOOT_SCRIPT],
+                env=env, capture_output=True, text=True,
+            )
+            walls.append((time.perf_counter() - started) * 1000)
+            if proc.returncode != 0:
+                raise CommandError(f'Start-up failed:\n{proc.stderr[-2000:]}')
+            imports = parse_importtime(proc.stderr)
+            totals.append(sum(self_us for _, self_us, _, _ in imports) / 1000)
+
+        median = statistics.median(totals)
+        self.stdout.write(
+            f'Import time: median {median:.0f} ms, min {min(totals):.0f} ms over {len(totals)} run(s); '
+            f'process wall time median {statistics.median(walls):.0f} ms'
+        )
+
+        self.stdout.write("\nSlowest top-level imports (last run):")
+        top_level = sorted((i for i in imports if i[3] == 0), key=lambda i: i[2], reverse=True)
+        for name, _, cumulative_us, _ in top_level[:options['top']]:
+            self.stdout.write(f'  {cumulative_us / 1000:>8.1f} ms  {name}')
+
+        heavy = sorted({name for name, _, _, _ in imports if name in HEAVY_MODULES})
+        if heavy:
+            raise CommandError(f"Heavy modules imported at start-up: {', '.join(heavy)}")
+        if median > options['budget']:
+            raise CommandError(f"Start-up import time {median:.0f} ms exceeds the {options['budget']:.0f} ms budget")
+        self.stdout.write(self.style.SUCCESS(f"\nWithin the {options['budget']:.0f} ms budget."))
@@ -0,0 +1,18 @@
+import time
+
+from django.core.management.base import BaseCommand
+from screener import risk
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the drawdown and tail-risk fields from the price store without downloading anything'
+
+    def add_arguments(self, parser):
+        parser.add_argument('symbols', nargs='*', help='Symbols to recompute (default: all stocks)')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        written = risk.update(options['symbols'] or None)
+        self.stdout.write(self.style.SUCCESS(
+            f'Recomputed risk metrics of {written} stock(s) in {time.perf_counter() - started:.2f}s.'
+        ))
@@ -0,0 +1,44 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from screener import similarity
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the return-correlation similarity index and clusters from stored daily bars'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--clusters', type=int,
+            help=f'Number of clusters (default: about sqrt(n / 2), at most {similarity.DEFAULT_CLUSTERS})',
+        )
+        parser.add_argument('--period', default=similarity.PERIOD, help='History to correlate over (default: 1y)')
+        parser.add_argument(
+            '--min-observations', type=int, default=similarity.MIN_OBSERVATIONS,
+            help='Skip stocks with fewer daily returns than this',
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        index = similarity.build(
+            period=options['period'],
+            clusters=options['clusters'],
+            min_observations=options['min_observations'],
+        )
+        self.stdout.write(
+            f'Indexed {len(index)} stocks over {index.observations} returns '
+            f'in {time.perf_counter() - started:.2f}s, {len(index.clusters())} clusters'
+        )
+        
+        if len(index) > 1:
+            timings = []
+            for symbol in random.sample(index.symbols, min(len(index), 200)):
+                started = time.perf_counter()
+                index.similar(symbol, 10)
+                timings.append((time.perf_counter() - started) * 1000)
+            self.stdout.write(
+                f'Top-10 query: median {statistics.median(timings):.3f} ms, max {max(timings):.3f} ms'
+            )
+        self.stdout.write(self.style.SUCCESS('Similarity index published.'))
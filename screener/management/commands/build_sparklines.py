@@ -0,0 +1,18 @@
+import time
+
+from django.core.management.base import BaseCommand
+from screener import sparklines
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the list-view sparklines from the price store without downloading anything'
+
+    def add_arguments(self, parser):
+        parser.add_argument('symbols', nargs='*', help='Symbols to rebuild (default: all stocks)')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        written = sparklines.update(options['symbols'] or None)
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {written} sparkline(s) in {time.perf_counter() - started:.2f}s.'
+        ))
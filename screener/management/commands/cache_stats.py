@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from screener import cache
+
+
+class Command(BaseCommand):
+    help = 'Shows market data cache hit rates per namespace across all workers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Reset the counters after printing them')
+
+    def handle(self, *args, **options):
+        for namespace, stats in cache.stats().items():
+            hit_rate = f"{stats['hit_rate'] * 100:.1f}%" if stats['hit_rate'] is not None else 'N/A'
+            self.stdout.write(
+                f"{namespace:<10} v{cache.NAMESPACE_VERSIONS[namespace]}  "
+                f"hits {stats['hits']:>8}  misses {stats['misses']:>8}  hit rate {hit_rate:>6}"
+            )
+        
+        if options['reset']:
+            cache.reset_stats()
+            self.stdout.write(self.style.SUCCESS('Counters reset.'))
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+from screener import alerts, cache
+
+
+class Command(BaseCommand):
+    help = 'Evaluates saved screen rules against the stocks whose data changed and records new alerts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('symbols', nargs='*', help='Only re-evaluate these symbols')
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Recompute every feature and re-evaluate the whole universe',
+        )
+
+    def handle(self, *args, **options):
+        if options['all']:
+            cache.delete('alerts', 'evaluated_at')
+        
+        started = time.perf_counter()
+        evaluation = alerts.evaluate(options['symbols'] or None)
+        self.stdout.write(
+            f'Evaluated {evaluation.rules} rule(s) over {evaluation.symbols} changed stock(s) '
+            f'in {time.perf_counter() - started:.2f}s'
+        )
+        for alert in evaluation.alerts:
+            self.stdout.write(f'  {alert.symbol}: {alert.rule.name}')
+        self.stdout.write(self.style.SUCCESS(f'{len(evaluation.alerts)} new alert(s).'))
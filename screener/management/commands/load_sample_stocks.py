@@ -1,4 +1,5 @@
 from django.core.management.base import BaseCommand
+from screener.db import retry_on_lock
 from screener.models import Stock
 
 
@@ -145,7 +146,7 @@ class Command(BaseCommand):
         stocks_updated = 0
         
         for stock_data in sample_stocks:
-            stock, created = Stock.objects.update_or_create(
+            stock, created = retry_on_lock(Stock.objects.update_or_create)(
                 symbol=stock_data['symbol'],
                 defaults=stock_data
             )
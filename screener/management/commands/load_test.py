@@ -0,0 +1,334 @@
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import requests
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+PREFIX = 'LT'
+
+# Share of requests of each kind, like the traffic of the deployed app
+MIX = {
+    'home': 10,
+    'screen': 20,
+    'all_stocks': 15,
+    'analysis': 30,
+    'stock_detail': 15,
+    'summarize_news': 10,
+}
+ANALYSIS_PERIODS = ['1mo', '3mo', '6mo', '1y', '2y', '5y']
+
+# Run in a fresh interpreter on the load-test database with the offline stand-ins
+SEED_SCRIPT = (
+    'import sys, django; django.setup(); '
+    'from screener.management.commands.load_test import seed; seed(int(sys.argv[1]))'
+)
+SERVE_SCRIPT = (
+    'import sys, django; django.setup(); '
+    'from screener.management.commands.load_test import serve; '
+    'serve(sys.argv[1], int(sys.argv[2]), float(sys.argv[3]), float(sys.argv[4]))'
+)
+
+
+def symbols(size):
+    return [f'{PREFIX}{i:05d}' for i in range(size)]
+
+
+def seed(size):
+    """Fill an empty database with ``size`` offline stocks, their stored bars, sparklines and risk fields"""
+    from screener import market_data, offline, screening
+    from screener.facets import rebuild_facets
+    from screener.models import Stock
+
+    offline.install()
+    Stock.objects.bulk_create([
+        Stock(symbol=symbol, **market_data.stock_fields(symbol, offline.Ticker(symbol).info))
+        for symbol in symbols(size)
+    ], batch_size=1000)
+    with open(os.devnull, 'w') as devnull:
+        call_command('refresh_prices', period='1y', skip_similarity=True, skip_alerts=True, stdout=devnull)
+    # Bulk writes skip the Stock signals that keep these in sync in production
+    rebuild_facets()
+    screening.reset_index()
+
+
+def serve(server, port, provider_latency, llm_latency):
+    """Serve the app on ``port`` with the offline stand-ins until killed"""
+    from screener import offline
+
+    offline.install(provider_latency, llm_latency)
+    if server == 'asgi':
+        import uvicorn
+        from stockscreener.asgi import application
+
+        uvicorn.run(application, host='127.0.0.1', port=port, log_level='warning', lifespan='off')
+    else:
+        from socketserver import ThreadingMixIn
+        from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+        from stockscreener.wsgi import application
+
+        class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+            daemon_threads = True
+
+        class QuietHandler(WSGIRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+        make_server('127.0.0.1', port, application, ThreadingWSGIServer, QuietHandler).serve_forever()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def worker_memory(pid):
+    """(resident, peak resident) MB of a process, None where /proc is not available"""
+    try:
+        status = Path(f'/proc/{pid}/status').read_text()
+    except OSError:
+        return None
+    values = dict(re.findall(r'^(VmRSS|VmHWM):\s+(\d+) kB', status, re.M))
+    return int(values['VmRSS']) / 1024, int(values['VmHWM']) / 1024
+
+
+def percentile(times, p):
+    return times[min(len(times) - 1, int(p / 100 * len(times)))] * 1000
+
+
+class Command(BaseCommand):
+    help = (
+        'Load test of the app served by WSGI or ASGI workers with offline market data and LLM: '
+        'latency percentiles, throughput and worker memory by universe size'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', default='100,500',
+            help='Comma-separated universe sizes (stocks) to measure (default: 100,500)',
+        )
+        parser.add_argument('--server', choices=['wsgi', 'asgi'], default='wsgi', help='Interface (asgi needs uvicorn)')
+        parser.add_argument('--workers', type=int, default=2, help='Server processes (default: 2)')
+        parser.add_argument('--clients', type=int, default=8, help='Concurrent client threads (default: 8)')
+        parser.add_argument('--seconds', type=float, default=20, help='Measured duration per size (default: 20)')
+        parser.add_argument('--warmup', type=float, default=5, help='Unmeasured traffic before each run (default: 5)')
+        parser.add_argument(
+            '--provider-latency', type=float, default=50,
+            help='Simulated Yahoo Finance round trip in ms (default: 50)',
+        )
+        parser.add_argument(
+            '--llm-latency', type=float, default=1000,
+            help='Simulated news summary generation time in ms (default: 1000)',
+        )
+        parser.add_argument('--timeout', type=float, default=120, help='Request timeout in seconds (default: 120)')
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the request sequence (default: 0)')
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',') if size.strip()]
+        if not sizes or min(sizes) < 1:
+            raise CommandError('--sizes needs positive universe sizes')
+        if options['server'] == 'asgi':
+            try:
+                import uvicorn  # noqa: F401
+            except ImportError:
+                raise CommandError('--server asgi needs uvicorn: pip install uvicorn')
+
+        self.stdout.write(
+            f"{options['server'].upper()}, {options['workers']} worker(s), {options['clients']} client(s), "
+            f"{options['seconds']:.0f}s per size, provider {options['provider_latency']:.0f} ms, "
+            f"LLM {options['llm_latency']:.0f} ms"
+        )
+        summaries = []
+        for size in sizes:
+            with tempfile.TemporaryDirectory() as directory:
+                summaries.append((size, self._measure(size, Path(directory), options)))
+
+        if len(summaries) > 1:
+            self.stdout.write('\nScaling')
+            self.stdout.write(f"{'Stocks':>8} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'Peak MB':>8}")
+            for size, summary in summaries:
+                self.stdout.write(
+                    f"{size:8d} {summary['throughput']:8.1f} {summary['p50']:8.1f} {summary['p95']:8.1f} "
+                    f"{summary['p99']:8.1f} {summary['peak']:8.1f}"
+                )
+        errors = sum(summary['errors'] for _, summary in summaries)
+        if errors:
+            raise CommandError(f'{errors} request(s) failed')
+
+    def _measure(self, size, directory, options):
+        env = {
+            **os.environ,
+            'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'stockscreener.settings'),
+            'SCREENER_DB_PATH': str(directory / 'load.sqlite3'),
+            'SCREENER_CACHE_DIR': str(directory / 'cache'),
+            'DJANGO_DEBUG': 'False',
+            'ANTHROPIC_API_KEY': 'offline',
+            # The stand-in is not rate limited like Yahoo Finance
+            'SCREENER_PROVIDER_RATE': '1000000',
+            'SCREENER_PROVIDER_BURST': '1000000',
+        }
+        self.stdout.write(f'\nUniverse of {size} stocks: seeding...')
+        manage = [sys.executable, str(settings.BASE_DIR / 'manage.py')]
+        for command in (manage + ['migrate', '-v', '0'], [sys.executable, '-c', SEED_SCRIPT, str(size)]):
+            proc = subprocess.run(command, env=env, cwd=settings.BASE_DIR, capture_output=True, text=True)
+            if proc.returncode != 0:
+                raise CommandError(f'Seeding failed:\n{proc.stderr[-2000:]}')
+
+        ports = [free_port() for _ in range(options['workers'])]
+        log = open(directory / 'workers.log', 'w')
+        workers = [
+            subprocess.Popen(
+                [sys.executable, '-c', SERVE_SCRIPT, options['server'], str(port),
+                 str(options['provider_latency'] / 1000), str(options['llm_latency'] / 1000)],
+                env=env, cwd=settings.BASE_DIR, stdout=log, stderr=subprocess.STDOUT,
+            )
+            for port in ports
+        ]
+        try:
+            self._wait_ready(workers, ports, directory / 'workers.log')
+            bases = [f'http://127.0.0.1:{port}' for port in ports]
+            self._check_facets(bases[0], options['timeout'])
+            if options['warmup'] > 0:
+                self._traffic(bases, size, options, options['warmup'], options['seed'])
+            results, elapsed = self._traffic(bases, size, options, options['seconds'], options['seed'] + 1)
+            memory = [worker_memory(worker.pid) for worker in workers]
+        finally:
+            for worker in workers:
+                worker.terminate()
+            for worker in workers:
+                worker.wait()
+            log.close()
+        return self._report(results, memory, elapsed)
+
+    def _wait_ready(self, workers, ports, log_path, timeout=60):
+        deadline = time.monotonic() + timeout
+        for worker, port in zip(workers, ports):
+            while True:
+                if worker.poll() is not None:
+                    raise CommandError(f'A worker exited on start-up:\n{log_path.read_text()[-2000:]}')
+                try:
+                    socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                    break
+                except OSError:
+                    if time.monotonic() > deadline:
+                        raise CommandError(f'Workers did not start within {timeout}s')
+                    time.sleep(0.1)
+
+    def _check_facets(self, base, timeout):
+        """Fail unless the seeded universe shows in the facets, as it would in production"""
+        facets = requests.get(f'{base}/api/facets/', timeout=timeout).json()['facets']
+        if not facets['sector']:
+            raise CommandError('The seeded stocks are missing from the facet counts')
+        self.stdout.write(f"Facets: {len(facets['sector'])} sectors, {len(facets['industry'])} industries")
+
+    def _traffic(self, bases, size, options, seconds, seed):
+        """Run the request mix from ``clients`` threads for ``seconds``
+
+        Returns ({kind: [(seconds, error)]}, wall time including the requests
+        still running at the deadline).
+        """
+        universe = symbols(size)
+        # Popular stocks get most views (Zipf)
+        weights = [1 / (rank + 1) for rank in range(size)]
+        kinds, shares = zip(*MIX.items())
+        results = {kind: [] for kind in MIX}
+        lock = threading.Lock()
+        deadline = time.monotonic() + seconds
+
+        def client(number):
+            rng = random.Random(seed * 1000 + number)
+            session = requests.Session()
+            session.get(bases[0] + '/', timeout=options['timeout'])  # CSRF cookie for the screens
+            while time.monotonic() < deadline:
+                kind = rng.choices(kinds, shares)[0]
+                symbol = rng.choices(universe, weights)[0]
+                base = rng.choice(bases)
+                started = time.perf_counter()
+                try:
+                    response = self._request(session, base, kind, symbol, rng, options['timeout'])
+                    error = None if response.status_code == 200 else f'HTTP {response.status_code}'
+                except requests.RequestException as e:
+                    error = str(e)
+                with lock:
+                    results[kind].append((time.perf_counter() - started, error))
+
+        started = time.monotonic()
+        threads = [threading.Thread(target=client, args=(n,)) for n in range(options['clients'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results, time.monotonic() - started
+
+    def _request(self, session, base, kind, symbol, rng, timeout):
+        if kind == 'home':
+            return session.get(f'{base}/', timeout=timeout)
+        if kind == 'screen':
+            form = {'csrfmiddlewaretoken': session.cookies.get('csrftoken', '')}
+            if rng.random() < 0.6:
+                form['min_price'] = f'{rng.uniform(1, 100):.2f}'
+            if rng.random() < 0.5:
+                form['max_pe'] = f'{rng.uniform(5, 60):.2f}'
+            if rng.random() < 0.3:
+                form['min_max_drawdown'] = f'{rng.uniform(-60, -10):.0f}'
+            if rng.random() < 0.3:
+                form['sector'] = rng.choice(['Technology', 'Financial', 'Healthcare', 'Energy'])
+            return session.post(f'{base}/', data=form, timeout=timeout)
+        if kind == 'all_stocks':
+            return session.get(f'{base}/all/', timeout=timeout)
+        if kind == 'analysis':
+            params = {'symbol': symbol, 'period': rng.choice(ANALYSIS_PERIODS)}
+            return session.get(f'{base}/analysis/', params=params, timeout=timeout)
+        if kind == 'stock_detail':
+            return session.get(f'{base}/stock/{symbol}/', timeout=timeout)
+        return session.get(f'{base}/api/summarize-news/{symbol}/', timeout=timeout)
+
+    def _report(self, results, memory, seconds):
+        self.stdout.write(f"{'Request':<16} {'Count':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'Errors':>7}")
+        everything = []
+        errors = []
+        for kind, samples in results.items():
+            times = sorted(elapsed for elapsed, _ in samples)
+            failed = [error for _, error in samples if error]
+            everything += times
+            errors += failed
+            if not times:
+                self.stdout.write(f'{kind:<16} {0:7d}')
+                continue
+            self.stdout.write(
+                f'{kind:<16} {len(times):7d} {percentile(times, 50):8.1f} {percentile(times, 95):8.1f} '
+                f'{percentile(times, 99):8.1f} {len(failed):7d}'
+            )
+
+        everything.sort()
+        summary = {'throughput': len(everything) / seconds, 'errors': len(errors), 'p50': 0, 'p95': 0, 'p99': 0}
+        if everything:
+            summary.update(p50=percentile(everything, 50), p95=percentile(everything, 95),
+                           p99=percentile(everything, 99))
+        self.stdout.write(
+            f"{'all':<16} {len(everything):7d} {summary['p50']:8.1f} {summary['p95']:8.1f} "
+            f"{summary['p99']:8.1f} {len(errors):7d}   {summary['throughput']:.1f} req/s"
+        )
+
+        measured = [m for m in memory if m is not None]
+        summary['peak'] = max((peak for _, peak in measured), default=0)
+        if measured:
+            self.stdout.write('Worker memory: ' + ', '.join(
+                f'{rss:.0f} MB (peak {peak:.0f} MB)' for rss, peak in measured
+            ))
+        else:
+            self.stdout.write('Worker memory: not available on this platform')
+        style = self.style.ERROR if errors else self.style.SUCCESS
+        self.stdout.write(style(f'Errors: {len(errors)}' + (f', first: {errors[0]}' if errors else '')))
+        return summary
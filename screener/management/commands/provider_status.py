@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from screener import provider
+
+
+class Command(BaseCommand):
+    help = 'Shows Yahoo Finance call counts and circuit breaker states across all workers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Reset the counters after printing them')
+        parser.add_argument('--close', action='store_true', help='Close every open circuit breaker')
+
+    def handle(self, *args, **options):
+        for endpoint, stats in provider.stats().items():
+            self.stdout.write(
+                f"{endpoint:<9} {stats['state']:<10} calls {stats['calls']:>7}  "
+                f"throttled {stats['throttled']:>6}  failures {stats['failures']:>6}  "
+                f"short-circuited {stats['short_circuited']:>6}"
+            )
+        
+        if options['close']:
+            for endpoint in provider.ENDPOINTS:
+                provider.get_breaker(endpoint).reset()
+            self.stdout.write(self.style.SUCCESS('Circuit breakers closed.'))
+        if options['reset']:
+            provider.reset_stats()
+            self.stdout.write(self.style.SUCCESS('Counters reset.'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from screener.facets import facet_counts, rebuild_facets
+
+
+class Command(BaseCommand):
+    help = 'Recomputes screener facet counts (run after bulk updates that bypass model signals)'
+
+    def handle(self, *args, **options):
+        rebuild_facets()
+        
+        for facet, values in facet_counts().items():
+            self.stdout.write(f'{facet}: {len(values)} values')
+        
+        self.stdout.write(self.style.SUCCESS('Facet counts rebuilt.'))
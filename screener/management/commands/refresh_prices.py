@@ -0,0 +1,80 @@
+from django.core.management.base import BaseCommand, CommandError
+from screener import alerts, prices, risk, similarity, sparklines
+from screener.models import Stock
+
+BENCHMARKS = ['^GSPC', '^IXIC']
+
+
+class Command(BaseCommand):
+    help = 'Downloads price bars from Yahoo Finance into the price store'
+
+    def add_arguments(self, parser):
+        parser.add_argument('symbols', nargs='*', help='Symbols to refresh (default: all stocks and benchmarks)')
+        parser.add_argument(
+            '--intervals', default='1d',
+            help='Comma-separated bar intervals to download, e.g. 1d,1m. '
+                 'Coarser intraday bars are resampled from the finest stored interval.',
+        )
+        parser.add_argument('--period', help='Period to download (default: the longest Yahoo Finance serves)')
+        parser.add_argument(
+            '--skip-similarity', action='store_true',
+            help='Do not rebuild the similarity index after downloading daily bars',
+        )
+        parser.add_argument(
+            '--skip-sparklines', action='store_true',
+            help='Do not rebuild the list-view sparklines of the refreshed stocks',
+        )
+        parser.add_argument(
+            '--skip-risk', action='store_true',
+            help='Do not recompute the drawdown and tail-risk fields of the refreshed stocks',
+        )
+        parser.add_argument(
+            '--skip-alerts', action='store_true',
+            help='Do not evaluate the saved screen rules after downloading',
+        )
+
+    def handle(self, *args, **options):
+        intervals = [i.strip() for i in options['intervals'].split(',') if i.strip()]
+        unknown = [i for i in intervals if i not in prices.INTERVAL_MINUTES]
+        if unknown:
+            raise CommandError(f"Unknown interval(s): {', '.join(unknown)}")
+        
+        symbols = [s.upper() for s in options['symbols']]
+        if not symbols:
+            symbols = list(Stock.objects.values_list('symbol', flat=True)) + BENCHMARKS
+        
+        refreshed = 0
+        failed = 0
+        for symbol in symbols:
+            for interval in intervals:
+                try:
+                    chunks = prices.download_bars(symbol, interval, options['period'])
+                except Exception as e:
+                    failed += 1
+                    self.stdout.write(self.style.ERROR(f'{symbol} {interval}: {e}'))
+                    continue
+                refreshed += 1
+                self.stdout.write(f'{symbol} {interval}: {chunks} chunk(s) written')
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'\nRefreshed {refreshed} series ({failed} failed).')
+        )
+        
+        if refreshed and not options['skip_sparklines']:
+            written = sparklines.update(symbols)
+            self.stdout.write(f'Sparklines rebuilt for {written} stock(s).')
+        
+        if '1d' in intervals and refreshed and not options['skip_risk']:
+            written = risk.update(symbols)
+            self.stdout.write(f'Risk metrics recomputed for {written} stock(s).')
+        
+        if '1d' in intervals and refreshed and not options['skip_similarity']:
+            index = similarity.build()
+            self.stdout.write(f'Similarity index rebuilt: {len(index)} stocks, {len(index.clusters())} clusters.')
+        
+        if refreshed and not options['skip_alerts']:
+            evaluation = alerts.evaluate()
+            self.stdout.write(
+                f'Alert rules evaluated on {evaluation.symbols} changed stock(s): '
+                f'{len(evaluation.alerts)} new alert(s).'
+            )
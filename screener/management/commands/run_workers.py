@@ -0,0 +1,77 @@
+import os
+import socket
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from screener import jobs
+
+
+class Command(BaseCommand):
+    help = 'Runs queued analysis jobs (correlation matrices, backtests, bulk imports)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1, help='Worker threads in this process (default: 1)')
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is empty')
+        parser.add_argument('--poll', type=float, default=1.0, help='Seconds between polls of an empty queue')
+        parser.add_argument(
+            '--stale-after', type=float, default=120,
+            help='Requeue running jobs whose heartbeat is older than this many seconds (dead worker)',
+        )
+        parser.add_argument('--prune-days', type=int, default=7, help='Delete finished jobs older than this')
+
+    def handle(self, *args, **options):
+        requeued = jobs.requeue_stale(options['stale_after'])
+        pruned = jobs.prune(options['prune_days'])
+        if requeued or pruned:
+            self.stdout.write(f'Requeued {requeued} stale job(s), pruned {pruned} old job(s).')
+        
+        stop = threading.Event()
+        prefix = f'{socket.gethostname()}:{os.getpid()}'
+        threads = [
+            threading.Thread(target=self._work, args=(f'{prefix}:{i}', options, stop), daemon=True)
+            for i in range(max(options['workers'], 1))
+        ]
+        for thread in threads:
+            thread.start()
+        
+        self.stdout.write(f'{len(threads)} worker(s) started, waiting for jobs...')
+        # Workers of other processes may die at any time: look for their
+        # jobs again every half stale period, not only at startup
+        check_every = max(options['stale_after'] / 2, jobs.HEARTBEAT_SECONDS)
+        last_check = time.monotonic()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(0.5)
+                    if time.monotonic() - last_check >= check_every:
+                        last_check = time.monotonic()
+                        requeued = jobs.requeue_stale(options['stale_after'])
+                        close_old_connections()
+                        if requeued:
+                            self.stdout.write(f'Requeued {requeued} stale job(s).')
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping after the current jobs...')
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+    def _work(self, worker, options, stop):
+        try:
+            while not stop.is_set():
+                job = jobs.claim_next(worker)
+                if job is None:
+                    if options['once']:
+                        return
+                    stop.wait(options['poll'])
+                    continue
+                
+                self.stdout.write(f'[{worker}] {job.kind} #{job.pk} started')
+                if jobs.run_job(job):
+                    self.stdout.write(self.style.SUCCESS(f'[{worker}] {job.kind} #{job.pk} done'))
+                else:
+                    self.stdout.write(self.style.ERROR(f'[{worker}] {job.kind} #{job.pk} failed'))
+                close_old_connections()
+        finally:
+            close_old_connections()
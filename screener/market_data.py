@@ -0,0 +1,91 @@
+"""Market data provider.
+
+All Yahoo Finance access goes through here so that responses are shared
+between worker processes via ``screener.cache`` instead of being re-fetched
+by every request. Calls are rate limited and circuit broken by
+``screener.provider``; when Yahoo Finance is throttling us or down, the last
+value seen (up to ``SCREENER_PROVIDER_STALE_TIMEOUT`` old) is served instead.
+"""
+from django.conf import settings
+
+from . import cache, provider
+from .lazy import lazy_import
+
+yf = lazy_import('yfinance')
+
+# Cache lifetimes in seconds
+HISTORY_TIMEOUT = 15 * 60
+INTRADAY_HISTORY_TIMEOUT = 60
+INFO_TIMEOUT = 15 * 60
+CALENDAR_TIMEOUT = 6 * 60 * 60
+NEWS_TIMEOUT = 10 * 60
+
+_MISSING = object()
+
+
+def _non_empty(frame):
+    return frame if frame is not None and not frame.empty else None
+
+
+def _fetch(namespace, key, fetch, timeout):
+    """Cached value, else a provider call, else the stale copy while the provider fails"""
+    value = cache.get(namespace, key, _MISSING)
+    if value is not _MISSING:
+        return value
+    try:
+        value = provider.call(namespace, fetch)
+    except Exception:
+        stale = cache.get_stale(namespace, key, _MISSING)
+        if stale is _MISSING:
+            raise
+        return stale
+    if value is not None:
+        cache.set(namespace, key, value, timeout, stale_timeout=settings.SCREENER_PROVIDER_STALE_TIMEOUT)
+    return value
+
+
+def get_history(symbol, period='1y', interval='1d'):
+    """Price history DataFrame, or None if Yahoo Finance returned no rows"""
+    symbol = symbol.upper()
+    timeout = HISTORY_TIMEOUT if interval.endswith(('d', 'wk', 'mo')) else INTRADAY_HISTORY_TIMEOUT
+    return _fetch(
+        'history', f'{symbol}:{period}:{interval}',
+        lambda: _non_empty(yf.Ticker(symbol).history(period=period, interval=interval)),
+        timeout,
+    )
+
+
+def get_info(symbol, fresh=False):
+    """``Ticker.info`` dict; ``fresh`` bypasses (and refreshes) the cache"""
+    symbol = symbol.upper()
+    if fresh:
+        info = provider.call('info', lambda: yf.Ticker(symbol).info)
+        cache.set('info', symbol, info, INFO_TIMEOUT, stale_timeout=settings.SCREENER_PROVIDER_STALE_TIMEOUT)
+        return info
+    return _fetch('info', symbol, lambda: yf.Ticker(symbol).info, INFO_TIMEOUT)
+
+
+def get_calendar(symbol):
+    symbol = symbol.upper()
+    return _fetch('calendar', symbol, lambda: yf.Ticker(symbol).calendar, CALENDAR_TIMEOUT)
+
+
+def get_news(symbol):
+    symbol = symbol.upper()
+    return _fetch('news', symbol, lambda: yf.Ticker(symbol).news, NEWS_TIMEOUT)
+
+
+def stock_fields(symbol, info):
+    """``Stock`` field values from a ``Ticker.info`` dict"""
+    return {
+        'name': info.get('longName', symbol),
+        'sector': info.get('sector', ''),
+        'industry': info.get('industry', ''),
+        'market_cap': info.get('marketCap'),
+        'current_price': info.get('regularMarketPrice') or info.get('currentPrice'),
+        'pe_ratio': info.get('trailingPE'),
+        'dividend_yield': info.get('dividendYield'),
+        'fifty_two_week_high': info.get('fiftyTwoWeekHigh'),
+        'fifty_two_week_low': info.get('fiftyTwoWeekLow'),
+        'volume': info.get('volume'),
+    }
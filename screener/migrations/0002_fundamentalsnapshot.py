@@ -0,0 +1,54 @@
+# Generated by Django 4.2.30 on 2026-10-19 16:49
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+TRACKED_FIELDS = (
+    'market_cap', 'current_price', 'pe_ratio', 'dividend_yield',
+    'fifty_two_week_high', 'fifty_two_week_low', 'volume',
+)
+
+
+def seed_snapshots(apps, schema_editor):
+    """Start the history of existing stocks from their current values"""
+    Stock = apps.get_model('screener', 'Stock')
+    FundamentalSnapshot = apps.get_model('screener', 'FundamentalSnapshot')
+    today = timezone.localdate()
+    FundamentalSnapshot.objects.bulk_create([
+        FundamentalSnapshot(
+            symbol=stock.symbol.upper(),
+            date=today,
+            values={field: getattr(stock, field) for field in TRACKED_FIELDS},
+        )
+        for stock in Stock.objects.all()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('screener', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FundamentalSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('symbol', models.CharField(max_length=10)),
+                ('date', models.DateField()),
+                ('values', models.JSONField(default=dict)),
+                ('recorded_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['symbol', 'date'],
+                'indexes': [models.Index(fields=['date', 'symbol'], name='snapshot_date_symbol_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='fundamentalsnapshot',
+            constraint=models.UniqueConstraint(fields=('symbol', 'date'), name='unique_snapshot_per_symbol_date'),
+        ),
+        migrations.RunPython(seed_snapshots, migrations.RunPython.noop),
+    ]
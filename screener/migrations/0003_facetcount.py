@@ -0,0 +1,82 @@
+# Generated by Django 4.2.30 on 2026-10-19 16:50
+
+from django.db import migrations, models
+
+
+# The facets as of this migration; screener.facets may change them later
+MISSING = 'N/A'
+
+PE_BUCKETS = [
+    ('< 0', None, 0),
+    ('0-15', 0, 15),
+    ('15-25', 15, 25),
+    ('25-40', 25, 40),
+    ('> 40', 40, None),
+]
+
+MARKET_CAP_BANDS = [
+    ('Micro (< 300M)', None, 300e6),
+    ('Small (300M-2B)', 300e6, 2e9),
+    ('Mid (2B-10B)', 2e9, 10e9),
+    ('Large (10B-200B)', 10e9, 200e9),
+    ('Mega (> 200B)', 200e9, None),
+]
+
+FACETS = {
+    'sector': ('sector', None),
+    'industry': ('industry', None),
+    'pe_bucket': ('pe_ratio', PE_BUCKETS),
+    'market_cap_band': ('market_cap', MARKET_CAP_BANDS),
+}
+
+
+def bucket_label(value, buckets):
+    if value is None:
+        return MISSING
+    for label, low, high in buckets:
+        if (low is None or value >= low) and (high is None or value < high):
+            return label
+    return MISSING
+
+
+def seed_facet_counts(apps, schema_editor):
+    """Count the facets of existing stocks"""
+    Stock = apps.get_model('screener', 'Stock')
+    FacetCount = apps.get_model('screener', 'FacetCount')
+    counts = {}
+    for stock in Stock.objects.all():
+        for facet, (field, buckets) in FACETS.items():
+            value = getattr(stock, field)
+            key = (facet, bucket_label(value, buckets) if buckets else (value or MISSING))
+            counts[key] = counts.get(key, 0) + 1
+    FacetCount.objects.bulk_create([
+        FacetCount(facet=facet, value=value, count=count)
+        for (facet, value), count in counts.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('screener', '0002_fundamentalsnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FacetCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('facet', models.CharField(max_length=30)),
+                ('value', models.CharField(max_length=100)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['facet', 'value'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='facetcount',
+            constraint=models.UniqueConstraint(fields=('facet', 'value'), name='unique_facet_value'),
+        ),
+        migrations.RunPython(seed_facet_counts, migrations.RunPython.noop),
+    ]
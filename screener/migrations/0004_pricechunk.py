@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-19 16:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('screener', '0003_facetcount'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('symbol', models.CharField(max_length=10)),
+                ('interval', models.CharField(max_length=5)),
+                ('start', models.DateTimeField()),
+                ('end', models.DateTimeField()),
+                ('rows', models.IntegerField()),
+                ('data', models.BinaryField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['symbol', 'interval', 'start'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='pricechunk',
+            constraint=models.UniqueConstraint(fields=('symbol', 'interval', 'start'), name='unique_price_chunk'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.30 on 2026-10-19 17:23
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('screener', '0005_analysisjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScreenRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('expression', models.TextField()),
+                ('enabled', models.BooleanField(default=True)),
+                ('matches', models.JSONField(blank=True, default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Alert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('symbol', models.CharField(max_length=10)),
+                ('values', models.JSONField(default=dict)),
+                ('triggered_at', models.DateTimeField(auto_now_add=True)),
+                ('rule', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alerts', to='screener.screenrule')),
+            ],
+            options={
+                'ordering': ['-triggered_at', 'symbol'],
+                'indexes': [models.Index(fields=['triggered_at'], name='alert_triggered_idx'), models.Index(fields=['rule', 'triggered_at'], name='alert_rule_triggered_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.30 on 2026-10-19 17:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('screener', '0006_screenrule_alert'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Sparkline',
+            fields=[
+                ('stock', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='sparkline', serialize=False, to='screener.stock')),
+                ('closes', models.JSONField(default=list)),
+                ('change', models.FloatField(blank=True, null=True)),
+                ('svg', models.TextField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-19 17:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('screener', '0007_sparkline'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stock',
+            name='cvar_95',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='stock',
+            name='max_drawdown',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='stock',
+            name='max_drawdown_duration',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='stock',
+            name='omega_ratio',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='stock',
+            name='ulcer_index',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
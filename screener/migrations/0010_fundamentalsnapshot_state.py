@@ -0,0 +1,34 @@
+# Generated by Django 4.2.30 on 2026-10-19 21:40
+
+from django.db import migrations, models
+
+
+def fold_states(apps, schema_editor):
+    """Store on every existing snapshot the fold of its symbol's changes up to its date"""
+    FundamentalSnapshot = apps.get_model('screener', 'FundamentalSnapshot')
+    snapshots = []
+    state = {}
+    symbol = None
+    for snapshot in FundamentalSnapshot.objects.order_by('symbol', 'date').iterator():
+        if snapshot.symbol != symbol:
+            symbol, state = snapshot.symbol, {}
+        state = {**state, **snapshot.values}
+        snapshot.state = state
+        snapshots.append(snapshot)
+    FundamentalSnapshot.objects.bulk_update(snapshots, ['state'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('screener', '0009_analysisjob_heartbeat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fundamentalsnapshot',
+            name='state',
+            field=models.JSONField(default=dict),
+        ),
+        migrations.RunPython(fold_states, migrations.RunPython.noop),
+    ]
@@ -15,6 +15,12 @@ class Stock(models.Model):
     fifty_two_week_high = models.FloatField(null=True, blank=True)
     fifty_two_week_low = models.FloatField(null=True, blank=True)
     volume = models.BigIntegerField(null=True, blank=True)
+    # Risk over the last year of daily bars, written by screener.risk.update
+    max_drawdown = models.FloatField(null=True, blank=True)
+    max_drawdown_duration = models.IntegerField(null=True, blank=True)
+    cvar_95 = models.FloatField(null=True, blank=True)
+    ulcer_index = models.FloatField(null=True, blank=True)
+    omega_ratio = models.FloatField(null=True, blank=True)
     last_updated = models.DateTimeField(auto_now=True)
     
     class Meta:
@@ -23,3 +29,193 @@ class Stock(models.Model):
     def __str__(self):
         return f"{self.symbol} - {self.name}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        stock = super().from_db(db, field_names, values)
+        # Stored values, so the save signals can tell what changed without
+        # reading the row again
+        stock._loaded_values = dict(zip(field_names, values))
+        return stock
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._loaded_values = {
+            field.attname: getattr(self, field.attname)
+            for field in self._meta.concrete_fields if field.attname in self.__dict__
+        }
+
+
+class FundamentalSnapshot(models.Model):
+    """Append-only point-in-time record of a stock's fundamentals.
+
+    Each row stores the fields that changed since the previous snapshot of
+    the same symbol in ``values``, and every tracked field as of its date in
+    ``state``, so a lookup reads one row instead of the whole history; see
+    ``screener.snapshots``.
+    """
+    symbol = models.CharField(max_length=10)
+    date = models.DateField()
+    values = models.JSONField(default=dict)
+    state = models.JSONField(default=dict)
+    recorded_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['symbol', 'date']
+        constraints = [
+            models.UniqueConstraint(fields=['symbol', 'date'], name='unique_snapshot_per_symbol_date'),
+        ]
+        indexes = [
+            # "As of" lookups filter on date first when scanning the universe
+            models.Index(fields=['date', 'symbol'], name='snapshot_date_symbol_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.symbol} @ {self.date}"
+
+
+class FacetCount(models.Model):
+    """Number of stocks per facet value (sector, industry, numeric bucket).
+
+    Maintained incrementally by ``screener.facets`` so the unfiltered screener
+    breakdown never has to scan the Stock table.
+    """
+    facet = models.CharField(max_length=30)
+    value = models.CharField(max_length=100)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['facet', 'value']
+        constraints = [
+            models.UniqueConstraint(fields=['facet', 'value'], name='unique_facet_value'),
+        ]
+
+    def __str__(self):
+        return f"{self.facet}={self.value}: {self.count}"
+
+
+class PriceChunk(models.Model):
+    """A compressed block of OHLCV bars for one symbol and bar interval.
+
+    Bars are stored in chunks (a trading day of minute bars, a month of hourly
+    bars, a year of daily bars) rather than one row per bar, which keeps
+    minute-level history compact and lets ``screener.prices`` stream it chunk
+    by chunk.
+    """
+    symbol = models.CharField(max_length=10)
+    interval = models.CharField(max_length=5)
+    start = models.DateTimeField()
+    end = models.DateTimeField()
+    rows = models.IntegerField()
+    data = models.BinaryField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['symbol', 'interval', 'start']
+        constraints = [
+            models.UniqueConstraint(fields=['symbol', 'interval', 'start'], name='unique_price_chunk'),
+        ]
+
+    def __str__(self):
+        return f"{self.symbol} {self.interval} {self.start:%Y-%m-%d} ({self.rows} bars)"
+
+
+class AnalysisJob(models.Model):
+    """A long-running computation queued for the ``run_workers`` command.
+
+    Jobs are claimed straight from this table, so no external broker is
+    needed; ``screener.jobs`` holds the handlers and the queue operations.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=30)
+    key = models.CharField(max_length=200, blank=True, default='')
+    params = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    progress = models.FloatField(default=0)
+    message = models.CharField(max_length=200, blank=True, default='')
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True, default='')
+    worker = models.CharField(max_length=100, blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # Workers claim the oldest queued job; views look jobs up by key
+            models.Index(fields=['status', 'created_at'], name='job_status_created_idx'),
+            models.Index(fields=['key', 'status'], name='job_key_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
+
+    @property
+    def finished(self):
+        return self.status in (self.DONE, self.FAILED)
+
+
+class ScreenRule(models.Model):
+    """A saved screen evaluated whenever prices refresh.
+
+    ``expression`` is written in the rule language of ``screener.rules``.
+    ``matches`` holds the symbols currently matching, so ``screener.alerts``
+    only raises an Alert when a symbol starts matching.
+    """
+    name = models.CharField(max_length=100)
+    expression = models.TextField()
+    enabled = models.BooleanField(default=True)
+    matches = models.JSONField(default=list, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return f"{self.name}: {self.expression}"
+
+
+class Alert(models.Model):
+    """A symbol that started matching a screen rule, with the rule's inputs at that time"""
+    rule = models.ForeignKey(ScreenRule, on_delete=models.CASCADE, related_name='alerts')
+    symbol = models.CharField(max_length=10)
+    values = models.JSONField(default=dict)
+    triggered_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-triggered_at', 'symbol']
+        indexes = [
+            # The alerts page lists the latest alerts, overall or for one rule
+            models.Index(fields=['triggered_at'], name='alert_triggered_idx'),
+            models.Index(fields=['rule', 'triggered_at'], name='alert_rule_triggered_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.symbol} @ {self.rule.name} ({self.triggered_at:%Y-%m-%d %H:%M})"
+
+
+class Sparkline(models.Model):
+    """Downsampled recent closes of a stock and their pre-rendered SVG.
+
+    Written by ``screener.sparklines`` when prices are refreshed, so the list
+    views can show every stock's trend without loading any price bars.
+    """
+    stock = models.OneToOneField(Stock, on_delete=models.CASCADE, primary_key=True, related_name='sparkline')
+    closes = models.JSONField(default=list)
+    change = models.FloatField(null=True, blank=True)
+    svg = models.TextField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.stock.symbol} sparkline ({len(self.closes)} points)"
@@ -0,0 +1,165 @@
+"""Offline stand-ins for Yahoo Finance and the Anthropic API.
+
+The module has the surface the app uses of both libraries (``Ticker`` and
+``Anthropic``) and serves deterministic data derived from the symbol, after
+an optional simulated network latency. ``install`` points
+``screener.market_data`` and ``import anthropic`` at it in the current
+process; the ``load_test`` command does so in its web workers so that they
+can be measured without network access or API costs.
+"""
+import sys
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from .lazy import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+SECTORS = (
+    'Technology', 'Financial Services', 'Healthcare', 'Consumer Cyclical', 'Consumer Defensive',
+    'Energy', 'Industrials', 'Communication Services', 'Real Estate', 'Utilities', 'Basic Materials',
+)
+
+# Daily bars of each period; every period is the tail of the same MAX_BARS walk
+PERIOD_BARS = {
+    '1d': 1, '5d': 5, '1mo': 21, '3mo': 63, '6mo': 126, '1y': 252,
+    '2y': 504, '5y': 1260, '10y': 2520, 'max': 5040,
+}
+MAX_BARS = PERIOD_BARS['max']
+NEWS_ITEMS = 10
+
+# Simulated round-trip times in seconds, set by ``install``
+_latency = {'provider': 0.0, 'llm': 0.0}
+
+
+def install(provider_latency=0.0, llm_latency=0.0):
+    """Serve market data and LLM summaries from this module in the current process"""
+    from . import market_data
+
+    _latency.update(provider=provider_latency, llm=llm_latency)
+    market_data.yf = sys.modules[__name__]
+    sys.modules['anthropic'] = sys.modules[__name__]
+
+
+def _rng(symbol, stream):
+    return np.random.default_rng([zlib.crc32(symbol.encode()), stream])
+
+
+def _wait(kind):
+    if _latency[kind]:
+        time.sleep(_latency[kind])
+
+
+def closes(symbol, bars=MAX_BARS):
+    """The last ``bars`` daily closes of a symbol's deterministic random walk"""
+    rng = _rng(symbol, 0)
+    start = rng.lognormal(4, 1)
+    volatility = rng.uniform(0.008, 0.03)
+    walk = start * np.exp(np.cumsum(rng.normal(0.0003, volatility, MAX_BARS)))
+    return walk[-bars:]
+
+
+class Ticker:
+    """``yfinance.Ticker`` serving daily bars, fundamentals, calendar and news"""
+
+    def __init__(self, symbol):
+        self.symbol = symbol.upper()
+
+    def history(self, period='1mo', interval='1d'):
+        """Daily bars only: other intervals return no rows, like an unlisted symbol"""
+        _wait('provider')
+        if interval != '1d':
+            return pd.DataFrame(columns=['Open', 'High', 'Low', 'Close', 'Volume'])
+        if period == 'ytd':
+            bars = max(len(pd.bdate_range(f'{datetime.now().year}-01-01', datetime.now())), 1)
+        else:
+            bars = PERIOD_BARS.get(period, PERIOD_BARS['1mo'])
+        close = closes(self.symbol, bars)
+        rng = _rng(self.symbol, 1)
+        spread = np.abs(rng.normal(0, 0.005, bars))
+        return pd.DataFrame({
+            'Open': close * (1 + rng.normal(0, 0.003, bars)),
+            'High': close * (1 + spread),
+            'Low': close * (1 - spread),
+            'Close': close,
+            'Volume': rng.integers(10 ** 5, 10 ** 8, bars),
+        }, index=pd.bdate_range(end=datetime.now().date(), periods=bars, tz='America/New_York'))
+
+    @property
+    def info(self):
+        _wait('provider')
+        year = closes(self.symbol, PERIOD_BARS['1y'])
+        rng = _rng(self.symbol, 2)
+        price = float(year[-1])
+        return {
+            'symbol': self.symbol,
+            'longName': f'{self.symbol} Offline Corp.',
+            'sector': SECTORS[int(rng.integers(len(SECTORS)))],
+            'industry': f'Industry {int(rng.integers(1, 120))}',
+            'marketCap': float(rng.lognormal(22, 2)),
+            'regularMarketPrice': price,
+            'currentPrice': price,
+            'trailingPE': float(rng.uniform(5, 60)) if rng.random() > 0.15 else None,
+            'dividendYield': float(rng.uniform(0, 0.06)) if rng.random() > 0.4 else None,
+            'fiftyTwoWeekHigh': float(year.max()),
+            'fiftyTwoWeekLow': float(year.min()),
+            'volume': int(rng.integers(10 ** 5, 10 ** 8)),
+            'priceToBook': float(rng.uniform(0.5, 15)),
+            'enterpriseToEbitda': float(rng.uniform(3, 40)),
+            'pegRatio': float(rng.uniform(0.3, 4)),
+            'returnOnEquity': float(rng.uniform(-0.2, 0.5)),
+            'returnOnAssets': float(rng.uniform(-0.1, 0.2)),
+            'debtToEquity': float(rng.uniform(0, 250)),
+            'currentRatio': float(rng.uniform(0.5, 4)),
+            'freeCashflow': float(rng.lognormal(20, 2)),
+            'revenueGrowth': float(rng.uniform(-0.2, 0.5)),
+            'profitMargins': float(rng.uniform(-0.1, 0.4)),
+        }
+
+    @property
+    def calendar(self):
+        _wait('provider')
+        days = 1 + zlib.crc32(self.symbol.encode()) % 90
+        return {'Earnings Date': [datetime.now().date() + timedelta(days=days)]}
+
+    @property
+    def news(self):
+        _wait('provider')
+        now = datetime.now(timezone.utc)
+        return [
+            {
+                'id': f'{self.symbol}-{i}',
+                'content': {
+                    'title': f'{self.symbol}: market update {i + 1}',
+                    'summary': f'Offline news item {i + 1} about {self.symbol} for load tests. ' * 4,
+                    'pubDate': (now - timedelta(hours=6 * i)).strftime('%Y-%m-%dT%H:%M:%SZ'),
+                    'provider': {'displayName': 'Offline Wire'},
+                    'canonicalUrl': {'url': f'https://example.com/{self.symbol.lower()}/{i}'},
+                },
+            }
+            for i in range(NEWS_ITEMS)
+        ]
+
+
+class Anthropic:
+    """``anthropic.Anthropic`` whose messages echo a fixed French summary"""
+
+    def __init__(self, api_key=None, **kwargs):
+        self.messages = SimpleNamespace(create=self._create)
+
+    def _create(self, model, max_tokens, messages, **kwargs):
+        _wait('llm')
+        prompt = messages[-1]['content']
+        text = (
+            '1. **Tendance générale** : neutre\n'
+            '2. **Points clés** : résumé hors ligne pour les tests de charge\n'
+            '3. **Impact potentiel** : aucun'
+        )
+        return SimpleNamespace(
+            model=model,
+            content=[SimpleNamespace(type='text', text=text)],
+            usage=SimpleNamespace(input_tokens=len(prompt) // 4, output_tokens=len(text) // 4),
+        )
@@ -0,0 +1,338 @@
+"""Price store and resampling pipeline.
+
+OHLCV bars are persisted in PriceChunk rows: a trading day of minute bars, a
+month of hourly bars or a year of daily bars per row, as a zlib-compressed
+NumPy record array. Reads stream chunk by chunk, and intervals that are not
+stored are produced by resampling a finer stored interval instead of being
+downloaded separately.
+"""
+import math
+import zlib
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Max, Min
+
+from . import market_data, versions
+from .db import retry_on_lock
+from .lazy import lazy_import
+from .models import PriceChunk
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+# Minutes per bar; a daily bar is one 390-minute US trading session
+INTERVAL_MINUTES = {
+    '1m': 1,
+    '5m': 5,
+    '15m': 15,
+    '30m': 30,
+    '1h': 60,
+    '1d': 390,
+}
+TRADING_DAYS_PER_YEAR = 252
+TRADING_MINUTES_PER_DAY = 390
+
+# Longest history Yahoo Finance serves for each interval
+MAX_DOWNLOAD_PERIOD = {
+    '1m': '7d',
+    '5m': '60d',
+    '15m': '60d',
+    '30m': '60d',
+    '1h': '730d',
+    '1d': '5y',
+}
+
+# How far after the start of a period the first bar may be and still cover it
+COVERAGE_SLACK = timedelta(days=4)
+
+COLUMNS = ('Open', 'High', 'Low', 'Close', 'Volume')
+# Record layout of a stored chunk (a dtype spec, so NumPy is only loaded when used)
+_DTYPE = [('ts', '<i8')] + [(column, '<f8') for column in COLUMNS]
+_AGGREGATIONS = {'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last', 'Volume': 'sum'}
+
+
+def is_intraday(interval):
+    return INTERVAL_MINUTES[interval] < TRADING_MINUTES_PER_DAY
+
+
+def bars_per_session(interval):
+    """Bars in a trading session; the last intraday bar may be shorter (7 hourly bars, the last of 30 minutes)"""
+    return math.ceil(TRADING_MINUTES_PER_DAY / INTERVAL_MINUTES[interval])
+
+
+def periods_per_year(interval):
+    """Number of bars in a trading year, used to annualize returns and volatility"""
+    return TRADING_DAYS_PER_YEAR * bars_per_session(interval)
+
+
+# Encoding ---------------------------------------------------------------
+
+def _normalize(frame):
+    frame = frame[list(COLUMNS)].astype(float)
+    index = frame.index if frame.index.tz is not None else frame.index.tz_localize('UTC')
+    frame.index = index.tz_convert('UTC')
+    frame = frame[~frame.index.duplicated(keep='last')]
+    return frame.sort_index()
+
+
+def _encode(frame):
+    records = np.empty(len(frame), dtype=_DTYPE)
+    records['ts'] = frame.index.as_unit('ns').asi8
+    for column in COLUMNS:
+        records[column] = frame[column].to_numpy(dtype=float)
+    return zlib.compress(records.tobytes(), 6)
+
+
+def _decode(data):
+    records = np.frombuffer(zlib.decompress(bytes(data)), dtype=_DTYPE)
+    index = pd.to_datetime(records['ts'], utc=True)
+    return pd.DataFrame({column: records[column] for column in COLUMNS}, index=index)
+
+
+def _chunk_starts(index, interval):
+    """Start of the chunk each bar belongs to"""
+    naive = index.tz_convert('UTC').tz_localize(None)
+    if INTERVAL_MINUTES[interval] < 60:
+        starts = naive.normalize()
+    elif is_intraday(interval):
+        starts = naive.to_period('M').to_timestamp()
+    else:
+        starts = naive.to_period('Y').to_timestamp()
+    return starts.tz_localize('UTC')
+
+
+# Writing ----------------------------------------------------------------
+
+@retry_on_lock
+def store_bars(symbol, interval, frame):
+    """Merge bars into the store, newer values winning; returns the chunks written"""
+    if frame is None or frame.empty:
+        return 0
+    symbol = symbol.upper()
+    frame = _normalize(frame)
+    starts = _chunk_starts(frame.index, interval)
+
+    written = 0
+    with transaction.atomic():
+        existing = {
+            chunk.start: chunk
+            for chunk in PriceChunk.objects.filter(
+                symbol=symbol, interval=interval, start__in=list(starts.unique().to_pydatetime())
+            )
+        }
+        for start, part in frame.groupby(starts):
+            start = start.to_pydatetime()
+            if start in existing:
+                stored = _decode(existing[start].data)
+                part = pd.concat([stored[~stored.index.isin(part.index)], part]).sort_index()
+            PriceChunk.objects.update_or_create(
+                symbol=symbol, interval=interval, start=start,
+                defaults={
+                    'end': part.index[-1].to_pydatetime(),
+                    'rows': len(part),
+                    'data': _encode(part),
+                },
+            )
+            written += 1
+    versions.bump(symbol)
+    return written
+
+
+# Reading ----------------------------------------------------------------
+
+def iter_chunks(symbol, interval, start=None, end=None):
+    """Yield the stored bars of a symbol one chunk (DataFrame) at a time"""
+    chunks = PriceChunk.objects.filter(symbol=symbol.upper(), interval=interval)
+    if start is not None:
+        chunks = chunks.filter(end__gte=start)
+    if end is not None:
+        chunks = chunks.filter(start__lte=end)
+
+    for data in chunks.order_by('start').values_list('data', flat=True).iterator():
+        frame = _decode(data)
+        if start is not None:
+            frame = frame[frame.index >= start]
+        if end is not None:
+            frame = frame[frame.index <= end]
+        if not frame.empty:
+            yield frame
+
+
+def _resample_days(frame, interval):
+    if not is_intraday(interval):
+        bars = frame.resample('1D', label='left', closed='left').agg(_AGGREGATIONS)
+    else:
+        # Bins start at each session's first bar, like Yahoo's intraday bars
+        rule = f'{INTERVAL_MINUTES[interval]}min'
+        bars = frame.groupby(frame.index.normalize(), group_keys=False).apply(
+            lambda day: day.resample(rule, origin='start', label='left', closed='left').agg(_AGGREGATIONS)
+        )
+    return bars.dropna(subset=['Close'])
+
+
+def resample_stream(frames, interval):
+    """Resample a stream of bar frames to a coarser interval, chunk by chunk
+
+    The bars of the last day of each chunk are held back and prepended to the
+    next chunk, so a session split across chunks is binned as a whole while
+    only one chunk is in memory at a time.
+    """
+    carry = None
+    for frame in frames:
+        if carry is not None:
+            frame = pd.concat([carry, frame])
+        days = frame.index.normalize()
+        complete, carry = frame[days < days[-1]], frame[days == days[-1]]
+        if not complete.empty:
+            yield _resample_days(complete, interval)
+
+    if carry is not None and not carry.empty:
+        yield _resample_days(carry, interval)
+
+
+def _source_interval(symbol, interval, start=None):
+    """Pick the stored interval to read: the interval itself, or the coarsest
+    finer interval covering ``start`` (else the one with the longest history)"""
+    coverage = dict(
+        PriceChunk.objects.filter(symbol=symbol)
+        .values('interval').annotate(first=Min('start'))
+        .values_list('interval', 'first')
+    )
+    if interval in coverage:
+        return interval
+
+    candidates = [
+        stored for stored in coverage
+        if stored in INTERVAL_MINUTES
+        and INTERVAL_MINUTES[stored] < INTERVAL_MINUTES[interval]
+        and (not is_intraday(interval) or INTERVAL_MINUTES[interval] % INTERVAL_MINUTES[stored] == 0)
+    ]
+    if not candidates:
+        return None
+    covering = [c for c in candidates if start is None or coverage[c] <= start]
+    if covering:
+        return max(covering, key=INTERVAL_MINUTES.get)
+    return min(candidates, key=lambda c: coverage[c])
+
+
+def period_start(period, last_bar):
+    """Start of a Yahoo-style period ('5d', '1mo', '1y', ...) ending at the last bar"""
+    if period == 'max':
+        return None
+    if period.endswith('mo'):
+        return last_bar - pd.DateOffset(months=int(period[:-2]))
+    if period.endswith('y'):
+        return last_bar - pd.DateOffset(years=int(period[:-1]))
+    if period.endswith('d'):
+        # Trading sessions, counting the last one
+        return last_bar.normalize() - pd.offsets.BDay(int(period[:-1]) - 1)
+    raise ValueError(f'Unsupported period: {period}')
+
+
+def load_bars(symbol, interval, period=None, start=None, end=None):
+    """Return stored (or resampled) bars as a DataFrame, or None if unavailable"""
+    symbol = symbol.upper()
+    source = _source_interval(symbol, interval, start)
+    if source is None:
+        return None
+
+    if period is not None:
+        last = PriceChunk.objects.filter(symbol=symbol, interval=source).aggregate(last=Max('end'))['last']
+        start = period_start(period, pd.Timestamp(last))
+
+    frames = iter_chunks(symbol, source, start=start, end=end)
+    if source != interval:
+        frames = resample_stream(frames, interval)
+    frames = list(frames)
+    return pd.concat(frames) if frames else None
+
+
+def download_bars(symbol, interval, period=None):
+    """Download bars from Yahoo Finance into the store; returns the chunks written"""
+    frame = market_data.get_history(symbol, period or MAX_DOWNLOAD_PERIOD[interval], interval)
+    return store_bars(symbol, interval, frame)
+
+
+def _covers(bars, period):
+    """Whether bars reach back to the start of the period (give or take a long weekend)"""
+    return bars.index[0] <= period_start(period, bars.index[-1]) + COVERAGE_SLACK
+
+
+def _last_bar(symbol, interval):
+    last = PriceChunk.objects.filter(symbol=symbol, interval=interval).aggregate(last=Max('end'))['last']
+    return None if last is None else pd.Timestamp(last)
+
+
+def refresh_tail(symbol, interval):
+    """Download the latest bars of a stored interval and store the new or changed ones; returns the chunks written
+
+    The last stored bar is compared too, since it may have been downloaded
+    while still forming. Nothing is written (and no page version bumped)
+    when the provider has nothing newer.
+    """
+    symbol = symbol.upper()
+    last = _last_bar(symbol, interval)
+    if last is None:
+        return download_bars(symbol, interval)
+    recent = pd.Timestamp.now(tz='UTC') - last < pd.Timedelta(days=5)
+    frame = market_data.get_history(symbol, '5d' if recent else MAX_DOWNLOAD_PERIOD[interval], interval)
+    if frame is None or frame.empty:
+        return 0
+    frame = _normalize(frame)
+    frame = frame[frame.index >= last]
+    stored = next(iter_chunks(symbol, interval, start=last), None)
+    if stored is not None:
+        frame = frame[~(frame == stored.reindex(frame.index)).all(axis=1)]
+    return store_bars(symbol, interval, frame)
+
+
+def is_stale(last_bar, interval):
+    """Whether a bar stream ending at ``last_bar`` may have a newer bar at the provider
+
+    That is once it is older than one bar and than the provider cache
+    lifetime, so a page refresh never downloads more often than
+    ``market_data`` would serve a new response.
+    """
+    limit = max(
+        pd.Timedelta(minutes=INTERVAL_MINUTES[interval]),
+        pd.Timedelta(seconds=market_data.INTRADAY_HISTORY_TIMEOUT),
+    )
+    return pd.Timestamp.now(tz='UTC') - last_bar > limit
+
+
+def get_bars(symbol, interval, period):
+    """Bars for a period, downloading the interval only if nothing stored can produce it
+
+    Bars resampled from a finer interval that does not reach back far enough
+    (a year of daily bars from a week of minute bars) also trigger a download.
+    Stored intraday bars are topped up from the provider once stale.
+    """
+    symbol = symbol.upper()
+    bars = load_bars(symbol, interval, period=period)
+    if bars is not None and not _covers(bars, period):
+        if not PriceChunk.objects.filter(symbol=symbol, interval=interval).exists():
+            bars = None
+    if bars is None:
+        if download_bars(symbol, interval):
+            bars = load_bars(symbol, interval, period=period)
+        return bars
+
+    if is_intraday(interval):
+        source = _source_interval(symbol, interval)
+        if is_stale(_last_bar(symbol, source), source):
+            try:
+                refreshed = refresh_tail(symbol, source)
+            except Exception:
+                # Provider unavailable: the stored bars are the best we have
+                refreshed = 0
+            if refreshed:
+                bars = load_bars(symbol, interval, period=period)
+    return bars
+
+
+def get_history(symbol, period, interval='1d'):
+    """Daily history from the provider cache, intraday bars from the price store"""
+    if is_intraday(interval):
+        return get_bars(symbol, interval, period)
+    return market_data.get_history(symbol, period)
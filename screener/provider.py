@@ -0,0 +1,240 @@
+"""Rate limiting and circuit breaking for Yahoo Finance calls.
+
+Every call made by ``screener.market_data`` goes through ``call()``:
+
+- a token bucket caps the request rate for the whole process, or for every
+  process on the host when ``SCREENER_PROVIDER_RATE_FILE`` names a lock file;
+- a circuit breaker per endpoint (history, info, calendar, news) opens after
+  ``SCREENER_BREAKER_THRESHOLD`` consecutive failures. While it is open,
+  calls fail immediately with ``ProviderUnavailable`` instead of waiting on
+  a provider that is down. The open state is kept in the shared state
+  cache so every worker backs off together. After ``SCREENER_BREAKER_RESET_SECONDS``
+  one trial call is let through: success closes the breaker, failure
+  reopens it.
+
+Calls, throttled calls, failures and short-circuited calls are counted in
+the shared state cache for ``stats()``.
+"""
+import threading
+import time
+
+from django.conf import settings
+
+from . import cache
+
+try:
+    import fcntl
+except ImportError:  # no file locks (Windows): the limit is per process
+    fcntl = None
+
+ENDPOINTS = ('history', 'info', 'calendar', 'news')
+OUTCOMES = ('calls', 'throttled', 'failures', 'short_circuited')
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+class ProviderUnavailable(Exception):
+    """The call was not made: rate limit exhausted or circuit breaker open"""
+
+
+class TokenBucket:
+    """Thread-safe token bucket: ``rate`` tokens per second, bursts up to ``capacity``"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, tokens, stamp, now):
+        tokens = min(self.capacity, tokens + (now - stamp) * self.rate)
+        if tokens >= 1:
+            return tokens - 1, 0.0
+        return tokens, (1 - tokens) / self.rate
+
+    def _take(self):
+        """Take a token; returns 0 or the seconds until one is available"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens, wait = self._refill(self._tokens, self._stamp, now)
+            self._stamp = now
+            return wait
+
+    def acquire(self, timeout=0):
+        """Take a token, waiting up to ``timeout`` seconds; False if none came"""
+        deadline = time.monotonic() + timeout
+        while True:
+            wait = self._take()
+            if not wait:
+                return True
+            if time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class FileTokenBucket(TokenBucket):
+    """Token bucket whose state lives in a locked file shared by every process on the host"""
+
+    def __init__(self, path, rate, capacity):
+        super().__init__(rate, capacity)
+        self.path = path
+
+    def _take(self):
+        with self._lock, open(self.path, 'a+') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                try:
+                    tokens, stamp = (float(x) for x in f.read().split())
+                except ValueError:
+                    tokens, stamp = self.capacity, time.time()
+                now = time.time()
+                tokens, wait = self._refill(tokens, stamp, now)
+                f.seek(0)
+                f.truncate()
+                f.write(f'{tokens} {now}')
+                f.flush()
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+        return wait
+
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker for one provider endpoint"""
+
+    def __init__(self, endpoint, threshold, reset_seconds):
+        self.endpoint = endpoint
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self._key = f'provider-breaker:{endpoint}'
+        self._failures = 0
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def state(self):
+        opened_until = cache.state.get(self._key)
+        if opened_until is None:
+            return CLOSED
+        return OPEN if time.time() < opened_until else HALF_OPEN
+
+    def allow(self):
+        state = self.state()
+        if state == CLOSED:
+            return True
+        if state == OPEN:
+            return False
+        # Half-open: one trial call at a time per process
+        with self._lock:
+            if self._trial:
+                return False
+            self._trial = True
+            return True
+
+    def release_trial(self):
+        """The allowed call was not made after all; let another one try"""
+        with self._lock:
+            self._trial = False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._trial = False
+        if self.state() != CLOSED:
+            cache.state.delete(self._key)
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial = False
+            trip = self._failures >= self.threshold or self.state() == HALF_OPEN
+            if trip:
+                self._failures = 0
+        if trip:
+            cache.state.set(self._key, time.time() + self.reset_seconds, timeout=None)
+
+    def reset(self):
+        with self._lock:
+            self._failures = 0
+            self._trial = False
+        cache.state.delete(self._key)
+
+
+_limiter = None
+_breakers = {}
+_lock = threading.Lock()
+
+
+def get_limiter():
+    """The process-wide token bucket configured in settings"""
+    global _limiter
+    with _lock:
+        if _limiter is None:
+            rate = settings.SCREENER_PROVIDER_RATE
+            burst = settings.SCREENER_PROVIDER_BURST
+            path = settings.SCREENER_PROVIDER_RATE_FILE
+            if path and fcntl is not None:
+                _limiter = FileTokenBucket(path, rate, burst)
+            else:
+                _limiter = TokenBucket(rate, burst)
+        return _limiter
+
+
+def get_breaker(endpoint):
+    with _lock:
+        if endpoint not in _breakers:
+            _breakers[endpoint] = CircuitBreaker(
+                endpoint,
+                settings.SCREENER_BREAKER_THRESHOLD,
+                settings.SCREENER_BREAKER_RESET_SECONDS,
+            )
+        return _breakers[endpoint]
+
+
+def _count(endpoint, outcome):
+    cache.incr_counter(f'provider-stats:{endpoint}:{outcome}')
+
+
+def call(endpoint, fetch):
+    """Run ``fetch()`` under the rate limit and the endpoint's circuit breaker
+
+    Raises ``ProviderUnavailable`` without calling ``fetch`` when the breaker
+    is open or no token is available within ``SCREENER_PROVIDER_MAX_WAIT``.
+    """
+    breaker = get_breaker(endpoint)
+    if not breaker.allow():
+        _count(endpoint, 'short_circuited')
+        raise ProviderUnavailable(f'Yahoo Finance {endpoint} is unavailable (circuit open)')
+    if not get_limiter().acquire(settings.SCREENER_PROVIDER_MAX_WAIT):
+        breaker.release_trial()
+        _count(endpoint, 'throttled')
+        raise ProviderUnavailable(f'Yahoo Finance {endpoint} rate limit reached')
+
+    _count(endpoint, 'calls')
+    try:
+        result = fetch()
+    except Exception:
+        _count(endpoint, 'failures')
+        breaker.record_failure()
+        raise
+    breaker.record_success()
+    return result
+
+
+def stats():
+    """Per-endpoint counters across all workers and the breaker state"""
+    keys = [f'provider-stats:{e}:{o}' for e in ENDPOINTS for o in OUTCOMES]
+    counters = cache.state.get_many(keys)
+    return {
+        endpoint: dict(
+            {outcome: counters.get(f'provider-stats:{endpoint}:{outcome}', 0) for outcome in OUTCOMES},
+            state=get_breaker(endpoint).state(),
+        )
+        for endpoint in ENDPOINTS
+    }
+
+
+def reset_stats():
+    cache.state.delete_many([f'provider-stats:{e}:{o}' for e in ENDPOINTS for o in OUTCOMES])
@@ -0,0 +1,44 @@
+"""Query layer: projected, cached reads of the stock universe.
+
+Views that only need symbols and names read them from here instead of
+querying Stock, so their database work stays constant as the universe grows.
+The cached list is dropped whenever a Stock is saved or deleted (see
+``screener.signals``).
+"""
+from django.core.cache import cache
+
+from .models import Stock
+
+UNIVERSE_KEY = 'screener:universe'
+
+
+def universe():
+    """Return [{'symbol', 'name'}, ...] for every stock, ordered by symbol"""
+    stocks = cache.get(UNIVERSE_KEY)
+    if stocks is None:
+        stocks = list(Stock.objects.order_by('symbol').values('symbol', 'name'))
+        cache.set(UNIVERSE_KEY, stocks, None)
+    return stocks
+
+
+def universe_symbols():
+    return [stock['symbol'] for stock in universe()]
+
+
+def find_stock(symbol):
+    """Return the universe entry for a symbol, or None"""
+    symbol = symbol.upper()
+    for stock in universe():
+        if stock['symbol'] == symbol:
+            return stock
+    return None
+
+
+def stock_name(symbol):
+    """Name of a stock in the universe, falling back to the symbol"""
+    stock = find_stock(symbol)
+    return stock['name'] if stock else symbol
+
+
+def invalidate_universe():
+    cache.delete(UNIVERSE_KEY)
@@ -0,0 +1,251 @@
+"""Drawdown and tail-risk analytics.
+
+``RiskAccumulator`` keeps online statistics of many symbols and is updated
+one bar (a row of closes, NaN where a symbol has no bar) at a time, each
+update vectorized over the symbols:
+
+- drawdown: depth, current and longest time under water, and the bars the
+  deepest drawdown took to recover from its trough to the previous peak.
+  As in ``analytics.price_metrics``, drawdowns start at the second close:
+  the first close is only the base of the first return;
+- Ulcer index: root mean square of the percentage drawdowns;
+- Omega ratio: sum of returns above a threshold over sum of shortfalls
+  below it;
+- parametric CVaR (expected shortfall) of a normal distribution fitted
+  with Welford's running mean and variance;
+- historical CVaR: mean of the worst ``ceil(alpha * n)`` returns. No
+  fixed-size summary gives this exactly, so the returns are kept and the
+  tail is selected when the metrics are read.
+
+``risk_metrics`` runs the accumulator over a whole close panel; ``profile``
+computes the same metrics of a single close array with whole-array
+operations, as the analysis page needs them on every request. The kernels
+import no Django code, so they can run in workers of ``screener.compute``;
+``update`` stores the metrics of the universe on the Stock rows for the
+screener.
+"""
+import math
+from statistics import NormalDist
+
+from .lazy import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+ALPHA = 0.05
+PERIOD = '1y'
+
+# Stock fields written by ``update``
+STOCK_FIELDS = ('max_drawdown', 'max_drawdown_duration', 'cvar_95', 'ulcer_index', 'omega_ratio')
+
+
+class RiskAccumulator:
+    """Online drawdown and tail-risk statistics of ``size`` symbols"""
+
+    def __init__(self, size, alpha=ALPHA, threshold=0.0):
+        self.alpha = alpha
+        self.threshold = threshold
+        self.last = np.full(size, np.nan)
+        self.peak = np.full(size, np.nan)
+        # Returns: count, Welford mean and sum of squared deviations, Omega sums
+        self.count = np.zeros(size, dtype=int)
+        self.mean = np.zeros(size)
+        self.m2 = np.zeros(size)
+        self.gains = np.zeros(size)
+        self.shortfalls = np.zeros(size)
+        self._returns = []
+        # Drawdown: current and deepest (fractions), bars under water
+        self.drawdown = np.zeros(size)
+        self.max_drawdown = np.zeros(size)
+        self.duration = np.zeros(size, dtype=int)
+        self.max_duration = np.zeros(size, dtype=int)
+        self.squared_drawdowns = np.zeros(size)
+        # Recovery of the deepest drawdown: bars since its trough while under water
+        self.since_trough = np.zeros(size, dtype=int)
+        self.recovering = np.zeros(size, dtype=bool)
+        self.recovery = np.zeros(size)
+
+    def update(self, closes):
+        """Add one bar of every symbol (NaN: no bar)"""
+        closes = np.asarray(closes, dtype=float)
+        has = ~np.isnan(closes)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            returns = closes / self.last - 1
+        valid = ~np.isnan(returns)
+        self.count += valid
+        delta = np.where(valid, returns - self.mean, 0)
+        self.mean += delta / np.maximum(self.count, 1)
+        self.m2 += np.where(valid, delta * (returns - self.mean), 0)
+        excess = np.where(valid, returns - self.threshold, 0)
+        self.gains += np.maximum(excess, 0)
+        self.shortfalls += np.maximum(-excess, 0)
+        self._returns.append(returns)
+
+        # The first close of a symbol has no return and is not a peak
+        self.peak = np.where(valid, np.fmax(self.peak, closes), self.peak)
+        drawdown = np.where(valid, closes / self.peak - 1, self.drawdown)
+        at_peak = valid & (drawdown >= 0)
+        self.drawdown = drawdown
+        self.duration = np.where(at_peak, 0, self.duration + valid)
+        self.max_duration = np.maximum(self.max_duration, self.duration)
+        self.squared_drawdowns += np.where(valid, (drawdown * 100) ** 2, 0)
+
+        self.since_trough += self.recovering & valid
+        recovered = self.recovering & at_peak
+        self.recovery = np.where(recovered, self.since_trough, self.recovery)
+        self.recovering &= ~at_peak
+        deeper = valid & (drawdown < self.max_drawdown)
+        self.max_drawdown = np.where(deeper, drawdown, self.max_drawdown)
+        self.recovering |= deeper
+        self.since_trough = np.where(deeper, 0, self.since_trough)
+
+        self.last = np.where(has, closes, self.last)
+
+    def historical_cvar(self):
+        """Mean of the worst ``ceil(alpha * n)`` returns of each symbol (NaN without returns)"""
+        if not self._returns:
+            return np.full(len(self.count), np.nan)
+        # NaN sorts last, so the tail of every column comes first
+        ordered = np.sort(np.vstack(self._returns), axis=0)
+        # Rounded first: 0.05 * 60 is 3.0000000000000004 in floating point
+        tail = np.maximum(np.ceil(np.round(self.alpha * self.count, 9)).astype(int), 1)
+        sums = np.cumsum(np.nan_to_num(ordered), axis=0)
+        columns = np.arange(len(self.count))
+        with np.errstate(invalid='ignore'):
+            return np.where(self.count > 0, sums[np.minimum(tail, len(ordered)) - 1, columns] / tail, np.nan)
+
+    def parametric_cvar(self):
+        """Expected shortfall at ``alpha`` of a normal distribution with the returns' mean and variance"""
+        normal = NormalDist()
+        factor = normal.pdf(normal.inv_cdf(self.alpha)) / self.alpha
+        with np.errstate(invalid='ignore', divide='ignore'):
+            std = np.sqrt(self.m2 / (self.count - 1))
+        return np.where(self.count > 1, self.mean - std * factor, np.nan)
+
+    def metrics(self):
+        """Current values: percentages for drawdowns, CVaR and Ulcer index, bars for durations
+
+        ``recovery`` is NaN while the deepest drawdown has not been recovered
+        and 0 without any drawdown. The Omega ratio is NaN without a shortfall.
+        """
+        seen = self.count > 0
+        with np.errstate(invalid='ignore', divide='ignore'):
+            ulcer = np.sqrt(self.squared_drawdowns / self.count)
+            omega = np.where(self.shortfalls > 0, self.gains / self.shortfalls, np.nan)
+        return {
+            'max_drawdown': np.where(seen, self.max_drawdown * 100, np.nan),
+            'current_drawdown': np.where(seen, self.drawdown * 100, np.nan),
+            'drawdown_duration': np.where(seen, self.duration, np.nan),
+            'max_drawdown_duration': np.where(seen, self.max_duration, np.nan),
+            'recovery': np.where(seen & ~self.recovering, self.recovery, np.nan),
+            'ulcer_index': np.where(seen, ulcer, np.nan),
+            'omega_ratio': omega,
+            'cvar_95': self.historical_cvar() * 100,
+            'parametric_cvar_95': self.parametric_cvar() * 100,
+        }
+
+
+def risk_metrics(closes, alpha=ALPHA, threshold=0.0):
+    """``RiskAccumulator.metrics`` of every column of a close panel (bars x symbols, NaN: no bar)"""
+    closes = np.asarray(closes, dtype=float)
+    if closes.ndim == 1:
+        closes = closes[:, None]
+    accumulator = RiskAccumulator(closes.shape[1], alpha, threshold)
+    for row in closes:
+        accumulator.update(row)
+    return accumulator.metrics()
+
+
+def drawdowns(closes):
+    """Drawdown (fraction) of every close but the first below the highest of them so far"""
+    closes = np.asarray(closes, dtype=float)[1:]
+    return closes / np.maximum.accumulate(closes) - 1
+
+
+def profile(closes, alpha=ALPHA, threshold=0.0):
+    """``risk_metrics`` of a single close array as plain values (None when undefined)
+
+    Missing closes (NaN) are skipped, as the accumulator carries the last
+    close over a gap.
+    """
+    closes = np.asarray(closes, dtype=float)
+    closes = closes[~np.isnan(closes)]
+    if len(closes) < 2:
+        return dict.fromkeys(RiskAccumulator(0).metrics())
+    returns = closes[1:] / closes[:-1] - 1
+    drawdown = drawdowns(closes)
+    bars = np.arange(len(drawdown))
+
+    # Bars since the last close at a peak (every series starts at one)
+    at_peak = drawdown >= 0
+    duration = bars - np.maximum.accumulate(np.where(at_peak, bars, 0))
+    # The deepest drawdown's trough is its first bar; it recovers at the next peak
+    trough = int(np.argmin(drawdown))
+    recovery = 0.0
+    if drawdown[trough] < 0:
+        recovered = np.flatnonzero(at_peak[trough:])
+        recovery = float(recovered[0]) if len(recovered) else math.nan
+
+    excess = returns - threshold
+    shortfalls = np.maximum(-excess, 0).sum()
+    tail = max(math.ceil(round(alpha * len(returns), 9)), 1)
+    if len(returns) > 1:
+        normal = NormalDist()
+        parametric = returns.mean() - returns.std(ddof=1) * normal.pdf(normal.inv_cdf(alpha)) / alpha
+    else:
+        parametric = math.nan
+
+    metrics = {
+        'max_drawdown': drawdown[trough] * 100,
+        'current_drawdown': drawdown[-1] * 100,
+        'drawdown_duration': duration[-1],
+        'max_drawdown_duration': duration.max(),
+        'recovery': recovery,
+        'ulcer_index': math.sqrt(np.mean((drawdown * 100) ** 2)),
+        'omega_ratio': np.maximum(excess, 0).sum() / shortfalls if shortfalls > 0 else math.nan,
+        'cvar_95': np.sort(returns)[:tail].mean() * 100,
+        'parametric_cvar_95': parametric * 100,
+    }
+    return {name: None if math.isnan(value) else float(value) for name, value in metrics.items()}
+
+
+def update(symbols=None):
+    """Recompute the risk fields of some stocks (all by default) from their last year of daily bars
+
+    Returns how many stocks were written.
+    """
+    # Django stays out of the module imports: the kernels above run in compute workers
+    from django.utils import timezone
+
+    from . import prices as price_store
+    from . import versions
+    from .models import Stock
+
+    stocks = Stock.objects.only('id', 'symbol', *STOCK_FIELDS)
+    if symbols is not None:
+        stocks = stocks.filter(symbol__in=[symbol.upper() for symbol in symbols])
+
+    closes = {}
+    by_symbol = {}
+    for stock in stocks:
+        bars = price_store.load_bars(stock.symbol, '1d', period=PERIOD)
+        if bars is not None and len(bars) > 1:
+            closes[stock.symbol] = bars['Close']
+            by_symbol[stock.symbol] = stock
+    if not closes:
+        return 0
+
+    panel = pd.concat(closes, axis=1, sort=True)
+    metrics = risk_metrics(panel.to_numpy(dtype=float))
+    now = timezone.now()
+    for column, symbol in enumerate(panel.columns):
+        stock = by_symbol[symbol]
+        for field in STOCK_FIELDS:
+            value = metrics[field][column]
+            setattr(stock, field, None if np.isnan(value) else float(value))
+        stock.last_updated = now
+
+    Stock.objects.bulk_update(by_symbol.values(), [*STOCK_FIELDS, 'last_updated'], batch_size=500)
+    versions.bump(*by_symbol)
+    return len(by_symbol)
@@ -0,0 +1,68 @@
+"""Rolling-window statistics of stocks against a benchmark.
+
+Bars are read from the price store (``screener.prices``), aligned on the
+benchmark's timeline and handed as one panel to the O(n) kernel
+``analytics.rolling_statistics`` on the compute executor, so a batch of
+symbols costs a single pass whatever the window.
+"""
+from . import analytics, compute
+from . import prices as price_store
+from .lazy import lazy_import
+
+pd = lazy_import('pandas')
+
+STATISTICS = ('beta', 'correlation', 'volatility', 'sharpe')
+DEFAULT_BENCHMARK = '^GSPC'
+
+
+def _returns(symbol, interval, period):
+    bars = price_store.get_bars(symbol, interval, period)
+    if bars is None or bars.empty:
+        return None
+    return bars['Close'].pct_change().iloc[1:]
+
+
+def rolling_series(symbols, window, period='1y', interval='1d', benchmark=DEFAULT_BENCHMARK, min_periods=None):
+    """Rolling statistics per symbol, or None if the benchmark has no bars
+
+    Returns ``{'dates': [...], 'series': {symbol: {statistic: [...]}},
+    'missing': [symbols without bars]}``; values before the first full
+    window are None.
+    """
+    benchmark_returns = _returns(benchmark, interval, period)
+    if benchmark_returns is None:
+        return None
+
+    returns = {}
+    missing = []
+    for symbol in symbols:
+        try:
+            symbol_returns = _returns(symbol, interval, period)
+        except Exception:
+            symbol_returns = None
+        if symbol_returns is None:
+            missing.append(symbol)
+        else:
+            returns[symbol] = symbol_returns
+
+    date_format = '%Y-%m-%d %H:%M' if price_store.is_intraday(interval) else '%Y-%m-%d'
+    result = {
+        'dates': [d.strftime(date_format) for d in benchmark_returns.index],
+        'series': {},
+        'missing': missing,
+    }
+    if not returns:
+        return result
+
+    panel = pd.concat(returns, axis=1).reindex(benchmark_returns.index)
+    statistics = compute.run(
+        analytics.rolling_statistics,
+        panel.to_numpy(dtype=float), benchmark_returns.to_numpy(dtype=float),
+        args=(window, price_store.periods_per_year(interval)),
+        kwargs={'min_periods': min_periods},
+    )
+    for column, symbol in enumerate(panel.columns):
+        result['series'][symbol] = {
+            name: analytics.clean_series(statistics[name][:, column]) for name in STATISTICS
+        }
+    return result
@@ -0,0 +1,399 @@
+"""Rule language for saved screens and alerts.
+
+A rule is a boolean expression over the per-symbol features computed by
+``screener.alerts``, for example::
+
+    rsi < 30 and above sma-200
+    price within 5% of fifty_two_week_low
+    sector contains "tech" and pe_ratio <= 15 and market_cap > 10B
+
+- comparisons ``<  <=  >  >=  ==  !=``, and ``above`` / ``below``
+  (a bare ``above sma_200`` means ``price > sma_200``);
+- ``a within 5% of b`` matches when ``|a - b| <= 5% * |b|``;
+- text features compare to quoted strings with ``contains``, ``==`` and
+  ``!=``, ignoring case;
+- arithmetic ``+ - * /`` with parentheses, numbers with K/M/B/T suffixes;
+- ``and``, ``or``, ``not``; names ignore case and ``sma-200`` reads as
+  ``sma_200``.
+
+``compile_rule()`` parses an expression once into a ``Rule`` whose
+``mask()`` evaluates it over a ``Panel`` of symbols as NumPy boolean arrays.
+A missing value never matches a comparison, and ``not`` only matches
+symbols whose features are known. Every sub-expression is computed once per
+panel, so the comparisons shared by many rules (``rsi < 30``) cost the same
+whether one rule or thousands use them.
+"""
+import functools
+import operator
+import re
+
+from .lazy import lazy_import
+
+np = lazy_import('numpy')
+
+NUMERIC_FEATURES = {
+    'price': 'dernier cours de clôture',
+    'change': 'variation sur une séance (%)',
+    'rsi': 'RSI 14 séances',
+    'sma_20': 'moyenne mobile 20 séances',
+    'sma_50': 'moyenne mobile 50 séances',
+    'sma_200': 'moyenne mobile 200 séances',
+    'volume': 'volume',
+    'market_cap': 'capitalisation boursière',
+    'pe_ratio': 'PER',
+    'dividend_yield': 'rendement du dividende',
+    'fifty_two_week_high': 'plus haut sur 52 semaines',
+    'fifty_two_week_low': 'plus bas sur 52 semaines',
+    'max_drawdown': 'drawdown maximum sur 1 an (%)',
+    'max_drawdown_duration': 'plus longue période sous un sommet (séances)',
+    'cvar_95': 'CVaR historique 95 % (%)',
+    'ulcer_index': 'indice Ulcer',
+    'omega_ratio': 'ratio Omega',
+}
+TEXT_FEATURES = {
+    'sector': 'secteur',
+    'industry': 'industrie',
+}
+
+# Subject of a bare "above x" / "below x"
+IMPLICIT_SUBJECT = 'price'
+
+KEYWORDS = {'and', 'or', 'not', 'above', 'below', 'within', 'of', 'contains'}
+SUFFIXES = {'k': 1e3, 'm': 1e6, 'b': 1e9, 't': 1e12}
+COMPARISONS = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    '=': operator.eq,
+    '==': operator.eq,
+    '!=': operator.ne,
+    'above': operator.gt,
+    'below': operator.lt,
+}
+ARITHMETIC = {'+': operator.add, '-': operator.sub, '*': operator.mul, '/': operator.truediv}
+
+_TOKEN = re.compile(r'''
+    \s*(?:
+        (?P<number>(?:\d+\.?\d*|\.\d+)(?:e[+-]?\d+)?)(?P<suffix>[kmbt](?!\w))?
+      | "(?P<dstring>[^"]*)" | '(?P<sstring>[^']*)'
+      | (?P<name>[a-z_]\w*)
+      | (?P<op><=|>=|==|!=|[<>=%()+*/-])
+    )''', re.VERBOSE | re.IGNORECASE)
+_HYPHENATED = re.compile(r'-(\d+)(?!\w)')
+
+
+class RuleError(ValueError):
+    """The expression is not a valid rule"""
+
+
+class Panel:
+    """Feature rows of a set of symbols, evaluated column-wise against many rules"""
+
+    def __init__(self, symbols, rows):
+        self.symbols = list(symbols)
+        self._rows = rows
+        self._columns = {}
+        self._results = {}
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def column(self, name):
+        if name not in self._columns:
+            if name in TEXT_FEATURES:
+                values = [(row.get(name) or '').lower() for row in self._rows]
+                self._columns[name] = np.array(values, dtype=object)
+            else:
+                values = [row.get(name) for row in self._rows]
+                self._columns[name] = np.array([np.nan if v is None else v for v in values], dtype=float)
+        return self._columns[name]
+
+    def known(self, fields):
+        """Mask of the symbols with every numeric feature in ``fields``"""
+        mask = np.ones(len(self), dtype=bool)
+        for name in fields:
+            if name in NUMERIC_FEATURES:
+                mask &= ~np.isnan(self.column(name))
+        return mask
+
+    def result(self, key, evaluate):
+        """Evaluate a sub-expression once per panel"""
+        if key not in self._results:
+            self._results[key] = evaluate(self)
+        return self._results[key]
+
+
+class _Node:
+    """Compiled sub-expression: a canonical key, the features it reads and an evaluator"""
+
+    def __init__(self, key, fields, evaluate, text=False):
+        self.key = key
+        self.fields = frozenset(fields)
+        self.evaluate = evaluate
+        self.text = text
+
+    def __call__(self, panel):
+        return panel.result(self.key, self.evaluate)
+
+
+class Rule:
+    """A compiled rule expression"""
+
+    def __init__(self, expression, node):
+        self.expression = expression
+        self.key = node.key
+        self.fields = node.fields
+        self._node = node
+
+    def mask(self, panel):
+        """Boolean array: which symbols of the panel match"""
+        with np.errstate(all='ignore'):
+            return self._node(panel)
+
+    def matches(self, panel):
+        return [panel.symbols[i] for i in np.flatnonzero(self.mask(panel))]
+
+
+def _tokenize(expression):
+    tokens = []
+    position = 0
+    expression = expression.strip()
+    while position < len(expression):
+        match = _TOKEN.match(expression, position)
+        if match is None or match.end() == position:
+            raise RuleError(f'caractère inattendu « {expression[position:].strip()[:20]} »')
+        position = match.end()
+        if match.group('number') is not None:
+            value = float(match.group('number'))
+            if match.group('suffix'):
+                value *= SUFFIXES[match.group('suffix').lower()]
+            tokens.append(('number', value))
+        elif match.group('dstring') is not None or match.group('sstring') is not None:
+            tokens.append(('string', (match.group('dstring') or match.group('sstring') or '').lower()))
+        elif match.group('name') is not None:
+            name = match.group('name').lower()
+            hyphenated = _HYPHENATED.match(expression, position)
+            if hyphenated and f'{name}_{hyphenated.group(1)}' in NUMERIC_FEATURES:
+                name = f'{name}_{hyphenated.group(1)}'
+                position = hyphenated.end()
+            tokens.append(('keyword' if name in KEYWORDS else 'name', name))
+        else:
+            tokens.append(('op', match.group('op')))
+    return tokens
+
+
+class _Parser:
+    """Recursive-descent parser producing compiled nodes"""
+
+    def __init__(self, expression):
+        self.tokens = _tokenize(expression)
+        self.position = 0
+
+    def peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else (None, None)
+
+    def accept(self, *values):
+        kind, value = self.peek()
+        if kind in ('op', 'keyword') and value in values:
+            self.position += 1
+            return value
+        return None
+
+    def expect(self, *values):
+        value = self.accept(*values)
+        if value is None:
+            raise RuleError(f"« {' ou '.join(values)} » attendu {self._where()}")
+        return value
+
+    def _where(self):
+        kind, value = self.peek()
+        if kind is None:
+            return 'en fin de règle'
+        return f'avant « {value:g} »' if kind == 'number' else f'avant « {value} »'
+
+    def parse(self):
+        if not self.tokens:
+            raise RuleError('règle vide')
+        node = self.parse_or()
+        if self.peek()[0] is not None:
+            raise RuleError(f'fin de règle attendue {self._where()}')
+        return node
+
+    # Boolean expressions ------------------------------------------------
+
+    def parse_or(self):
+        node = self.parse_and()
+        while self.accept('or'):
+            node = _combine('or', node, self.parse_and())
+        return node
+
+    def parse_and(self):
+        node = self.parse_not()
+        while self.accept('and'):
+            node = _combine('and', node, self.parse_not())
+        return node
+
+    def parse_not(self):
+        if self.accept('not'):
+            inner = self.parse_not()
+            return _Node(
+                f'(not {inner.key})', inner.fields,
+                lambda panel: ~inner(panel) & panel.known(inner.fields),
+            )
+        return self.parse_atom()
+
+    def parse_atom(self):
+        if self.peek() == ('op', '('):
+            # A parenthesized condition, unless it turns out to be arithmetic
+            start = self.position
+            self.position += 1
+            try:
+                node = self.parse_or()
+                self.expect(')')
+                kind, value = self.peek()
+                if not (kind == 'op' and value in COMPARISONS or value in ARITHMETIC or value == '%'
+                        or kind == 'keyword' and value in ('above', 'below', 'within', 'contains')):
+                    return node
+            except RuleError:
+                pass
+            self.position = start
+        return self.parse_comparison()
+
+    def parse_comparison(self):
+        if self.peek() in (('keyword', 'above'), ('keyword', 'below')):
+            left = _feature(IMPLICIT_SUBJECT)
+        else:
+            left = self.parse_sum()
+
+        if left.text:
+            operator_ = self.expect('contains', '==', '=', '!=')
+            kind, needle = self.peek()
+            if kind != 'string':
+                raise RuleError(f'texte entre guillemets attendu {self._where()}')
+            self.position += 1
+            return _text_comparison(operator_, left, needle)
+
+        if self.accept('within'):
+            kind, percent = self.peek()
+            if kind != 'number':
+                raise RuleError(f'pourcentage attendu {self._where()}')
+            self.position += 1
+            self.expect('%')
+            self.expect('of')
+            return _within(left, percent, self.parse_sum())
+
+        operator_ = self.accept(*COMPARISONS)
+        if operator_ is None:
+            raise RuleError(f'comparaison attendue {self._where()}')
+        right = self.parse_sum()
+        if right.text:
+            raise RuleError(f'« {right.key} » est un texte, comparez-le avec contains et des guillemets')
+        return _comparison(operator_, left, right)
+
+    # Arithmetic ---------------------------------------------------------
+
+    def parse_sum(self):
+        node = self.parse_product()
+        while True:
+            operator_ = self.accept('+', '-')
+            if operator_ is None:
+                return node
+            node = _arithmetic(operator_, node, self.parse_product())
+
+    def parse_product(self):
+        node = self.parse_operand()
+        while True:
+            operator_ = self.accept('*', '/')
+            if operator_ is None:
+                return node
+            node = _arithmetic(operator_, node, self.parse_operand())
+
+    def parse_operand(self):
+        if self.accept('-'):
+            inner = self.parse_operand()
+            return _arithmetic('-', _number(0.0), inner)
+        if self.accept('('):
+            node = self.parse_sum()
+            self.expect(')')
+            return node
+        kind, value = self.peek()
+        if kind == 'number':
+            self.position += 1
+            return _number(value)
+        if kind == 'name':
+            self.position += 1
+            return _feature(value)
+        raise RuleError(f'valeur ou indicateur attendu {self._where()}')
+
+
+def _number(value):
+    return _Node(repr(value), (), lambda panel: value)
+
+
+def _feature(name):
+    if name not in NUMERIC_FEATURES and name not in TEXT_FEATURES:
+        raise RuleError(f'indicateur inconnu « {name} »')
+    return _Node(name, (name,), lambda panel: panel.column(name), text=name in TEXT_FEATURES)
+
+
+def _arithmetic(operator_, left, right):
+    if left.text or right.text:
+        raise RuleError('calcul impossible sur un texte')
+    apply = ARITHMETIC[operator_]
+    return _Node(
+        f'({left.key} {operator_} {right.key})', left.fields | right.fields,
+        lambda panel: apply(left(panel), right(panel)),
+    )
+
+
+def _known(panel, *values):
+    mask = np.ones(len(panel), dtype=bool)
+    for value in values:
+        mask &= ~np.isnan(value)
+    return mask
+
+
+def _comparison(operator_, left, right):
+    compare = COMPARISONS[operator_]
+    symbol = {'=': '==', 'above': '>', 'below': '<'}.get(operator_, operator_)
+
+    def evaluate(panel):
+        a, b = left(panel), right(panel)
+        return compare(a, b) & _known(panel, a, b)
+
+    return _Node(f'({left.key} {symbol} {right.key})', left.fields | right.fields, evaluate)
+
+
+def _within(left, percent, right):
+    def evaluate(panel):
+        a, b = left(panel), right(panel)
+        return (np.abs(a - b) <= percent / 100 * np.abs(b)) & _known(panel, a, b)
+
+    return _Node(f'({left.key} within {percent!r}% of {right.key})', left.fields | right.fields, evaluate)
+
+
+def _text_comparison(operator_, left, needle):
+    def evaluate(panel):
+        column = left(panel)
+        if operator_ == 'contains':
+            return np.fromiter((needle in value for value in column), dtype=bool, count=len(column))
+        equal = column == needle
+        return equal if operator_ in ('=', '==') else ~equal
+
+    symbol = '==' if operator_ == '=' else operator_
+    return _Node(f'({left.key} {symbol} {needle!r})', left.fields, evaluate)
+
+
+def _combine(operator_, left, right):
+    apply = operator.and_ if operator_ == 'and' else operator.or_
+    return _Node(
+        f'({left.key} {operator_} {right.key})', left.fields | right.fields,
+        lambda panel: apply(left(panel), right(panel)),
+    )
+
+
+@functools.lru_cache(maxsize=4096)
+def compile_rule(expression):
+    """Parse an expression into a ``Rule``; raises ``RuleError`` with a readable message"""
+    return Rule(expression, _Parser(expression).parse())
@@ -0,0 +1,294 @@
+"""In-process columnar screening engine.
+
+When ``settings.SCREENER_COLUMNAR_INDEX`` is enabled the numeric Stock
+columns are kept in NumPy arrays (NaN marks missing values) with a sorted
+index per column, so home screens are evaluated as vectorized boolean masks
+without a database round trip. Rows are kept in sync from Stock signals in
+this process, and other processes' writes (refresh commands, other workers)
+are picked up by a cheap delta query at most every
+``SCREENER_INDEX_REFRESH_SECONDS``.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import Count, Max
+
+from .facets import FACETS, MISSING, sort_counts
+from .lazy import lazy_import
+from .models import Stock
+from .screens import NUMERIC_CRITERIA
+
+np = lazy_import('numpy')
+
+NUMERIC_FIELDS = (
+    'current_price',
+    'market_cap',
+    'pe_ratio',
+    'dividend_yield',
+    'fifty_two_week_high',
+    'fifty_two_week_low',
+    'volume',
+    'max_drawdown',
+    'max_drawdown_duration',
+    'cvar_95',
+    'ulcer_index',
+    'omega_ratio',
+)
+INTEGER_FIELDS = ('volume', 'max_drawdown_duration')
+TEXT_FIELDS = ('symbol', 'name', 'sector', 'industry')
+
+
+def enabled():
+    return getattr(settings, 'SCREENER_COLUMNAR_INDEX', False)
+
+
+class ScreeningIndex:
+    """Columnar copy of the Stock table for vectorized screening"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._positions = {}  # symbol -> row position
+        self._size = 0
+        self._numeric = {field: np.empty(0) for field in NUMERIC_FIELDS}
+        self._text = {field: np.empty(0, dtype=object) for field in TEXT_FIELDS}
+        self._alive = np.empty(0, dtype=bool)
+        self._sorted = {}  # field -> (order, sorted values without NaN)
+        self._symbol_rank = None
+        self._sectors = None  # (unique lowercase sectors, codes)
+        self.last_updated = None
+        self.row_count = 0
+        self.checked_at = 0.0
+
+    def __len__(self):
+        return int(self._alive[:self._size].sum())
+
+    # Loading ----------------------------------------------------------
+
+    def build(self, rows):
+        """Replace the index with the given Stock rows (dicts or model instances)"""
+        with self._lock:
+            self._positions = {}
+            self._size = 0
+            capacity = max(len(rows), 16)
+            self._numeric = {field: np.full(capacity, np.nan) for field in NUMERIC_FIELDS}
+            self._text = {field: np.empty(capacity, dtype=object) for field in TEXT_FIELDS}
+            self._alive = np.zeros(capacity, dtype=bool)
+            for row in rows:
+                self._put(row)
+            self._invalidate()
+
+    def upsert(self, row):
+        """Insert or update a single stock"""
+        with self._lock:
+            self._put(row)
+            self._invalidate()
+
+    def remove(self, symbol):
+        with self._lock:
+            position = self._positions.pop(symbol.upper(), None)
+            if position is not None:
+                self._alive[position] = False
+                self._invalidate()
+
+    def _put(self, row):
+        get = row.get if isinstance(row, dict) else lambda field: getattr(row, field)
+        symbol = get('symbol').upper()
+        position = self._positions.get(symbol)
+        if position is None:
+            position = self._size
+            if position >= len(self._alive):
+                self._grow(max(16, 2 * len(self._alive)))
+            self._positions[symbol] = position
+            self._size += 1
+
+        for field in NUMERIC_FIELDS:
+            value = get(field)
+            self._numeric[field][position] = np.nan if value is None else value
+        for field in TEXT_FIELDS:
+            self._text[field][position] = get(field) or ''
+        self._text['symbol'][position] = symbol
+        self._alive[position] = True
+
+    def _grow(self, capacity):
+        extra = capacity - len(self._alive)
+        for field in NUMERIC_FIELDS:
+            self._numeric[field] = np.concatenate([self._numeric[field], np.full(extra, np.nan)])
+        for field in TEXT_FIELDS:
+            self._text[field] = np.concatenate([self._text[field], np.empty(extra, dtype=object)])
+        self._alive = np.concatenate([self._alive, np.zeros(extra, dtype=bool)])
+
+    def _invalidate(self):
+        # Sorted indexes are rebuilt lazily on the next screen
+        self._sorted = {}
+        self._symbol_rank = None
+        self._sectors = None
+
+    # Derived structures -------------------------------------------------
+
+    def _sorted_index(self, field):
+        if field not in self._sorted:
+            values = self._numeric[field][:self._size]
+            valid = np.flatnonzero(~np.isnan(values) & self._alive[:self._size])
+            order = valid[np.argsort(values[valid], kind='stable')]
+            self._sorted[field] = (order, values[order])
+        return self._sorted[field]
+
+    def _sector_codes(self):
+        if self._sectors is None:
+            lowered = np.array([s.lower() for s in self._text['sector'][:self._size]], dtype=object)
+            self._sectors = np.unique(lowered, return_inverse=True) if self._size else (np.empty(0, dtype=object), np.empty(0, dtype=int))
+        return self._sectors
+
+    def _ranks(self):
+        if self._symbol_rank is None:
+            order = np.argsort(self._text['symbol'][:self._size].astype(str), kind='stable')
+            ranks = np.empty(self._size, dtype=np.int64)
+            ranks[order] = np.arange(self._size)
+            self._symbol_rank = ranks
+        return self._symbol_rank
+
+    # Screening ----------------------------------------------------------
+
+    def _range_mask(self, field, low=None, high=None):
+        order, values = self._sorted_index(field)
+        start = 0 if low is None else np.searchsorted(values, low, side='left')
+        stop = len(values) if high is None else np.searchsorted(values, high, side='right')
+        mask = np.zeros(self._size, dtype=bool)
+        mask[order[start:stop]] = True
+        return mask
+
+    def mask(self, criteria):
+        """Boolean mask of the rows matching parsed screen criteria"""
+        with self._lock:
+            mask = self._alive[:self._size].copy()
+            for name, (field, lookup, error) in NUMERIC_CRITERIA.items():
+                if name in criteria:
+                    if lookup == 'gte':
+                        mask &= self._range_mask(field, low=criteria[name])
+                    else:
+                        mask &= self._range_mask(field, high=criteria[name])
+
+            if 'sector' in criteria:
+                uniques, codes = self._sector_codes()
+                needle = criteria['sector'].lower()
+                matching = [i for i, sector in enumerate(uniques) if needle in sector]
+                mask &= np.isin(codes, matching)
+            return mask
+
+    def screen(self, criteria):
+        """Return the stocks matching parsed screen criteria"""
+        return self.rows(self.mask(criteria))
+
+    def rows(self, mask):
+        """Return the rows of a mask as dicts, ordered by symbol like the ORM path"""
+        with self._lock:
+            positions = np.flatnonzero(mask)
+            positions = positions[np.argsort(self._ranks()[positions], kind='stable')]
+            columns = [self._text[field][positions].tolist() for field in TEXT_FIELDS]
+            for field in NUMERIC_FIELDS:
+                values = self._numeric[field][positions]
+                if field in INTEGER_FIELDS:
+                    values = np.where(np.isnan(values), 0, values).astype(np.int64).astype(object)
+                else:
+                    values = values.astype(object)
+                values[np.isnan(self._numeric[field][positions])] = None
+                columns.append(values.tolist())
+        keys = TEXT_FIELDS + NUMERIC_FIELDS
+        return [dict(zip(keys, row)) for row in zip(*columns)]
+
+    def facet_counts(self, mask=None):
+        """Facet counts for a mask, in the same shape as ``facets.facet_counts``"""
+        with self._lock:
+            if mask is None:
+                mask = self._alive[:self._size]
+            counts = {}
+            for facet, (field, buckets) in FACETS.items():
+                values = {}
+                if buckets:
+                    column = self._numeric[field][:self._size]
+                    remaining = mask.copy()
+                    for label, low, high in buckets:
+                        selected = remaining & ~np.isnan(column)
+                        if low is not None:
+                            selected &= column >= low
+                        if high is not None:
+                            selected &= column < high
+                        remaining &= ~selected
+                        if selected.any():
+                            values[label] = int(selected.sum())
+                    if remaining.any():
+                        values[MISSING] = int(remaining.sum())
+                else:
+                    labels, totals = np.unique(self._text[field][:self._size][mask].astype(str), return_counts=True)
+                    for label, total in zip(labels, totals):
+                        label = str(label) or MISSING
+                        values[label] = values.get(label, 0) + int(total)
+                counts[facet] = sort_counts(facet, values)
+            return counts
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def _stock_rows(queryset):
+    return list(queryset.values(*TEXT_FIELDS, *NUMERIC_FIELDS))
+
+
+def get_index():
+    """Return the process-wide index, loading or refreshing it when needed"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            index = ScreeningIndex()
+            state = Stock.objects.aggregate(last_updated=Max('last_updated'), row_count=Count('id'))
+            index.build(_stock_rows(Stock.objects.all()))
+            index.last_updated = state['last_updated']
+            index.row_count = state['row_count']
+            index.checked_at = time.monotonic()
+            _index = index
+        elif time.monotonic() - _index.checked_at > getattr(settings, 'SCREENER_INDEX_REFRESH_SECONDS', 5):
+            _refresh(_index)
+        return _index
+
+
+def _refresh(index):
+    """Apply rows written by other processes since the last check"""
+    state = Stock.objects.aggregate(last_updated=Max('last_updated'), row_count=Count('id'))
+    index.checked_at = time.monotonic()
+    if state['last_updated'] == index.last_updated and state['row_count'] == index.row_count:
+        return
+
+    changed = Stock.objects.all()
+    if index.last_updated is not None:
+        changed = changed.filter(last_updated__gte=index.last_updated)
+    for row in _stock_rows(changed):
+        index.upsert(row)
+
+    if len(index) != state['row_count']:
+        # Rows were deleted elsewhere; reload everything
+        index.build(_stock_rows(Stock.objects.all()))
+    index.last_updated = state['last_updated']
+    index.row_count = state['row_count']
+
+
+def stock_saved(stock):
+    """Signal hook: keep a loaded index in sync with a saved Stock"""
+    if _index is not None:
+        _index.upsert(stock)
+        _index.row_count = len(_index)
+        _index.last_updated = max(filter(None, [_index.last_updated, stock.last_updated]), default=None)
+
+
+def stock_deleted(stock):
+    if _index is not None:
+        _index.remove(stock.symbol)
+        _index.row_count = len(_index)
+
+
+def reset_index():
+    """Drop the loaded index; the next screen reloads it from the database"""
+    global _index
+    with _index_lock:
+        _index = None
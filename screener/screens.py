@@ -0,0 +1,69 @@
+"""Screen criteria shared by the home screener, facets and APIs."""
+
+# Numeric form fields: (Stock field, lookup, error message)
+NUMERIC_CRITERIA = {
+    'min_price': ('current_price', 'gte', 'Invalid minimum price value'),
+    'max_price': ('current_price', 'lte', 'Invalid maximum price value'),
+    'min_market_cap': ('market_cap', 'gte', 'Invalid minimum market cap value'),
+    'max_pe': ('pe_ratio', 'lte', 'Invalid maximum P/E ratio value'),
+    # Risk fields (screener.risk): drawdown and CVaR are negative percentages
+    'min_max_drawdown': ('max_drawdown', 'gte', 'Invalid maximum drawdown value'),
+    'max_drawdown_duration': ('max_drawdown_duration', 'lte', 'Invalid drawdown duration value'),
+    'min_cvar': ('cvar_95', 'gte', 'Invalid CVaR value'),
+    'max_ulcer_index': ('ulcer_index', 'lte', 'Invalid Ulcer index value'),
+    'min_omega': ('omega_ratio', 'gte', 'Invalid Omega ratio value'),
+}
+
+# Rule-language comparison of each criterion lookup (see ``screener.rules``)
+RULE_OPERATORS = {'gte': '>=', 'lte': '<='}
+
+
+def parse_criteria(data):
+    """Parse screener form data into (criteria, errors)
+
+    Blank fields are ignored and invalid numbers are reported in ``errors``
+    without failing the whole screen.
+    """
+    criteria = {}
+    errors = []
+
+    for name, (field, lookup, error) in NUMERIC_CRITERIA.items():
+        value = data.get(name)
+        if not value:
+            continue
+        try:
+            criteria[name] = float(value)
+        except ValueError:
+            errors.append(error)
+
+    sector = data.get('sector')
+    if sector and sector != 'all':
+        criteria['sector'] = sector
+
+    return criteria, errors
+
+
+def apply_criteria(queryset, criteria):
+    """Filter a Stock queryset with parsed criteria"""
+    for name, (field, lookup, error) in NUMERIC_CRITERIA.items():
+        if name in criteria:
+            queryset = queryset.filter(**{f'{field}__{lookup}': criteria[name]})
+
+    if 'sector' in criteria:
+        queryset = queryset.filter(sector__icontains=criteria['sector'])
+
+    return queryset
+
+
+def criteria_expression(criteria):
+    """The alert rule expression equivalent to parsed criteria"""
+    terms = []
+    for name, (field, lookup, error) in NUMERIC_CRITERIA.items():
+        if name in criteria:
+            feature = 'price' if field == 'current_price' else field
+            terms.append(f'{feature} {RULE_OPERATORS[lookup]} {criteria[name]:g}')
+
+    if 'sector' in criteria:
+        terms.append('sector contains "{}"'.format(criteria['sector'].replace('"', '')))
+
+    return ' and '.join(terms)
@@ -0,0 +1,79 @@
+import logging
+
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .facets import facet_values, stored_facet_values, update_facets
+from . import queries, screening, versions
+from .models import Stock
+from .snapshots import LaterSnapshotError, record_snapshot
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=Stock)
+def snapshot_fundamentals(sender, instance, raw=False, **kwargs):
+    """Keep the point-in-time fundamentals history in sync with Stock rows"""
+    if raw:
+        return
+    try:
+        record_snapshot(instance)
+    except LaterSnapshotError as e:
+        # A save must not fail over the history: leave it as it is
+        logger.warning('Snapshot not recorded: %s', e)
+
+
+@receiver(pre_save, sender=Stock)
+def remember_facets(sender, instance, raw=False, **kwargs):
+    """Remember the stored facet values so post_save can move the counts"""
+    instance._previous_facets = None if raw else stored_facet_values(instance)
+
+
+@receiver(post_save, sender=Stock)
+def save_facets(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    update_facets(getattr(instance, '_previous_facets', None), facet_values(instance))
+    # What was just written is the stored state the next save starts from
+    instance._loaded_values = {
+        **getattr(instance, '_loaded_values', {}),
+        **{
+            field.attname: getattr(instance, field.attname)
+            for field in Stock._meta.concrete_fields
+            if field.attname in instance.__dict__ and (update_fields is None or field.name in update_fields)
+        },
+    }
+
+
+@receiver(post_save, sender=Stock)
+def index_saved_stock(sender, instance, raw=False, **kwargs):
+    """Keep the in-process screening index in sync"""
+    if raw:
+        return
+    screening.stock_saved(instance)
+
+
+@receiver(post_delete, sender=Stock)
+def delete_facets(sender, instance, **kwargs):
+    update_facets(facet_values(instance), None)
+
+
+@receiver(post_delete, sender=Stock)
+def unindex_deleted_stock(sender, instance, **kwargs):
+    screening.stock_deleted(instance)
+
+
+@receiver(post_save, sender=Stock)
+@receiver(post_delete, sender=Stock)
+def invalidate_universe(sender, **kwargs):
+    """Drop the cached symbol/name list used by the query layer"""
+    queries.invalidate_universe()
+
+
+@receiver(post_save, sender=Stock)
+@receiver(post_delete, sender=Stock)
+def bump_data_version(sender, instance, raw=False, **kwargs):
+    """Invalidate the cached pages showing this stock"""
+    if raw:
+        return
+    versions.bump(instance.symbol)
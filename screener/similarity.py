@@ -0,0 +1,158 @@
+"""Similarity search and clustering of the universe by return correlation.
+
+``build()`` turns a year of stored daily bars into centred, unit-length
+return vectors (see ``analytics.unit_vectors``), so the correlation of two
+stocks is the dot product of their vectors, and clusters them with
+spherical k-means. The index is published in the shared state cache, which
+is never culled, so it stays available until the next build; each worker
+keeps it in memory and picks up a rebuild within ``RELOAD_SECONDS``. A
+"most / least correlated with X" query is then one matrix-vector product
+and a partial sort.
+
+``refresh_prices`` rebuilds the index after downloading daily bars;
+``manage.py build_similarity`` rebuilds it on demand. Requests never build
+it: until one is published they get an empty index and, with
+``SCREENER_JOB_QUEUE``, queue a build for ``run_workers``.
+"""
+import threading
+import time
+
+from django.conf import settings
+
+from . import analytics, cache, queries
+from . import prices as price_store
+from .lazy import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+PERIOD = '1y'
+MIN_OBSERVATIONS = 60
+DEFAULT_CLUSTERS = 8
+RELOAD_SECONDS = 60
+
+# Keys of the published index in the shared state cache
+INDEX_KEY = 'similarity:index'
+BUILT_AT_KEY = 'similarity:built_at'
+
+
+class SimilarityIndex:
+    """Unit return vectors and cluster labels of the universe"""
+
+    def __init__(self, symbols, vectors, labels, period=PERIOD, built_at=None):
+        self.symbols = list(symbols)
+        self.vectors = vectors
+        self.labels = labels
+        self.period = period
+        self.built_at = built_at or time.time()
+        self._positions = {symbol: i for i, symbol in enumerate(self.symbols)}
+
+    @classmethod
+    def empty(cls, period=PERIOD):
+        """An index of no stocks standing in for one not built yet"""
+        index = cls([], np.empty((0, 0), dtype=np.float32), np.empty(0, dtype=int), period)
+        index.built_at = None
+        return index
+
+    @property
+    def built(self):
+        return self.built_at is not None
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def __contains__(self, symbol):
+        return symbol.upper() in self._positions
+
+    @property
+    def observations(self):
+        return self.vectors.shape[1] if len(self.symbols) else 0
+
+    def similar(self, symbol, k=10):
+        """``{'most': [(symbol, correlation)], 'least': [...]}``; KeyError if not indexed"""
+        row = self._positions[symbol.upper()]
+        (most, most_scores), (least, least_scores) = analytics.top_k(self.vectors, row, k)
+        return {
+            'most': [(self.symbols[i], round(float(s), 4)) for i, s in zip(most, most_scores)],
+            'least': [(self.symbols[i], round(float(s), 4)) for i, s in zip(least, least_scores)],
+        }
+
+    def cluster_of(self, symbol):
+        return int(self.labels[self._positions[symbol.upper()]])
+
+    def clusters(self):
+        """Member symbols of each cluster, largest cluster first"""
+        members = [[] for _ in range(int(self.labels.max()) + 1 if len(self.labels) else 0)]
+        for symbol, label in zip(self.symbols, self.labels):
+            members[label].append(symbol)
+        return [sorted(group) for group in members]
+
+
+def build(symbols=None, period=PERIOD, clusters=None, min_observations=MIN_OBSERVATIONS):
+    """Build the index from stored daily bars and publish it to every worker
+
+    ``clusters`` defaults to about sqrt(n / 2), at most ``DEFAULT_CLUSTERS``.
+    """
+    symbols = symbols if symbols is not None else queries.universe_symbols()
+    returns = {}
+    for symbol in symbols:
+        bars = price_store.load_bars(symbol, '1d', period=period)
+        if bars is not None and len(bars) > 1:
+            returns[symbol.upper()] = bars['Close'].pct_change().iloc[1:]
+
+    if returns:
+        panel = pd.concat(returns, axis=1, sort=True)
+        keep, vectors = analytics.unit_vectors(panel.to_numpy(dtype=float), min_observations)
+        kept = [symbol for symbol, flag in zip(panel.columns, keep) if flag]
+        if clusters is None:
+            clusters = min(DEFAULT_CLUSTERS, max(1, round((len(kept) / 2) ** 0.5)))
+        labels = analytics.spherical_kmeans(vectors, clusters)
+    else:
+        kept, vectors, labels = [], np.empty((0, 0), dtype=np.float32), np.empty(0, dtype=int)
+
+    index = SimilarityIndex(kept, vectors, labels, period)
+    # The index first: a worker seeing the new time must find the new index
+    cache.state.set(INDEX_KEY, index, timeout=None)
+    cache.state.set(BUILT_AT_KEY, index.built_at, timeout=None)
+    _publish(index)
+    return index
+
+
+_index = None
+_checked_at = None
+_lock = threading.Lock()
+
+
+def _publish(index):
+    global _index, _checked_at
+    with _lock:
+        _index = index
+        _checked_at = time.monotonic()
+
+
+def get_index():
+    """This process's copy of the index, reloaded when another process rebuilt it
+
+    Until an index is published this is ``SimilarityIndex.empty()``; a build
+    is queued (with ``SCREENER_JOB_QUEUE``) when the cache is checked.
+    """
+    global _index, _checked_at
+    checked = False
+    with _lock:
+        if _checked_at is None or time.monotonic() - _checked_at > RELOAD_SECONDS:
+            _checked_at = time.monotonic()
+            checked = True
+            built_at = cache.state.get(BUILT_AT_KEY)
+            if built_at is not None and (_index is None or built_at != _index.built_at):
+                published = cache.state.get(INDEX_KEY)
+                if published is not None:
+                    _index = published
+        index = _index
+    if index is not None:
+        return index
+    if checked and settings.SCREENER_JOB_QUEUE:
+        # Deferred import: the job handlers import this module
+        from . import jobs
+
+        jobs.enqueue('similarity', {}, key='similarity')
+    return SimilarityIndex.empty()
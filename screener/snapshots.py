@@ -0,0 +1,113 @@
+"""Point-in-time fundamentals history.
+
+Snapshots are append-only and deduplicated: a row is only written on days
+when a value changed, and its ``values`` only hold the changed fields. Each
+row also carries the full ``state`` as of its date, so the state as of a date
+is the latest row up to that date. All lookups below are one query.
+"""
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from .models import FundamentalSnapshot
+
+# Stock fields tracked over time
+TRACKED_FIELDS = (
+    'market_cap',
+    'current_price',
+    'pe_ratio',
+    'dividend_yield',
+    'fifty_two_week_high',
+    'fifty_two_week_low',
+    'volume',
+)
+
+
+class LaterSnapshotError(ValueError):
+    """A snapshot dated after the one being recorded exists (history is append-only)"""
+
+
+def record_snapshot(stock, on=None):
+    """Record the stock's current fundamentals for the given day (default: today).
+
+    Only changed fields are written. Recording twice on the same day merges
+    into that day's row. Returns the snapshot, or None if nothing changed.
+    Raises ``LaterSnapshotError`` if the symbol has a snapshot after that day.
+    """
+    on = on or timezone.localdate()
+    symbol = stock.symbol.upper()
+
+    # The two latest rows: a later one, or today's and the one before it
+    latest = list(
+        FundamentalSnapshot.objects.filter(symbol=symbol)
+        .order_by('-date').values_list('date', 'state')[:2]
+    )
+    if latest and latest[0][0] > on:
+        raise LaterSnapshotError(f'Snapshots for {symbol} are append-only; a snapshot after {on} already exists')
+    if latest and latest[0][0] == on:
+        latest = latest[1:]
+    previous = latest[0][1] if latest else {}
+
+    current = {field: getattr(stock, field) for field in TRACKED_FIELDS}
+    changes = {
+        field: value for field, value in current.items()
+        if field not in previous or previous[field] != value
+    }
+
+    if not changes:
+        # Values reverted to the previous state during the day
+        FundamentalSnapshot.objects.filter(symbol=symbol, date=on).delete()
+        return None
+
+    snapshot, _ = FundamentalSnapshot.objects.update_or_create(
+        symbol=symbol, date=on, defaults={'values': changes, 'state': {**previous, **current}}
+    )
+    return snapshot
+
+
+def snapshot_as_of(symbol, on):
+    """Return the fundamentals of a symbol as known on the given date, or None"""
+    return (
+        FundamentalSnapshot.objects.filter(symbol=symbol.upper(), date__lte=on)
+        .order_by('-date').values_list('state', flat=True).first()
+    )
+
+
+def universe_as_of(on, symbols=None):
+    """Return {symbol: fundamentals} for every symbol with a snapshot on or before the date"""
+    latest = (
+        FundamentalSnapshot.objects.filter(symbol=OuterRef('symbol'), date__lte=on)
+        .order_by('-date').values('date')[:1]
+    )
+    rows = FundamentalSnapshot.objects.filter(date=Subquery(latest))
+    if symbols is not None:
+        rows = rows.filter(symbol__in=[s.upper() for s in symbols])
+    return dict(rows.values_list('symbol', 'state'))
+
+
+def field_history(symbol, field, start=None, end=None):
+    """Return [(date, value), ...] for each change of a field over time"""
+    rows = FundamentalSnapshot.objects.filter(symbol=symbol.upper())
+    if end is not None:
+        rows = rows.filter(date__lte=end)
+
+    history = []
+    for day, values in rows.order_by('date').values_list('date', 'values'):
+        if field not in values:
+            continue
+        if start is not None and day <= start:
+            # Only keep the value in force at the start of the window
+            history = [(start, values[field])]
+        else:
+            history.append((day, values[field]))
+    return history
+
+
+def growth(symbol, field, start, end):
+    """Percentage change of a field between two dates, or None if not computable"""
+    history = field_history(symbol, field, start=start, end=end)
+    if not history:
+        return None
+    first, last = history[0][1], history[-1][1]
+    if history[0][0] > start or first in (None, 0) or last is None:
+        return None
+    return (last / first - 1) * 100
@@ -0,0 +1,90 @@
+"""Precomputed sparklines for the list views.
+
+``update()`` reads the last ``PERIOD`` of stored daily bars of each stock,
+keeps ``POINTS`` evenly spaced closes (always including the last one) and
+renders them to a small inline SVG stored in ``Sparkline``. The home and
+All Stocks tables embed the SVG as is, so scanning hundreds of trends costs
+one query and no price data.
+"""
+from .lazy import lazy_import
+from .models import Sparkline, Stock
+from . import prices as price_store
+from . import versions
+
+np = lazy_import('numpy')
+
+PERIOD = '6mo'
+POINTS = 60
+WIDTH = 100
+HEIGHT = 24
+UP_COLOR = '#28a745'
+DOWN_COLOR = '#dc3545'
+
+
+def downsample(closes, points=POINTS):
+    """Evenly spaced closes from first to last, at most ``points`` of them"""
+    closes = np.asarray(closes, dtype=float)
+    closes = closes[~np.isnan(closes)]
+    if len(closes) <= points:
+        return closes
+    return closes[np.linspace(0, len(closes) - 1, points).round().astype(int)]
+
+
+def render_svg(closes, change):
+    """Inline SVG polyline of the closes, green when the period ended up"""
+    low, high = min(closes), max(closes)
+    span = (high - low) or 1
+    step = WIDTH / max(len(closes) - 1, 1)
+    points = ' '.join(
+        f'{i * step:.1f},{HEIGHT - 1 - (close - low) / span * (HEIGHT - 2):.1f}'
+        for i, close in enumerate(closes)
+    )
+    color = UP_COLOR if change >= 0 else DOWN_COLOR
+    return (
+        f'<svg class="sparkline" width="{WIDTH}" height="{HEIGHT}" viewBox="0 0 {WIDTH} {HEIGHT}" '
+        f'preserveAspectRatio="none" role="img"><title>{change:+.1f}% over {PERIOD}</title>'
+        f'<polyline fill="none" stroke="{color}" stroke-width="1.5" points="{points}"/></svg>'
+    )
+
+
+def build(closes):
+    """(closes, change %, svg) of a close array, or None if it has fewer than two closes"""
+    closes = downsample(closes)
+    if len(closes) < 2:
+        return None
+    change = float((closes[-1] / closes[0] - 1) * 100)
+    closes = [round(float(close), 4) for close in closes]
+    return closes, change, render_svg(closes, change)
+
+
+def update(symbols=None):
+    """Rebuild the sparklines of some stocks (all by default) from stored bars; returns how many were written"""
+    stocks = Stock.objects.only('id', 'symbol')
+    if symbols is not None:
+        stocks = stocks.filter(symbol__in=[symbol.upper() for symbol in symbols])
+
+    sparklines = []
+    for stock in stocks:
+        bars = price_store.load_bars(stock.symbol, '1d', period=PERIOD)
+        built = build(bars['Close'].to_numpy(dtype=float)) if bars is not None else None
+        if built is not None:
+            closes, change, svg = built
+            sparklines.append(Sparkline(stock=stock, closes=closes, change=change, svg=svg))
+
+    Sparkline.objects.bulk_create(
+        sparklines, batch_size=500,
+        update_conflicts=True, unique_fields=['stock'], update_fields=['closes', 'change', 'svg', 'updated_at'],
+    )
+    if sparklines:
+        versions.bump()
+    return len(sparklines)
+
+
+def attach(rows):
+    """Add the ``sparkline`` of each stock dict (screening index rows) with a single query"""
+    symbols = [row['symbol'] for row in rows]
+    svgs = dict(Sparkline.objects.filter(stock__symbol__in=symbols).values_list('stock__symbol', 'svg'))
+    for row in rows:
+        if row['symbol'] in svgs:
+            row['sparkline'] = {'svg': svgs[row['symbol']]}
+    return rows
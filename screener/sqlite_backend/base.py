@@ -0,0 +1,16 @@
+"""SQLite backend whose transactions start with ``BEGIN IMMEDIATE``.
+
+A deferred transaction that reads before it writes fails at once with
+"database is locked" when another writer committed in between, whatever the
+busy timeout; an immediate one takes the write lock first and waits for it.
+Django 5.1 added ``OPTIONS['transaction_mode'] = 'IMMEDIATE'`` for this, and
+the settings use it there; this backend does the same for Django 4.2, which
+the requirements pin.
+"""
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE')
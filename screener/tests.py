@@ -1,3 +1,1232 @@
-from django.test import TestCase
+from pathlib import Path
+from unittest import mock
+import json
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from multiprocessing.shared_memory import SharedMemory
+from datetime import date, timedelta
+from statistics import NormalDist
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.core.cache import caches
+from django.db import OperationalError, connection
+from django.db.utils import load_backend
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import (
+    alerts, analytics, cache, compute, db, facets, jobs, market_data, offline, provider, queries, risk, rolling, rules,
+    screening, similarity, snapshots, sparklines, versions,
+)
+from . import prices as price_store
+from .management.commands.bench_startup import BOOT_SCRIPT, HEAVY_MODULES
+from .models import AnalysisJob, FundamentalSnapshot, PriceChunk, ScreenRule, Sparkline, Stock
+from .screens import apply_criteria
+
+LOCMEM_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'state': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'state'},
+}
+
+
+def fake_history(symbol, period='1y', interval='1d'):
+    """Deterministic random-walk history standing in for Yahoo Finance"""
+    rng = np.random.default_rng(zlib.crc32(symbol.encode()))
+    index = pd.bdate_range(end='2026-10-16', periods=252, tz='America/New_York')
+    closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, len(index))))
+    return pd.DataFrame({
+        'Open': closes, 'High': closes, 'Low': closes, 'Close': closes, 'Volume': 1e6,
+    }, index=index)
+
+
+def create_stocks(count):
+    Stock.objects.bulk_create([
+        Stock(symbol=f'S{i:03d}', name=f'Stock {i}', sector='Technology', current_price=10 + i)
+        for i in range(count)
+    ])
+    queries.invalidate_universe()
+
+
+@override_settings(CACHES=LOCMEM_CACHES, ALLOWED_HOSTS=['testserver'], SCREENER_PAGE_CACHE_SECONDS=0)
+class QueryCountTests(TestCase):
+    """Per-request database work must not grow with the universe (when rendering)"""
+
+    def setUp(self):
+        patches = [
+            mock.patch('screener.market_data.get_history', side_effect=fake_history),
+            mock.patch('screener.market_data.get_info', return_value={}),
+            mock.patch('screener.market_data.get_calendar', return_value=None),
+            mock.patch('screener.market_data.get_news', return_value=[]),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def assertConstantQueries(self, url, num):
+        for size in (3, 30):
+            Stock.objects.all().delete()
+            create_stocks(size)
+            self.client.get(url)  # warm the universe cache
+            with self.assertNumQueries(num):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+
+    def test_analysis_uses_cached_universe(self):
+        self.assertConstantQueries(reverse('screener:analysis') + '?symbol=S001', 0)
+
+    def test_analysis_cold_cache_loads_universe_once(self):
+        create_stocks(20)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('screener:analysis') + '?symbol=S001')
+        self.assertEqual(len(response.context['correlation_symbols']), 20)
+
+    def test_all_stocks_single_query(self):
+        self.assertConstantQueries(reverse('screener:all_stocks'), 1)
+
+    def test_stock_detail_single_query(self):
+        self.assertConstantQueries(reverse('screener:stock_detail', args=['S001']), 1)
+
+    def test_universe_invalidated_on_save(self):
+        create_stocks(2)
+        self.assertEqual(queries.stock_name('S001'), 'Stock 1')
+        stock = Stock.objects.get(symbol='S001')
+        stock.name = 'Renamed'
+        stock.save()
+        self.assertEqual(queries.stock_name('S001'), 'Renamed')
+        stock.delete()
+        self.assertIsNone(queries.find_stock('S001'))
+
+
+@override_settings(CACHES=LOCMEM_CACHES, ALLOWED_HOSTS=['testserver'], SCREENER_PAGE_CACHE_SECONDS=900)
+class PageCacheTests(TestCase):
+    """Read-only pages are served from the cache or as 304 until their data changes"""
+
+    def setUp(self):
+        create_stocks(3)
+        versions.bump('S001')
+        self.url = reverse('screener:stock_detail', args=['S001'])
+        for name, value in [('get_history', fake_history('S001')), ('get_info', {}), ('get_news', [])]:
+            patch = mock.patch(f'screener.market_data.{name}', return_value=value)
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_repeat_views_skip_rendering(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first.status_code, 200)
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+        not_modified = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        not_modified = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_data_changes_invalidate_pages(self):
+        etag = self.client.get(self.url)['ETag']
+        all_stocks_etag = self.client.get(reverse('screener:all_stocks'))['ETag']
+
+        # Another symbol's prices: this page is still valid, the universe list is not
+        time.sleep(1)
+        price_store.store_bars('S002', '1d', fake_history('S002'))
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertNotEqual(self.client.get(reverse('screener:all_stocks'))['ETag'], all_stocks_etag)
+
+        stock = Stock.objects.get(symbol='S001')
+        stock.name = 'Renamed'
+        stock.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Renamed')
+
+    def test_intraday_pages_expire_with_their_bars(self):
+        now = 900 * 2000000 + 10
+        renders = mock.patch('screener.views.queries.universe', wraps=queries.universe)
+        with mock.patch('screener.versions.time.time', side_effect=lambda: now), renders as universe:
+            for interval in ('5m', '1d'):
+                self.client.get(reverse('screener:analysis'), {'interval': interval})
+                etag = self.client.get(reverse('screener:analysis'), {'interval': interval})['ETag']
+                self.assertEqual(universe.call_count, 1, interval)
+
+                now += market_data.INTRADAY_HISTORY_TIMEOUT
+                response = self.client.get(reverse('screener:analysis'), {'interval': interval}, HTTP_IF_NONE_MATCH=etag)
+                # Intraday: a new window, so the page is rendered again; daily: still cached
+                self.assertEqual(response.status_code, 200 if interval == '5m' else 304)
+                self.assertEqual(universe.call_count, 2 if interval == '5m' else 1)
+                universe.reset_mock()
+
+    def test_pages_with_messages_are_not_cached(self):
+        url = reverse('screener:stock_detail', args=['MISSING'])
+        for _ in range(2):
+            with self.assertNumQueries(1):
+                self.assertContains(self.client.get(url), 'not found')
+
+
+def file_caches(directory, max_entries=300):
+    """File-based default and state caches in ``directory``, like the default production settings"""
+    backend = 'django.core.cache.backends.filebased.FileBasedCache'
+    return {
+        'default': {'BACKEND': backend, 'LOCATION': directory, 'OPTIONS': {'MAX_ENTRIES': max_entries}},
+        'state': {'BACKEND': backend, 'LOCATION': os.path.join(directory, 'state'), 'TIMEOUT': None},
+    }
+
+
+@override_settings(CACHES=LOCMEM_CACHES, SCREENER_CACHE_COMPRESS_MIN_BYTES=1024)
+class CacheTests(SimpleTestCase):
+    """Values round-trip compressed through a real backend; counters cost no shared write per read"""
+
+    def setUp(self):
+        cache.reset_stats()
+        self.addCleanup(cache.reset_stats)
+
+    def test_compression_round_trip(self):
+        small, large = {'price': 1.5}, fake_history('AAA')
+        self.assertEqual(cache._dumps(small)[:1], cache._RAW)
+        blob = cache._dumps(large)
+        self.assertIn(blob[:1], (cache._ZLIB, cache._LZ4))
+        self.assertLess(len(blob), len(pickle.dumps(large)))
+        pd.testing.assert_frame_equal(cache._loads(blob), large)
+
+    def test_file_backend_round_trip(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(CACHES=file_caches(directory)):
+            frame = fake_history('AAA')
+            cache.set('history', 'AAA', frame, timeout=60, stale_timeout=3600)
+            pd.testing.assert_frame_equal(cache.get('history', 'AAA'), frame)
+            cache.set('history', 'AAA', frame, timeout=0, stale_timeout=3600)  # expired at once
+            self.assertIsNone(cache.get('history', 'AAA'))
+            pd.testing.assert_frame_equal(cache.get_stale('history', 'AAA'), frame)
+            cache.delete('history', 'AAA')
+            self.assertIsNone(cache.get_stale('history', 'AAA'))
+
+            self.assertIsNone(cache.get_or_set('info', 'X', lambda: None))
+            self.assertEqual(cache.get_or_set('info', 'X', lambda: {'a': 1}), {'a': 1})
+            self.assertEqual(cache.get_or_set('info', 'X', lambda: {'a': 2}), {'a': 1})
+
+    def test_counters_are_flushed_in_batches(self):
+        with mock.patch('screener.cache.incr_counter', wraps=cache.incr_counter) as incr:
+            for _ in range(cache.FLUSH_EVERY - 1):
+                cache.get('info', 'missing')
+            incr.assert_not_called()
+            cache.get('info', 'missing')
+            incr.assert_called_once_with('md-stats:info:misses', cache.FLUSH_EVERY)
+
+        cache.set('info', 'present', 1)
+        cache.get('info', 'present')
+        self.assertEqual(cache.stats()['info'], {
+            'hits': 1, 'misses': cache.FLUSH_EVERY, 'hit_rate': 1 / (cache.FLUSH_EVERY + 1),
+        })
+
+    def test_state_survives_market_data_culling(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(CACHES=file_caches(directory, 5)):
+            versions.bump('AAA')
+            version = versions.get('AAA')
+            for i in range(50):
+                cache.set('history', f'S{i}', i)
+            self.assertEqual(versions.get('AAA'), version)
+            self.assertLess(sum(cache.get('history', f'S{i}') is not None for i in range(50)), 50)
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHES, SCREENER_BREAKER_THRESHOLD=2, SCREENER_PROVIDER_BURST=3,
+    SCREENER_PROVIDER_RATE=0.001, SCREENER_PROVIDER_MAX_WAIT=0,
+)
+class ProviderTests(TestCase):
+    """Provider incidents are served from stale data without calling Yahoo"""
+
+    def setUp(self):
+        provider._breakers.clear()
+        provider._limiter = None
+        self.addCleanup(provider._breakers.clear)
+        self.addCleanup(setattr, provider, '_limiter', None)
+        self.ticker = mock.patch.object(market_data.yf, 'Ticker').start()
+        self.addCleanup(mock.patch.stopall)
+
+    def test_open_breaker_serves_stale_history(self):
+        # An earlier response whose fresh entry has expired
+        frame = fake_history('AAPL')
+        market_data.cache.set('history', 'AAPL:1y:1d', frame, timeout=0, stale_timeout=60)
+        self.ticker.return_value.history.side_effect = RuntimeError('429 Too Many Requests')
+        
+        with self.assertRaises(RuntimeError):
+            market_data.get_history('MSFT')
+        with self.assertRaises(RuntimeError):
+            market_data.get_history('MSFT')
+        self.assertEqual(provider.get_breaker('history').state(), provider.OPEN)
+        
+        calls = self.ticker.call_count
+        pd.testing.assert_frame_equal(market_data.get_history('AAPL'), frame)
+        self.assertEqual(self.ticker.call_count, calls)
+        self.assertEqual(provider.stats()['history']['short_circuited'], 1)
+
+    def test_rate_limit_throttles_after_burst(self):
+        self.ticker.return_value.info = {'symbol': 'X'}
+        for symbol in ('A', 'B', 'C'):
+            market_data.get_info(symbol)
+        with self.assertRaises(provider.ProviderUnavailable):
+            market_data.get_info('D')
+        self.assertEqual(provider.stats()['info']['throttled'], 1)
+
+
+def minute_bars(sessions, end='2026-10-16'):
+    """Random-walk 1m bars of the last ``sessions`` trading sessions up to ``end`` (New York time)"""
+    days = pd.bdate_range(end=end, periods=sessions)
+    index = pd.DatetimeIndex(np.concatenate([
+        pd.date_range(f'{day.date()} 09:30', periods=390, freq='1min', tz='America/New_York')
+        for day in days
+    ]))
+    rng = np.random.default_rng(len(index))
+    closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.001, len(index))))
+    return pd.DataFrame({
+        'Open': closes, 'High': closes * 1.001, 'Low': closes * 0.999, 'Close': closes,
+        'Volume': rng.integers(1, 1000, len(index)).astype(float),
+    }, index=index)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class PriceStoreTests(TestCase):
+    """Bars are chunked, resampled across chunk boundaries and topped up once stale"""
+
+    def test_chunks_by_interval(self):
+        bars = minute_bars(3)
+        self.assertEqual(price_store.store_bars('AAA', '1m', bars), 3)  # one chunk per session
+        hourly = price_store.load_bars('AAA', '1h')
+        self.assertEqual(price_store.store_bars('AAA', '1h', hourly), 1)  # one chunk per month
+        self.assertEqual(PriceChunk.objects.filter(symbol='AAA', interval='1m').count(), 3)
+
+        loaded = price_store.load_bars('AAA', '1m')
+        np.testing.assert_array_equal(loaded['Close'].to_numpy(), bars['Close'].to_numpy())
+        self.assertTrue(loaded.index.equals(bars.index.tz_convert('UTC')))
+
+        # Re-storing overlapping bars merges them, newer values winning
+        update = bars.iloc[-5:].assign(Close=1.0)
+        price_store.store_bars('AAA', '1m', update)
+        self.assertEqual(price_store.load_bars('AAA', '1m')['Close'].iloc[-1], 1.0)
+        self.assertEqual(len(price_store.load_bars('AAA', '1m')), len(bars))
+
+    def test_resampling_matches_pandas_per_session(self):
+        bars = minute_bars(3)
+        price_store.store_bars('AAA', '1m', bars)
+        hourly = price_store.load_bars('AAA', '1h')
+        # 7 bars per session: the last one covers the final 30 minutes
+        self.assertEqual(len(hourly), 3 * price_store.bars_per_session('1h'))
+
+        utc = bars.tz_convert('UTC')
+        expected = pd.concat([
+            day.resample('60min', origin='start').agg(
+                {'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last', 'Volume': 'sum'}
+            )
+            for _, day in utc.groupby(utc.index.normalize())
+        ])
+        expected.index = expected.index.as_unit('ns')
+        pd.testing.assert_frame_equal(hourly, expected, check_freq=False)
+
+        # Streaming one chunk at a time gives the same bars as resampling everything at once
+        streamed = pd.concat(price_store.resample_stream(price_store.iter_chunks('AAA', '1m'), '5m'))
+        whole = pd.concat(price_store.resample_stream([price_store.load_bars('AAA', '1m')], '5m'))
+        pd.testing.assert_frame_equal(streamed, whole)
+
+    def test_periods_per_year(self):
+        self.assertEqual(price_store.periods_per_year('1d'), 252)
+        self.assertEqual(price_store.periods_per_year('1h'), 7 * 252)
+        self.assertEqual(price_store.periods_per_year('5m'), 78 * 252)
+        self.assertEqual(price_store.periods_per_year('1m'), 390 * 252)
+
+    def test_stale_intraday_bars_are_topped_up(self):
+        now = pd.Timestamp.now(tz='UTC').floor('min')
+        recent = minute_bars(2).iloc[:100]
+        recent.index = pd.date_range(end=now - pd.Timedelta(minutes=30), periods=100, freq='1min', tz='UTC')
+        price_store.store_bars('AAA', '1m', recent)
+
+        newer = recent.iloc[-10:].copy()
+        newer.index = pd.date_range(end=pd.Timestamp.now(tz='UTC'), periods=10, freq='1min')
+        with mock.patch('screener.market_data.get_history', return_value=newer) as get_history:
+            bars = price_store.get_bars('AAA', '1m', '5d')
+        get_history.assert_called_once_with('AAA', '5d', '1m')
+        self.assertEqual(bars.index[-1], newer.index[-1])
+
+        # Fresh bars are served from the store without calling the provider
+        with mock.patch('screener.market_data.get_history') as get_history:
+            price_store.get_bars('AAA', '1m', '5d')
+        get_history.assert_not_called()
+
+    def test_unchanged_tail_writes_nothing(self):
+        recent = minute_bars(1).iloc[:50]
+        recent.index = pd.date_range(end=pd.Timestamp.now(tz='UTC') - pd.Timedelta(hours=1),
+                                     periods=50, freq='1min', tz='UTC')
+        price_store.store_bars('AAA', '1m', recent)
+        version = versions.get()
+
+        with mock.patch('screener.market_data.get_history', return_value=recent):
+            self.assertEqual(price_store.refresh_tail('AAA', '1m'), 0)
+        self.assertEqual(versions.get(), version)
+
+        with mock.patch('screener.market_data.get_history', side_effect=RuntimeError('down')):
+            bars = price_store.get_bars('AAA', '1m', '5d')
+        self.assertEqual(len(bars), 50)
+
+
+class ComputeTests(SimpleTestCase):
+    """The process pool returns what the inline path does and releases shared memory"""
+
+    def setUp(self):
+        self.executor = compute.ComputeExecutor(1)
+        self.addCleanup(self.executor.shutdown, wait=False)
+
+    def assertReleased(self, names):
+        deadline = time.monotonic() + 5
+        while True:
+            try:
+                SharedMemory(name=names[0]).close()
+            except FileNotFoundError:
+                names = names[1:]
+                if not names:
+                    return
+                continue
+            if time.monotonic() > deadline:
+                self.fail(f'Shared memory {names[0]} was not released')
+            time.sleep(0.05)
+
+    def test_pool_matches_inline(self):
+        closes = fake_history('AAA')['Close'].to_numpy()
+        task = self.executor.submit(analytics.analyze_prices, closes, args=(252,))
+        names = [block.spec[0] for block in task._shared]
+        self.assertEqual(len(names), 1)
+        inline = compute.ComputeExecutor(0).run(analytics.analyze_prices, closes, args=(252,))
+        self.assertEqual(task.result(timeout=60), inline)
+        self.assertReleased(names)
+
+    def test_timeout_and_cancel(self):
+        self.executor.run(len, np.zeros(1))  # start the worker
+        running = self.executor.submit(time.sleep, args=(1,))
+        with self.assertRaises(compute.ComputeTimeout):
+            running.result(timeout=0.05)
+        # A running task cannot be cancelled: it finishes and its arrays are released then
+        self.assertFalse(running.cancel())
+
+        queued = [self.executor.submit(np.sum, np.ones(10)) for _ in range(3)]
+        names = [block.spec[0] for block in queued[-1]._shared]
+        self.assertTrue(queued[-1].cancel())
+        self.assertReleased(names)
+        self.assertEqual(queued[0].result(timeout=60), 10)
+
+
+class FacetTests(TestCase):
+    """Facet counts follow saves and deletes without reading the saved row again"""
+
+    def setUp(self):
+        for i, (sector, pe, cap) in enumerate([('Energy', 10, 1e9), ('Energy', 30, 5e10), ('Utilities', None, 3e11)]):
+            Stock.objects.create(symbol=f'F{i}', name=f'F{i}', sector=sector, pe_ratio=pe, market_cap=cap)
+
+    def assertCountsMatch(self):
+        self.assertEqual(facets.facet_counts(), facets.facet_counts(Stock.objects.all()))
+
+    def test_counts_follow_saves_and_deletes(self):
+        self.assertCountsMatch()
+        stock = Stock.objects.get(symbol='F0')
+        stock.sector, stock.pe_ratio = 'Utilities', -5
+        stock.save()
+        stock.market_cap = 5e12
+        stock.save()
+        self.assertCountsMatch()
+
+        stock = Stock.objects.only('id', 'symbol').get(symbol='F1')
+        stock.industry = 'Oil'
+        stock.save()
+        self.assertCountsMatch()
+        other = Stock.objects.get(pk=stock.pk)
+        other.sector = 'Technology'
+        other.save()
+        stock.refresh_from_db()
+        stock.pe_ratio = 50
+        stock.save()
+        Stock(pk=stock.pk, symbol='F1', name='F1', sector='Energy').save()
+        Stock.objects.update_or_create(symbol='F2', defaults={'pe_ratio': 12})
+        self.assertCountsMatch()
+
+        Stock.objects.get(symbol='F0').delete()
+        self.assertCountsMatch()
+        self.assertEqual(dict(facets.facet_counts()['sector']), {'Energy': 1, 'Utilities': 1})
+
+    def test_saving_a_loaded_stock_reads_nothing(self):
+        stock = Stock.objects.get(symbol='F0')
+        stock.sector = 'Technology'
+        with CaptureQueriesContext(connection) as queries_run:
+            stock.save()
+        reads = [query['sql'] for query in queries_run if 'FROM "screener_stock"' in query['sql']]
+        self.assertEqual(reads, [])
+        self.assertCountsMatch()
+
+
+class ScreeningIndexTests(TestCase):
+    """The columnar index screens like the ORM and picks up other processes' writes"""
+
+    screens = [
+        {},
+        {'min_price': 12, 'max_price': 15},
+        {'max_pe': 20, 'sector': 'ENER'},
+        {'min_market_cap': 1e9, 'min_cvar': -3},
+        {'sector': 'none'},
+    ]
+
+    def setUp(self):
+        create_stocks(8)
+        for i, stock in enumerate(Stock.objects.all()):
+            stock.sector = ['Energy', 'Technology'][i % 2]
+            stock.pe_ratio = None if i == 3 else 5 * i
+            stock.market_cap = 1e8 * 4 ** i
+            stock.cvar_95 = -i
+            stock.save()
+        screening.reset_index()
+        self.addCleanup(screening.reset_index)
+
+    def assertScreensMatch(self, index):
+        for criteria in self.screens:
+            expected = screening._stock_rows(apply_criteria(Stock.objects.all(), criteria))
+            self.assertEqual(index.screen(criteria), expected, criteria)
+
+    def test_screen_matches_orm(self):
+        self.assertScreensMatch(screening.get_index())
+
+    def test_refresh_applies_writes_of_other_processes(self):
+        index = screening.get_index()
+        seen = index.last_updated
+        # Written elsewhere (no signals): one row in the same clock tick as the
+        # last write the index saw, one later, and one deleted
+        Stock.objects.filter(symbol='S001').update(current_price=13, last_updated=seen)
+        Stock.objects.filter(symbol='S002').update(pe_ratio=1, last_updated=seen + timedelta(seconds=1))
+        screening._refresh(index)
+        self.assertScreensMatch(index)
+        self.assertEqual(index.last_updated, seen + timedelta(seconds=1))
+
+        Stock.objects.filter(symbol='S004').delete()
+        screening._refresh(index)
+        self.assertNotIn('S004', [row['symbol'] for row in index.screen({})])
+        self.assertScreensMatch(index)
+
+    def test_saves_in_this_process_update_the_index(self):
+        index = screening.get_index()
+        stock = Stock.objects.get(symbol='S005')
+        stock.current_price = 14
+        stock.save()
+        Stock.objects.get(symbol='S006').delete()
+        self.assertScreensMatch(index)
+        with self.assertNumQueries(1):
+            screening._refresh(index)
+
+
+class SnapshotTests(TestCase):
+    """Snapshots store changes only and answer "as of" lookups from one row"""
+
+    days = [date(2026, 10, day) for day in (12, 13, 14, 15)]
+
+    def stock(self, symbol='aaa', **fields):
+        return Stock(symbol=symbol, name=symbol, current_price=10, pe_ratio=20, **fields)
+
+    def test_records_only_changes(self):
+        stock = self.stock()
+        first = snapshots.record_snapshot(stock, self.days[0])
+        self.assertEqual(first.values, {field: getattr(stock, field) for field in snapshots.TRACKED_FIELDS})
+        self.assertIsNone(snapshots.record_snapshot(stock, self.days[1]))
+
+        stock.current_price = 11
+        changed = snapshots.record_snapshot(stock, self.days[2])
+        self.assertEqual(changed.values, {'current_price': 11})
+        self.assertEqual(changed.state, {**first.values, 'current_price': 11})
+        # Same day: merged into one row, and dropped once the values revert
+        stock.pe_ratio = 25
+        self.assertEqual(snapshots.record_snapshot(stock, self.days[2]).values, {'current_price': 11, 'pe_ratio': 25})
+        stock.current_price, stock.pe_ratio = 10, 20
+        self.assertIsNone(snapshots.record_snapshot(stock, self.days[2]))
+        self.assertEqual(list(FundamentalSnapshot.objects.values_list('date', flat=True)), self.days[:1])
+
+    def test_as_of(self):
+        stock, other = self.stock(), self.stock('bbb')
+        snapshots.record_snapshot(stock, self.days[0])
+        snapshots.record_snapshot(other, self.days[1])
+        stock.current_price = 11
+        snapshots.record_snapshot(stock, self.days[2])
+
+        with self.assertNumQueries(1):
+            self.assertIsNone(snapshots.snapshot_as_of('AAA', date(2026, 10, 1)))
+        with self.assertNumQueries(1):
+            self.assertEqual(snapshots.snapshot_as_of('aaa', self.days[1])['current_price'], 10)
+        self.assertEqual(snapshots.snapshot_as_of('AAA', self.days[3])['current_price'], 11)
+        with self.assertNumQueries(1):
+            universe = snapshots.universe_as_of(self.days[2])
+        self.assertEqual({symbol: state['current_price'] for symbol, state in universe.items()}, {'AAA': 11, 'BBB': 10})
+        self.assertEqual(list(snapshots.universe_as_of(self.days[0], symbols=['aaa', 'bbb'])), ['AAA'])
+
+    def test_later_snapshot(self):
+        future = timezone.localdate() + timedelta(days=1)
+        snapshots.record_snapshot(self.stock(), future)
+        with self.assertRaises(snapshots.LaterSnapshotError):
+            snapshots.record_snapshot(self.stock(), future - timedelta(days=1))
+        # Saving the stock still works: the signal only logs
+        with self.assertLogs('screener.signals', 'WARNING'):
+            Stock.objects.create(symbol='AAA', name='AAA', current_price=12)
+        self.assertEqual(FundamentalSnapshot.objects.count(), 1)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class JobQueueTests(TestCase):
+    """Jobs are claimed once, record their outcome and come back when their worker dies"""
+
+    def setUp(self):
+        patcher = mock.patch.dict(jobs.HANDLERS, {'echo': self.echo, 'boom': lambda params, report: 1 / 0})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def echo(self, params, report):
+        report(0.5, 'moitié')
+        return params
+
+    def age(self, job, seconds, **fields):
+        then = timezone.now() - timedelta(seconds=seconds)
+        AnalysisJob.objects.filter(pk=job.pk).update(**{field: then for field in fields})
+
+    def test_claim_in_order_once(self):
+        first = jobs.enqueue('echo', {'n': 1})
+        second = jobs.enqueue('echo', {'n': 2})
+        self.assertEqual(jobs.enqueue('echo', {'n': 3}, key='k').pk, jobs.enqueue('echo', {}, key='k').pk)
+
+        claimed = jobs.claim_next('w1')
+        self.assertEqual(claimed.pk, first.pk)
+        self.assertEqual((claimed.status, claimed.worker), (AnalysisJob.RUNNING, 'w1'))
+        self.assertIsNotNone(claimed.heartbeat_at)
+        self.assertEqual(jobs.claim_next('w2').pk, second.pk)
+        jobs.claim_next('w1')
+        self.assertIsNone(jobs.claim_next('w2'))
+
+    def test_run_stores_result_or_traceback(self):
+        jobs.enqueue('echo', {'n': 1}, key='echo:1')
+        job = jobs.claim_next('w')
+        self.assertTrue(jobs.run_job(job))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.progress, job.result), (AnalysisJob.DONE, 1.0, {'n': 1}))
+        self.assertEqual(jobs.cached_result('echo:1'), {'n': 1})
+
+        jobs.enqueue('boom', {})
+        job = jobs.claim_next('w')
+        with self.assertLogs('screener.jobs', 'ERROR'):
+            self.assertFalse(jobs.run_job(job))
+        job.refresh_from_db()
+        self.assertEqual(job.status, AnalysisJob.FAILED)
+        self.assertIn('ZeroDivisionError', job.error)
+        self.assertIsNotNone(job.finished_at)
+
+    def test_requeue_only_silent_jobs(self):
+        dead = jobs.enqueue('echo', {'n': 1})
+        alive = jobs.enqueue('echo', {'n': 2})
+        jobs.claim_next('w1')
+        jobs.claim_next('w2')
+        self.age(dead, 300, started_at=True, heartbeat_at=True)
+        self.age(alive, 300, started_at=True)
+        # A job that started long ago but still beats is left alone
+        self.assertEqual(jobs.requeue_stale(120), 1)
+        dead.refresh_from_db()
+        alive.refresh_from_db()
+        self.assertEqual((dead.status, dead.worker), (AnalysisJob.QUEUED, ''))
+        self.assertEqual(alive.status, AnalysisJob.RUNNING)
+        self.assertEqual(jobs.claim_next('w3').pk, dead.pk)
+
+    def test_late_finish_of_a_requeued_job_is_dropped(self):
+        jobs.enqueue('echo', {'n': 1}, key='echo:late')
+        slow = jobs.claim_next('w1')
+        self.age(slow, 300, heartbeat_at=True)
+        jobs.requeue_stale(120)
+        again = jobs.claim_next('w2')
+
+        with self.assertLogs('screener.jobs', 'WARNING'):
+            self.assertFalse(jobs.run_job(slow))
+        again.refresh_from_db()
+        self.assertEqual((again.status, again.worker, again.result), (AnalysisJob.RUNNING, 'w2', None))
+        self.assertIsNone(jobs.cached_result('echo:late'))
+        self.assertTrue(jobs.run_job(again))
+        self.assertEqual(jobs.cached_result('echo:late'), {'n': 1})
+
+    def test_enqueue_and_poll_through_the_api(self):
+        def post(payload):
+            return self.client.post(reverse('screener:enqueue_job'), json.dumps(payload), content_type='application/json')
+
+        def run_next():
+            with mock.patch('screener.prices.get_history', side_effect=fake_history), \
+                    mock.patch('screener.compute.run', side_effect=lambda fn, *a, **kw: fn(*a, *kw['args'])):
+                jobs.run_job(jobs.claim_next('w'))
+
+        response = post({'kind': 'backtest', 'params': {'symbols': ['AAA', 'BBB'], 'weights': [1, 3]}})
+        self.assertEqual(response.status_code, 202)
+        url = reverse('screener:job_status', args=[response.json()['id']])
+        self.assertEqual(self.client.get(url).json()['status'], AnalysisJob.QUEUED)
+        run_next()
+        status = self.client.get(url).json()
+        self.assertEqual((status['status'], status['finished']), (AnalysisJob.DONE, True))
+        self.assertEqual(status['result']['weights'], [0.25, 0.75])
+
+        failing = post({'kind': 'backtest', 'params': {'symbols': ['AAA', 'BBB'], 'weights': [1, 0]}}).json()['id']
+        with self.assertLogs('screener.jobs', 'ERROR'):
+            run_next()
+        status = self.client.get(reverse('screener:job_status', args=[failing])).json()
+        self.assertEqual(status['status'], AnalysisJob.FAILED)
+        self.assertEqual(status['error'], 'ValueError: Les poids doivent être strictement positifs.')
+
+        self.assertEqual(post({'kind': 'backtest', 'params': {'symbols': []}}).status_code, 400)
+        self.assertEqual(post({'kind': 'echo', 'params': {'symbols': ['AAA']}}).status_code, 400)
+        self.assertEqual(post({'params': {}}).status_code, 400)
+        response = self.client.get(reverse('screener:job_status', args=[999999]))
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.json()['success'])
+
+    def test_heartbeat_and_progress_refresh_the_job(self):
+        jobs.enqueue('echo', {})
+        job = jobs.claim_next('w')
+        self.age(job, 300, heartbeat_at=True)
+        stop = mock.Mock(**{'wait.side_effect': [False, True]})
+        with mock.patch('screener.jobs.connection'):
+            jobs._beat(job, stop, 5)
+        self.assertEqual(jobs.requeue_stale(120), 0)
+
+        self.age(job, 300, heartbeat_at=True)
+        jobs._reporter(job)(0.3, 'encore')
+        self.assertEqual(jobs.requeue_stale(120), 0)
+        job.refresh_from_db()
+        self.assertEqual((job.progress, job.message), (0.3, 'encore'))
+
+    def test_backtest_weights(self):
+        with mock.patch('screener.prices.get_history', side_effect=fake_history):
+            for weights in ([1, 0], [1, -1], [1, 'x'], [1, float('nan')], [1]):
+                with self.subTest(weights=weights), self.assertRaises(ValueError):
+                    jobs.backtest({'symbols': ['AAA', 'BBB'], 'weights': weights}, lambda *a: None)
+            with mock.patch('screener.compute.run', side_effect=lambda fn, *a, **kw: fn(*a, *kw['args'])):
+                result = jobs.backtest({'symbols': ['AAA', 'BBB'], 'weights': [3, 1]}, lambda *a: None)
+        self.assertEqual(result['weights'], [0.75, 0.25])
+        with self.assertRaises(ValueError):
+            analytics.portfolio_backtest(np.zeros((3, 2)), [1, -1], 252)
+
+
+class RollingStatisticsTests(TestCase):
+    """The O(n) rolling kernel agrees with pandas' windowed computations"""
+
+    def test_matches_pandas_rolling(self):
+        rng = np.random.default_rng(0)
+        benchmark = rng.normal(0, 0.01, 300)
+        returns = np.column_stack([0.8 * benchmark + rng.normal(0, 0.01, 300), rng.normal(0, 0.02, 300)])
+        returns[50:55, 0] = np.nan
+        window = 40
+        
+        stats = analytics.rolling_statistics(returns, benchmark, window, 252, min_periods=30)
+        for column in range(returns.shape[1]):
+            x = pd.Series(returns[:, column])
+            y = pd.Series(benchmark).where(x.notna())
+            x_window, y_window = x.rolling(window, min_periods=30), y.rolling(window, min_periods=30)
+            volatility = x_window.std() * np.sqrt(252)
+            expected = {
+                'beta': x_window.cov(y) / y_window.var(),
+                'correlation': x_window.corr(y),
+                'volatility': volatility * 100,
+                'sharpe': (x_window.mean() * 252 - analytics.RISK_FREE_RATE) / volatility,
+            }
+            for name, series in expected.items():
+                np.testing.assert_allclose(stats[name][:, column], series.to_numpy(), rtol=1e-9, atol=1e-12)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, ALLOWED_HOSTS=['testserver'])
+class RollingApiTests(TestCase):
+    """/api/rolling/ serves the kernel's series and rejects bad windows"""
+
+    def setUp(self):
+        caches['default'].clear()
+        patcher = mock.patch(
+            'screener.prices.get_bars',
+            side_effect=lambda symbol, interval, period: None if symbol in ('ZZZ', '^BAD') else fake_history(symbol),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get(self, **params):
+        return self.client.get(reverse('screener:rolling_api'), params)
+
+    def test_series(self):
+        response = self.get(symbols='aaa,ZZZ', window='20')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual((data['benchmark'], data['window'], data['missing']), ('^GSPC', 20, ['ZZZ']))
+        self.assertEqual(list(data['series']), ['AAA'])
+        self.assertEqual(len(data['dates']), 251)
+        self.assertEqual(data['dates'][-1], '2026-10-16')
+
+        series = data['series']['AAA']
+        self.assertEqual(set(series), set(rolling.STATISTICS))
+        x = fake_history('AAA')['Close'].pct_change().iloc[1:]
+        y = fake_history('^GSPC')['Close'].pct_change().iloc[1:]
+        beta = (x.rolling(20).cov(y) / y.rolling(20).var()).to_numpy()
+        correlation = x.rolling(20).corr(y).to_numpy()
+        for name, expected in (('beta', beta), ('correlation', correlation)):
+            self.assertEqual(len(series[name]), 251)
+            self.assertTrue(all(value is None for value in series[name][:19]), name)
+            np.testing.assert_allclose(series[name][19:], expected[19:], atol=0.005, err_msg=name)
+
+    def test_unknown_symbols(self):
+        data = self.get(symbols='ZZZ').json()
+        self.assertEqual((data['series'], data['missing']), ({}, ['ZZZ']))
+        response = self.get(symbols='AAA', benchmark='^BAD')
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.json()['success'])
+
+    def test_invalid_requests(self):
+        for params in (
+            {'symbols': 'AAA', 'window': 'abc'},
+            {'symbols': 'AAA', 'window': ''},
+            {'symbols': 'AAA', 'window': '1'},
+            {'symbols': 'AAA', 'window': '5000'},
+            {'symbols': 'AAA', 'window': '20', 'min_periods': '30'},
+            {'symbols': ''},
+        ):
+            with self.subTest(params=params):
+                response = self.get(**params)
+                self.assertEqual(response.status_code, 400)
+                self.assertFalse(response.json()['success'])
+
+
+@override_settings(CACHES=LOCMEM_CACHES, ALLOWED_HOSTS=['testserver'], SCREENER_PAGE_CACHE_SECONDS=0)
+class ComparisonTests(TestCase):
+    """One panel pass gives each symbol the metrics of its own analysis page"""
+
+    def test_panel_matches_single_symbol_analysis(self):
+        closes = np.column_stack([fake_history(s)['Close'].to_numpy() for s in ('AAA', 'BBB', 'CCC')])
+        closes[:60, 2] = np.nan  # listed later
+        benchmark = fake_history('^GSPC')['Close'].to_numpy()
+        panel = analytics.compare_panel(closes, benchmark, 252)
+
+        for column in range(3):
+            listed = ~np.isnan(closes[:, column])
+            expected = analytics.analyze_prices(closes[listed, column], 252)
+            for name in ('total_return', 'annualized_return', 'volatility', 'sharpe_ratio', 'sortino_ratio',
+                         'max_drawdown', 'var_95', 'sma_50', 'rsi_value', 'macd_value'):
+                self.assertAlmostEqual(panel[name][column], expected[name], places=9, msg=name)
+            x = pd.Series(closes[listed, column]).pct_change()
+            y = pd.Series(benchmark[listed]).pct_change()
+            self.assertAlmostEqual(panel['beta'][column], x.cov(y) / y.var(), places=9)
+
+    def test_view_fetches_the_benchmark_once(self):
+        create_stocks(4)
+        with mock.patch('screener.market_data.get_history', side_effect=fake_history) as get_history:
+            response = self.client.get(reverse('screener:compare'), {'symbols': 'S002, s000,S003'})
+        self.assertEqual(response.status_code, 200)
+        fetched = [call.args[0] for call in get_history.call_args_list]
+        self.assertEqual(sorted(fetched), ['S000', 'S002', 'S003', '^GSPC'])
+        comparison = response.context['comparison']
+        self.assertEqual([row['symbol'] for row in comparison['rows']], ['S002', 'S000', 'S003'])
+        self.assertEqual(len(comparison['normalized']['S000']), len(comparison['dates']))
+        self.assertEqual(comparison['correlation']['S000']['S000'], 1.0)
+
+        response = self.client.get(reverse('screener:compare'), {'symbols': 'S000,NOPE'})
+        self.assertIsNone(response.context['comparison'])
+        self.assertEqual(len(list(response.context['messages'])), 2)
+
+
+class RiskTests(TestCase):
+    """The streaming risk accumulator agrees with direct computations and feeds the screener"""
+
+    def test_matches_direct_computation(self):
+        closes = fake_history('AAA')['Close'].to_numpy()
+        metrics = risk.profile(closes)
+
+        returns = closes[1:] / closes[:-1] - 1
+        drawdown = closes[1:] / np.maximum.accumulate(closes[1:]) - 1
+        under_water = 0
+        longest = 0
+        for value in drawdown:
+            under_water = under_water + 1 if value < 0 else 0
+            longest = max(longest, under_water)
+        trough = int(np.argmin(drawdown))
+        recovered = np.flatnonzero(drawdown[trough:] >= 0)
+        tail = np.sort(returns)[:int(np.ceil(0.05 * len(returns)))]
+
+        self.assertAlmostEqual(metrics['max_drawdown'], drawdown.min() * 100, places=9)
+        self.assertEqual(metrics['max_drawdown_duration'], longest)
+        self.assertEqual(metrics['drawdown_duration'], under_water)
+        self.assertEqual(metrics['recovery'], recovered[0] if len(recovered) else None)
+        self.assertAlmostEqual(metrics['cvar_95'], tail.mean() * 100, places=9)
+        self.assertAlmostEqual(metrics['ulcer_index'], np.sqrt(np.mean((drawdown * 100) ** 2)), places=9)
+        self.assertAlmostEqual(
+            metrics['omega_ratio'], returns[returns > 0].sum() / -returns[returns < 0].sum(), places=9
+        )
+        # Expected shortfall of a normal at 5%: mean - std * pdf(z) / 0.05
+        z = NormalDist().inv_cdf(0.05)
+        normal_tail = returns.mean() - returns.std(ddof=1) * NormalDist().pdf(z) / 0.05
+        self.assertAlmostEqual(metrics['parametric_cvar_95'], normal_tail * 100, places=6)
+
+    def test_drawdown_matches_price_metrics(self):
+        # Falling from the first close: neither counts that close as a peak
+        closes = fake_history('AAA')['Close'].to_numpy()
+        closes = np.concatenate([[closes.max() * 2], closes])
+        metrics = analytics.price_metrics(closes, 252)
+        profile = risk.profile(closes)
+        self.assertAlmostEqual(profile['max_drawdown'], metrics['max_drawdown'], places=9)
+        self.assertAlmostEqual(profile['current_drawdown'], metrics['current_drawdown'], places=9)
+        self.assertAlmostEqual(risk.risk_metrics(closes)['max_drawdown'][0], metrics['max_drawdown'], places=9)
+        self.assertEqual(risk.profile(closes[:1]), dict.fromkeys(profile))
+
+    def test_streaming_panel_matches_each_listed_series(self):
+        closes = np.column_stack([fake_history(s)['Close'].to_numpy() for s in ('AAA', 'BBB', 'CCC')])
+        closes[:60, 1] = np.nan  # listed later
+        closes[100:105, 2] = np.nan  # trading halt
+        accumulator = risk.RiskAccumulator(3)
+        for row in closes[:150]:
+            accumulator.update(row)
+        accumulator.metrics()
+        for row in closes[150:]:
+            accumulator.update(row)
+        streamed = accumulator.metrics()
+
+        for column in range(3):
+            listed = closes[~np.isnan(closes[:, column]), column]
+            for name, value in risk.profile(listed).items():
+                if value is None:
+                    self.assertTrue(np.isnan(streamed[name][column]), name)
+                else:
+                    self.assertAlmostEqual(streamed[name][column], value, places=9, msg=name)
+
+    def test_screen_on_stored_risk_fields(self):
+        create_stocks(4)
+        for symbol in ('S000', 'S001', 'S002'):
+            price_store.store_bars(symbol, '1d', fake_history(symbol))
+        self.assertEqual(risk.update(), 3)
+        cvar = dict(Stock.objects.values_list('symbol', 'cvar_95'))
+        self.assertIsNone(cvar['S003'])
+        threshold = sorted(value for value in cvar.values() if value is not None)[1]
+        expected = sorted(symbol for symbol, value in cvar.items() if value is not None and value >= threshold)
+
+        with override_settings(CACHES=LOCMEM_CACHES, ALLOWED_HOSTS=['testserver'], SCREENER_PAGE_CACHE_SECONDS=0):
+            for columnar in (False, True):
+                with override_settings(SCREENER_COLUMNAR_INDEX=columnar):
+                    screening.reset_index()
+                    self.addCleanup(screening.reset_index)
+                    response = self.client.post(reverse('screener:home'), {'min_cvar': str(threshold)})
+                symbols = [stock['symbol'] if isinstance(stock, dict) else stock.symbol
+                           for stock in response.context['stocks']]
+                self.assertEqual(symbols, expected, f'columnar={columnar}')
+
+
+class SimilarityTests(TestCase):
+    """Unit return vectors give exact correlations and recoverable clusters"""
+
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        self.groups = np.repeat(np.arange(3), 20)
+        factors = rng.normal(0, 0.01, (250, 3))
+        self.returns = factors[:, self.groups] + rng.normal(0, 0.01, (250, 60))
+
+    def test_top_k_matches_correlations(self):
+        _, vectors = analytics.unit_vectors(self.returns, 60)
+        (most, most_scores), (least, least_scores) = analytics.top_k(vectors, 0, 5)
+        correlations = np.corrcoef(self.returns.T)[0]
+        correlations[0] = np.nan
+        order = np.argsort(correlations[~np.isnan(correlations)])
+        others = np.flatnonzero(~np.isnan(correlations))
+        np.testing.assert_array_equal(most, others[order[::-1][:5]])
+        np.testing.assert_array_equal(least, others[order[:5]])
+        np.testing.assert_allclose(most_scores, correlations[most], atol=1e-6)
+
+    def test_kmeans_recovers_groups(self):
+        _, vectors = analytics.unit_vectors(self.returns, 60)
+        labels = analytics.spherical_kmeans(vectors, 3)
+        for group in range(3):
+            self.assertEqual(len(set(labels[self.groups == group])), 1)
+        self.assertEqual(len(set(labels)), 3)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, ALLOWED_HOSTS=['testserver'], SCREENER_PAGE_CACHE_SECONDS=0)
+class SimilarityIndexTests(TestCase):
+    """Requests never build the index: they queue a build until one is published"""
+
+    def setUp(self):
+        caches['default'].clear()
+        caches['state'].clear()
+        create_stocks(4)
+        for symbol in ('S000', 'S001', 'S002', 'S003'):
+            price_store.store_bars(symbol, '1d', fake_history(symbol))
+        self.addCleanup(self.forget)
+        self.forget()
+
+    def forget(self):
+        similarity._index, similarity._checked_at = None, None
+
+    def test_not_built(self):
+        with mock.patch('screener.similarity.build') as build:
+            self.assertFalse(similarity.get_index().built)
+            response = self.client.get(reverse('screener:similar_stocks'), {'symbol': 'S000'})
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('build_similarity', ' '.join(str(m) for m in response.context['messages']))
+            self.assertEqual(self.client.get(reverse('screener:similar_stocks_api'), {'symbol': 'S000'}).status_code, 503)
+            self.assertEqual(self.client.get(reverse('screener:clusters_api')).status_code, 503)
+        build.assert_not_called()
+        self.assertFalse(AnalysisJob.objects.exists())
+
+    @override_settings(SCREENER_JOB_QUEUE=True)
+    def test_build_is_queued_once(self):
+        for _ in range(3):
+            self.assertFalse(similarity.get_index().built)
+        self.forget()
+        similarity.get_index()
+        self.assertEqual(AnalysisJob.objects.filter(kind='similarity').count(), 1)
+
+        self.assertTrue(jobs.run_job(jobs.claim_next('w')))
+        index = similarity.get_index()
+        self.assertEqual(index.symbols, ['S000', 'S001', 'S002', 'S003'])
+        response = self.client.get(reverse('screener:similar_stocks_api'), {'symbol': 'S000'})
+        self.assertIn(response.json()['most'][0]['symbol'], index.symbols)
+
+    def test_published_index_survives_culling(self):
+        built = similarity.build()
+        caches['default'].clear()
+        self.forget()
+        index = similarity.get_index()
+        self.assertTrue(index.built)
+        self.assertEqual((index.symbols, index.built_at), (built.symbols, built.built_at))
+        self.assertEqual(self.client.get(reverse('screener:clusters_api')).status_code, 200)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, ALLOWED_HOSTS=['testserver'])
+class AlertTests(TestCase):
+    """Rules compile to vectorized masks and alerts fire only for new matches"""
+
+    def setUp(self):
+        cache.delete('alerts', 'features')
+        cache.delete('alerts', 'evaluated_at')
+        create_stocks(3)
+        Stock.objects.filter(symbol='S000').update(pe_ratio=10)
+        Stock.objects.filter(symbol='S001').update(pe_ratio=30)
+        for symbol in queries.universe_symbols():
+            price_store.store_bars(symbol, '1d', fake_history(symbol))
+        self.rule = ScreenRule.objects.create(name='Cheap', expression='pe_ratio < 20 and price > 0')
+
+    def test_latest_indicators_match_chart_indicators(self):
+        closes = fake_history('AAPL')['Close'].to_numpy()
+        latest = analytics.latest_indicators(closes)
+        full = analytics.technical_indicators(closes)
+        for name in ('sma_20', 'sma_50', 'sma_200'):
+            self.assertAlmostEqual(latest[name], full[name])
+        self.assertAlmostEqual(latest['rsi'], full['rsi_value'])
+        self.assertEqual(latest['price'], full['current_close'])
+
+    def test_rule_masks(self):
+        panel = rules.Panel(['A', 'B', 'C'], [
+            {'price': 10, 'rsi': 25, 'sma_200': 9, 'fifty_two_week_low': 9.6, 'sector': 'Technology'},
+            {'price': 10, 'rsi': 35, 'sma_200': 11, 'fifty_two_week_low': 5, 'sector': 'Energy'},
+            {'price': None, 'rsi': 20, 'sma_200': None, 'sector': None},
+        ])
+        self.assertEqual(rules.compile_rule('RSI < 30 and above SMA-200').matches(panel), ['A'])
+        self.assertEqual(rules.compile_rule('price within 5% of fifty_two_week_low').matches(panel), ['A'])
+        self.assertEqual(rules.compile_rule('not price > 10 or sector contains "ENER"').matches(panel), ['A', 'B'])
+        self.assertEqual(rules.compile_rule('(price - sma_200) / sma_200 < 0').matches(panel), ['B'])
+        with self.assertRaises(rules.RuleError):
+            rules.compile_rule('rsi < 30 and')
+        with self.assertRaises(rules.RuleError):
+            rules.compile_rule('unknown > 1')
+
+    def test_alerts_only_for_changed_symbols_and_new_matches(self):
+        evaluation = alerts.evaluate()
+        self.assertEqual(evaluation.symbols, 3)
+        self.assertEqual([a.symbol for a in evaluation.alerts], ['S000'])
+
+        evaluation = alerts.evaluate()
+        self.assertEqual((evaluation.symbols, evaluation.alerts), (0, []))
+
+        stock = Stock.objects.get(symbol='S001')
+        stock.pe_ratio = 15
+        stock.save()
+        evaluation = alerts.evaluate()
+        self.assertEqual(evaluation.symbols, 1)
+        self.assertEqual([a.symbol for a in evaluation.alerts], ['S001'])
+        self.rule.refresh_from_db()
+        self.assertEqual(self.rule.matches, ['S000', 'S001'])
+        self.assertEqual(self.rule.alerts.count(), 2)
+
+    def test_alerts_page_saves_and_evaluates_rule(self):
+        response = self.client.post(reverse('screener:alerts'), {
+            'action': 'create', 'name': 'Low P/E', 'expression': 'pe_ratio <= 10',
+        })
+        self.assertRedirects(response, reverse('screener:alerts'))
+        self.assertEqual(ScreenRule.objects.get(name='Low P/E').matches, ['S000'])
+
+        response = self.client.post(reverse('screener:alerts'), {'action': 'create', 'expression': 'pe_ratio <'})
+        self.assertContains(response, 'Règle invalide')
+        self.assertEqual(ScreenRule.objects.count(), 2)
+
+        data = self.client.get(reverse('screener:alerts_api')).json()
+        self.assertEqual([(a['symbol'], a['rule']['name']) for a in data['alerts']], [('S000', 'Low P/E')])
+
+
+@override_settings(CACHES=LOCMEM_CACHES, ALLOWED_HOSTS=['testserver'])
+class SparklineTests(TestCase):
+    """Sparklines are built from stored bars and embedded without extra queries"""
+
+    def setUp(self):
+        create_stocks(3)
+        for symbol in ('S000', 'S001'):
+            price_store.store_bars(symbol, '1d', fake_history(symbol))
+
+    def test_downsample_keeps_first_and_last_close(self):
+        closes = np.arange(500, dtype=float)
+        sampled = sparklines.downsample(closes, 60)
+        self.assertEqual(len(sampled), 60)
+        self.assertEqual((sampled[0], sampled[-1]), (0, 499))
+        self.assertEqual(len(sparklines.downsample(closes[:10], 60)), 10)
+
+    def test_list_views_embed_sparklines(self):
+        self.assertEqual(sparklines.update(), 2)
+        self.assertEqual(Sparkline.objects.count(), 2)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('screener:all_stocks'))
+        self.assertContains(response, '<svg class="sparkline"', count=2)
+
+        with override_settings(SCREENER_COLUMNAR_INDEX=True):
+            screening.reset_index()
+            self.addCleanup(screening.reset_index)
+            response = self.client.post(reverse('screener:home'), {'min_price': '0'})
+        self.assertContains(response, '<svg class="sparkline"', count=2)
+
+
+class LockRetryTests(SimpleTestCase):
+    """Writes rejected with "database is locked" are retried, other errors are not"""
+
+    def setUp(self):
+        patcher = mock.patch('screener.db.time.sleep')
+        self.sleep = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_retries_locked_writes(self):
+        write = mock.Mock(side_effect=[OperationalError('database is locked'), 'saved'])
+        self.assertEqual(db.retry_on_lock(write)(), 'saved')
+        self.assertEqual(write.call_count, 2)
+
+    def test_gives_up_after_the_last_retry(self):
+        write = mock.Mock(side_effect=OperationalError('database is locked'))
+        with self.assertRaises(OperationalError):
+            db.retry_on_lock(write)()
+        self.assertEqual(write.call_count, db.LOCK_RETRIES + 1)
+
+    def test_other_errors_are_raised_at_once(self):
+        write = mock.Mock(side_effect=OperationalError('no such table: screener_stock'))
+        with self.assertRaises(OperationalError):
+            db.retry_on_lock(write)()
+        self.assertEqual(write.call_count, 1)
+
+
+class ReadReplicaTests(SimpleTestCase):
+    """Only reads of GET and HEAD requests go to the read-only connection"""
+
+    def route(self, method):
+        from django.db import router
+
+        seen = []
+        middleware = db.ReadConnectionMiddleware(lambda request: seen.append(router.db_for_read(Stock)) or HttpResponse())
+        middleware(RequestFactory().generic(method, '/'))
+        return seen[0]
+
+    def test_routing(self):
+        self.assertEqual(self.route('GET'), db.REPLICA)
+        self.assertEqual(self.route('HEAD'), db.REPLICA)
+        self.assertEqual(self.route('POST'), 'default')
+        with mock.patch('screener.db.transaction.get_connection') as get_connection:
+            get_connection.return_value.in_atomic_block = True
+            self.assertEqual(self.route('GET'), 'default')
+
+
+class SQLiteProfileTests(TestCase):
+    """Connections get the production pragmas; concurrent readers and writers never see a lock error"""
+
+    def test_pragmas(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            cursor.execute('PRAGMA cache_size')
+            self.assertEqual(cursor.fetchone()[0], -64000)
+
+    def test_transactions_take_the_write_lock_first(self):
+        with tempfile.TemporaryDirectory() as directory:
+            settings_dict = {
+                **connection.settings_dict,
+                'NAME': str(Path(directory) / 'lock.sqlite3'),
+                'OPTIONS': {**connection.settings_dict['OPTIONS'], 'timeout': 0},
+            }
+            backend = load_backend(settings_dict['ENGINE'])
+            first, second = (backend.DatabaseWrapper(settings_dict, alias) for alias in ('first', 'second'))
+            try:
+                first.set_autocommit(False, force_begin_transaction_with_broken_autocommit=True)
+                # Nothing was written yet, but the second transaction cannot begin
+                with self.assertRaisesMessage(OperationalError, 'database is locked'):
+                    second.set_autocommit(False, force_begin_transaction_with_broken_autocommit=True)
+            finally:
+                first.close()
+                second.close()
+
+    def test_concurrent_load(self):
+        with tempfile.TemporaryDirectory() as directory:
+            env = {
+                **os.environ,
+                'SCREENER_DB_PATH': str(Path(directory) / 'load.sqlite3'),
+                'SCREENER_CACHE_BACKEND': 'locmem',
+            }
+            manage = [sys.executable, str(settings.BASE_DIR / 'manage.py')]
+            subprocess.run(manage + ['migrate', '-v', '0'], env=env, capture_output=True, check=True)
+            proc = subprocess.run(
+                manage + ['bench_sqlite', '--seconds', '2', '--readers', '3', '--writers', '3', '--stocks', '20'],
+                env=env, capture_output=True, text=True,
+            )
+        self.assertEqual(proc.returncode, 0, proc.stderr)
+        self.assertIn('Errors: 0', proc.stdout)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, ANTHROPIC_API_KEY='offline')
+class LoadTestTests(TestCase):
+    """The offline stand-ins serve the app, and the load test runs against real workers"""
+
+    def setUp(self):
+        self.addCleanup(setattr, market_data, 'yf', market_data.yf)
+        self.addCleanup(sys.modules.pop, 'anthropic', None)
+        offline.install()
+
+    def test_offline_stand_ins(self):
+        history = market_data.get_history('AAA', period='1y')
+        self.assertEqual(len(history), 252)
+        np.testing.assert_array_equal(history['Close'].to_numpy(), offline.closes('AAA', 252))
+        self.assertEqual(offline.Ticker('AAA').info['regularMarketPrice'], history['Close'].iloc[-1])
+
+        create_stocks(1)
+        response = self.client.get(reverse('screener:summarize_news', args=['S000']))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['success'])
+
+    def test_load_test_run(self):
+        proc = subprocess.run(
+            [sys.executable, str(settings.BASE_DIR / 'manage.py'), 'load_test', '--sizes', '10', '--seconds', '1',
+             '--warmup', '0', '--workers', '1', '--clients', '2', '--provider-latency', '0', '--llm-latency', '0'],
+            capture_output=True, text=True,
+        )
+        self.assertEqual(proc.returncode, 0, proc.stderr)
+        self.assertIn('Errors: 0', proc.stdout)
+        self.assertRegex(proc.stdout, r'all +\d+ .* req/s')
+        self.assertRegex(proc.stdout, r'Facets: [1-9]\d* sectors, [1-9]\d* industries')
+
+
+class StartupImportTests(TestCase):
+    """Booting a worker must not import the market data and analytics stack"""
+
+    def test_heavy_modules_are_lazy(self):
+        script = BOOT_SCRIPT + f'; import sys; print(",".join(m for m in {HEAVY_MODULES!r} if m in sys.modules))'
+        proc = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True)
+        self.assertEqual(proc.stdout.strip(), '')
@@ -8,6 +8,17 @@ urlpatterns = [
     path('search/', views.search_stock, name='search'),
     path('all/', views.all_stocks, name='all_stocks'),
     path('analysis/', views.analysis, name='analysis'),
+    path('compare/', views.compare_stocks, name='compare'),
+    path('similar/', views.similar_stocks, name='similar_stocks'),
+    path('alerts/', views.screen_alerts, name='alerts'),
     path('stock/<str:symbol>/', views.stock_detail, name='stock_detail'),
+    path('api/facets/', views.facets_api, name='facets_api'),
+    path('api/rolling/', views.rolling_api, name='rolling_api'),
+    path('api/similar/', views.similar_stocks_api, name='similar_stocks_api'),
+    path('api/clusters/', views.clusters_api, name='clusters_api'),
+    path('api/alerts/', views.alerts_api, name='alerts_api'),
+    path('api/jobs/', views.enqueue_job, name='enqueue_job'),
+    path('api/jobs/<int:job_id>/', views.job_status, name='job_status'),
+    path('api/provider-status/', views.provider_status, name='provider_status'),
     path('api/summarize-news/<str:symbol>/', views.summarize_news, name='summarize_news'),
 ]
@@ -0,0 +1,117 @@
+"""Data versions driving HTTP caching of the read-only pages.
+
+A version is the time of the last write to the data behind a page: one per
+symbol (its Stock row and price bars) and one for the whole universe. They
+live in the shared state cache and are bumped by ``screener.signals`` when a
+Stock is saved or deleted, by ``prices.store_bars`` and by
+``sparklines.update``.
+
+``versioned_page`` answers conditional requests with 304 Not Modified
+(``ETag`` / ``Last-Modified``) and caches whole responses keyed by view,
+query string and version, so a repeat view costs one cache lookup. Pages
+also showing provider data (fundamentals, daily history) are re-rendered
+at least every ``SCREENER_PAGE_CACHE_SECONDS``, the lifetime of that data
+in the market-data cache; views showing shorter-lived data (intraday bars)
+pass a shorter lifetime.
+"""
+import functools
+import hashlib
+import time
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from . import cache
+
+GLOBAL = '*'
+
+
+def _key(scope):
+    return f'data-version:{scope}'
+
+
+def bump(*symbols):
+    """Record a change to some symbols' data (and so to the universe)"""
+    now = time.time()
+    cache.state.set_many({_key(scope): now for scope in {GLOBAL, *(s.upper() for s in symbols)}}, timeout=None)
+
+
+def get(symbol=None):
+    """Version of a symbol's data, or of the whole universe"""
+    key = _key(symbol.upper() if symbol else GLOBAL)
+    version = cache.state.get(key)
+    if version is None:
+        # Unknown (cache cleared): start a new version now
+        version = time.time()
+        if not cache.state.add(key, version, timeout=None):
+            version = cache.state.get(key, version)
+    return version
+
+
+def _pending_messages(request):
+    storage = getattr(request, '_messages', None)
+    return storage is not None and len(storage) > 0
+
+
+def _shown_messages(request):
+    storage = getattr(request, '_messages', None)
+    return storage is not None and storage.used
+
+
+def versioned_page(version_of, lifetime_of=None):
+    """Conditional GET and full-response caching for a read-only view
+
+    ``version_of(request, *args, **kwargs)`` returns the data version the
+    page depends on (``versions.get()`` or ``versions.get(symbol)``).
+    ``lifetime_of`` (same arguments) may shorten the re-render window for
+    a request by returning a number of seconds, or None to keep it.
+    Responses that show flash messages, are not 200 or are marked
+    ``no-store`` are never cached.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapped(request, *args, **kwargs):
+            lifetime = settings.SCREENER_PAGE_CACHE_SECONDS
+            if request.method not in ('GET', 'HEAD') or lifetime <= 0 or _pending_messages(request):
+                return view(request, *args, **kwargs)
+            if lifetime_of is not None:
+                lifetime = min(lifetime, lifetime_of(request, *args, **kwargs) or lifetime)
+
+            # Provider data expires even when no stored data changed
+            window_start = time.time() // lifetime * lifetime
+            version = max(version_of(request, *args, **kwargs), window_start)
+            params = '&'.join(sorted(f'{k}={v}' for k, values in request.GET.lists() for v in values))
+            digest = hashlib.sha1(f'{view.__name__}|{request.path}|{params}|{version!r}'.encode()).hexdigest()
+            # The ETag tells apart changes within the second Last-Modified resolves
+            etag = f'"{digest[:20]}"'
+            last_modified = int(version)
+
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                cached = cache.get('pages', digest)
+                if cached is not None:
+                    content, content_type = cached
+                    response = HttpResponse(content, content_type=content_type)
+                else:
+                    response = view(request, *args, **kwargs)
+                    if (response.status_code != 200 or response.streaming or _shown_messages(request)
+                            or 'no-store' in response.get('Cache-Control', '')):
+                        return response
+                    cache.set('pages', digest, (response.content, response['Content-Type']), timeout=lifetime)
+
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+            patch_cache_control(response, no_cache=True)
+            return response
+        return wrapped
+    return decorator
+
+
+def global_version(request, *args, **kwargs):
+    return get()
+
+
+def symbol_version(request, symbol, *args, **kwargs):
+    return get(symbol)
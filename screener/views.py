@@ -1,14 +1,42 @@
-from django.shortcuts import render
+from django.shortcuts import redirect, render
 from django.contrib import messages
+from django.db.models import Count
 from django.http import JsonResponse
 from django.conf import settings
-from django.views.decorators.http import require_GET
-from .models import Stock
-import yfinance as yf
+from django.utils.cache import add_never_cache_headers
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.http import require_GET, require_POST
+from .models import Alert, AnalysisJob, ScreenRule, Stock
+from . import alerts, analytics, cache, comparison, compute, jobs, market_data, queries, rolling, screening, similarity, sparklines
+from . import versions
+from .db import retry_on_lock
+from . import prices as price_store
+from .facets import facet_counts
+from .provider import stats as provider_stats
+from .rules import NUMERIC_FEATURES, TEXT_FEATURES, RuleError, compile_rule
+from .screens import apply_criteria, criteria_expression, parse_criteria
 from datetime import datetime, timezone
-import numpy as np
+import hashlib
 import json
 
+# Periods offered on the analysis page for each bar interval
+PERIOD_CHOICES = {
+    '1m': [('1d', '1 Jour'), ('5d', '5 Jours')],
+    '5m': [('1d', '1 Jour'), ('5d', '5 Jours'), ('1mo', '1 Mois')],
+    '15m': [('1d', '1 Jour'), ('5d', '5 Jours'), ('1mo', '1 Mois')],
+    '1h': [('5d', '5 Jours'), ('1mo', '1 Mois'), ('3mo', '3 Mois'), ('6mo', '6 Mois'), ('1y', '1 An')],
+    '1d': [('1mo', '1 Mois'), ('3mo', '3 Mois'), ('6mo', '6 Mois'), ('1y', '1 An'), ('2y', '2 Ans'), ('5y', '5 Ans')],
+}
+DEFAULT_PERIODS = {'1m': '1d', '5m': '5d', '15m': '5d', '1h': '1mo', '1d': '1y'}
+INTERVAL_CHOICES = [('1m', '1 min'), ('5m', '5 min'), ('15m', '15 min'), ('1h', '1 heure'), ('1d', 'Journalier')]
+# Rolling windows offered on the analysis page, in bars
+ROLLING_WINDOWS = [(21, '21 barres'), (63, '63 barres'), (126, '126 barres'), (252, '252 barres')]
+ROLLING_MAX_SYMBOLS = 50
+# Result sizes offered by the similarity search
+SIMILARITY_K_CHOICES = [5, 10, 20, 50]
+# Latest alerts listed on the alerts page and returned by the API
+ALERTS_LIMIT = 100
+
 # Create your views here.
 
 def home(request):
@@ -20,47 +48,51 @@ def home(request):
     
     if request.method == 'POST':
         # Get filter criteria from form
-        min_price = request.POST.get('min_price')
-        max_price = request.POST.get('max_price')
-        min_market_cap = request.POST.get('min_market_cap')
-        max_pe = request.POST.get('max_pe')
-        sector = request.POST.get('sector')
-        
-        # Build query
-        stocks = Stock.objects.all()
-        
-        if min_price:
-            try:
-                stocks = stocks.filter(current_price__gte=float(min_price))
-            except ValueError:
-                messages.error(request, 'Invalid minimum price value')
+        criteria, errors = parse_criteria(request.POST)
+        for error in errors:
+            messages.error(request, error)
         
-        if max_price:
-            try:
-                stocks = stocks.filter(current_price__lte=float(max_price))
-            except ValueError:
-                messages.error(request, 'Invalid maximum price value')
-        
-        if min_market_cap:
-            try:
-                stocks = stocks.filter(market_cap__gte=float(min_market_cap))
-            except ValueError:
-                messages.error(request, 'Invalid minimum market cap value')
-        
-        if max_pe:
-            try:
-                stocks = stocks.filter(pe_ratio__lte=float(max_pe))
-            except ValueError:
-                messages.error(request, 'Invalid maximum P/E ratio value')
-        
-        if sector and sector != 'all':
-            stocks = stocks.filter(sector__icontains=sector)
+        if screening.enabled():
+            # Vectorized screen over the in-memory index, no DB round trip
+            index = screening.get_index()
+            mask = index.mask(criteria)
+            stocks = sparklines.attach(index.rows(mask))
+            context['facets'] = index.facet_counts(mask)
+        else:
+            stocks = apply_criteria(Stock.objects.all(), criteria)
+            context['facets'] = facet_counts(stocks)
+            stocks = stocks.select_related('sparkline')
         
         context['stocks'] = stocks
         context['filter_applied'] = True
+        context['screen_expression'] = criteria_expression(criteria)
+    elif screening.enabled():
+        context['facets'] = screening.get_index().facet_counts()
+    else:
+        context['facets'] = facet_counts()
     
     return render(request, 'screener/home.html', context)
 
+@require_GET
+def facets_api(request):
+    """API endpoint returning facet counts for the screener criteria in the query string"""
+    criteria, errors = parse_criteria(request.GET)
+    if errors:
+        return JsonResponse({'success': False, 'error': errors[0]}, status=400)
+    
+    if screening.enabled():
+        index = screening.get_index()
+        counts = index.facet_counts(index.mask(criteria))
+    else:
+        counts = facet_counts(apply_criteria(Stock.objects.all(), criteria) if criteria else None)
+    
+    return JsonResponse({
+        'success': True,
+        'facets': {facet: [{'value': v, 'count': n} for v, n in values]
+                   for facet, values in counts.items()},
+    })
+
+@versions.versioned_page(versions.symbol_version)
 def stock_detail(request, symbol):
     """View for detailed stock information"""
     try:
@@ -71,11 +103,10 @@ def stock_detail(request, symbol):
         
         # Try to fetch live data from Yahoo Finance
         try:
-            ticker = yf.Ticker(symbol)
-            info = ticker.info
+            info = market_data.get_info(symbol)
             
             # Get historical data for chart
-            hist = ticker.history(period="1mo")
+            hist = market_data.get_history(symbol, period="1mo")
         except Exception as e:
             # If Yahoo Finance API fails, just show database data
             messages.warning(request, 'Unable to fetch live data. Showing stored data.')
@@ -101,9 +132,8 @@ def search_stock(request):
             return render(request, 'screener/search.html')
         
         try:
-            # Fetch stock data from Yahoo Finance
-            ticker = yf.Ticker(symbol)
-            info = ticker.info
+            # Fetch fresh stock data from Yahoo Finance
+            info = market_data.get_info(symbol, fresh=True)
             
             # Check if valid stock
             if 'symbol' not in info or info.get('regularMarketPrice') is None:
@@ -111,20 +141,9 @@ def search_stock(request):
                 return render(request, 'screener/search.html')
             
             # Create or update stock in database
-            stock, created = Stock.objects.update_or_create(
+            stock, created = retry_on_lock(Stock.objects.update_or_create)(
                 symbol=symbol,
-                defaults={
-                    'name': info.get('longName', symbol),
-                    'sector': info.get('sector', ''),
-                    'industry': info.get('industry', ''),
-                    'market_cap': info.get('marketCap'),
-                    'current_price': info.get('regularMarketPrice') or info.get('currentPrice'),
-                    'pe_ratio': info.get('trailingPE'),
-                    'dividend_yield': info.get('dividendYield'),
-                    'fifty_two_week_high': info.get('fiftyTwoWeekHigh'),
-                    'fifty_two_week_low': info.get('fiftyTwoWeekLow'),
-                    'volume': info.get('volume'),
-                }
+                defaults=market_data.stock_fields(symbol, info),
             )
             
             if created:
@@ -140,9 +159,10 @@ def search_stock(request):
     
     return render(request, 'screener/search.html')
 
+@versions.versioned_page(versions.global_version)
 def all_stocks(request):
     """View to display all stocks in database"""
-    stocks = Stock.objects.all()
+    stocks = Stock.objects.select_related('sparkline')
     context = {
         'stocks': stocks,
         'title': 'All Stocks',
@@ -150,9 +170,28 @@ def all_stocks(request):
     return render(request, 'screener/all_stocks.html', context)
 
 
+def _period_and_interval(request):
+    """Bar interval and period requested, falling back to daily bars and the interval's default period"""
+    interval = request.GET.get('interval', '1d')
+    if interval not in PERIOD_CHOICES:
+        interval = '1d'
+    period = request.GET.get('period', '')
+    if period not in dict(PERIOD_CHOICES[interval]):
+        period = DEFAULT_PERIODS[interval]
+    return period, interval
+
+
+def _bars_lifetime(request, *args, **kwargs):
+    """Intraday bars expire from the market-data cache within a minute: so do pages showing them"""
+    period, interval = _period_and_interval(request)
+    return market_data.INTRADAY_HISTORY_TIMEOUT if price_store.is_intraday(interval) else None
+
+
+@versions.versioned_page(versions.global_version, _bars_lifetime)
 def analysis(request):
     """Data analysis view with performance, correlation, and risk metrics"""
-    all_stocks = Stock.objects.all()
+    # Symbols and names come from the cached universe: no per-stock queries
+    all_stocks = queries.universe()
     symbol = request.GET.get('symbol', '')
     
     context = {
@@ -162,54 +201,43 @@ def analysis(request):
     
     if symbol:
         try:
-            stock = Stock.objects.get(symbol=symbol.upper())
+            stock = queries.find_stock(symbol)
+            if stock is None:
+                raise Stock.DoesNotExist
             context['stock'] = stock
             
             # Fetch historical data
-            period = request.GET.get('period', '1y')
-            ticker = yf.Ticker(symbol)
-            hist = ticker.history(period=period)
+            period, interval = _period_and_interval(request)
+            bars_per_year = price_store.periods_per_year(interval)
+            hist = price_store.get_history(symbol, period, interval)
             
             if hist is not None and not hist.empty:
                 # Calculate price data for charts
-                dates = [d.strftime('%Y-%m-%d') for d in hist.index]
+                date_format = '%Y-%m-%d %H:%M' if price_store.is_intraday(interval) else '%Y-%m-%d'
+                dates = [d.strftime(date_format) for d in hist.index]
                 prices = hist['Close'].tolist()
                 
                 # Calculate returns
                 returns = hist['Close'].pct_change().dropna()
                 
-                # Calculate drawdown
-                cumulative = (1 + returns).cumprod()
-                running_max = cumulative.cummax()
-                drawdown = ((cumulative - running_max) / running_max * 100).tolist()
-                
-                max_drawdown = min(drawdown) if drawdown else 0
-                current_drawdown = drawdown[-1] if drawdown else 0
-                
-                # Performance metrics
-                total_return = ((hist['Close'].iloc[-1] / hist['Close'].iloc[0]) - 1) * 100
-                trading_days = len(returns)
-                annualized_return = ((1 + total_return/100) ** (252/trading_days) - 1) * 100 if trading_days > 0 else 0
-                
-                # Risk metrics
-                volatility = returns.std() * np.sqrt(252) * 100
-                
-                # Sharpe Ratio (assuming risk-free rate of 4%)
-                risk_free_rate = 0.04
-                excess_return = annualized_return/100 - risk_free_rate
-                sharpe_ratio = excess_return / (volatility/100) if volatility > 0 else 0
-                
-                # Sortino Ratio
-                negative_returns = returns[returns < 0]
-                downside_std = negative_returns.std() * np.sqrt(252)
-                sortino_ratio = excess_return / downside_std if downside_std > 0 else 0
-                
-                # Value at Risk (95%)
-                var_95 = np.percentile(returns, 5) * 100
+                # Performance, risk and technical metrics run on the compute executor
+                metrics = compute.run(
+                    analytics.analyze_prices, hist['Close'].to_numpy(dtype=float), args=(bars_per_year,)
+                )
+                drawdown = metrics['drawdown']
+                max_drawdown = metrics['max_drawdown']
+                current_drawdown = metrics['current_drawdown']
+                total_return = metrics['total_return']
+                annualized_return = metrics['annualized_return']
+                volatility = metrics['volatility']
+                sharpe_ratio = metrics['sharpe_ratio']
+                sortino_ratio = metrics['sortino_ratio']
+                var_95 = metrics['var_95']
+                calmar_ratio = metrics['calmar_ratio']
+                risk_profile = metrics['risk']
                 
                 # Benchmark data (S&P 500)
-                benchmark_ticker = yf.Ticker("^GSPC")
-                benchmark_hist = benchmark_ticker.history(period=period)
+                benchmark_hist = _optional_history("^GSPC", period, interval)
                 
                 benchmark_return = 0
                 benchmark_normalized = []
@@ -243,8 +271,7 @@ def analysis(request):
                     beta = None
                 
                 # NASDAQ correlation
-                nasdaq_ticker = yf.Ticker("^IXIC")
-                nasdaq_hist = nasdaq_ticker.history(period=period)
+                nasdaq_hist = _optional_history("^IXIC", period, interval)
                 corr_nasdaq = None
                 
                 if nasdaq_hist is not None and not nasdaq_hist.empty:
@@ -256,7 +283,11 @@ def analysis(request):
                         corr_nasdaq = aligned_returns.corr(aligned_nasdaq)
                 
                 # Get additional info from Yahoo Finance
-                info = ticker.info
+                try:
+                    info = market_data.get_info(symbol)
+                except Exception:
+                    # Provider unavailable and nothing cached: show prices without fundamentals
+                    info = {}
                 pe_ratio = info.get('trailingPE')
                 pb_ratio = info.get('priceToBook')
                 ev_ebitda = info.get('enterpriseToEbitda')
@@ -283,30 +314,18 @@ def analysis(request):
                     profit_margin = profit_margin * 100
                 
                 # Technical Indicators
-                closes = hist['Close']
-                
-                # Moving Averages - full series for charts
-                sma_20_series = closes.rolling(window=20).mean()
-                sma_50_series = closes.rolling(window=50).mean()
-                sma_200_series = closes.rolling(window=200).mean()
-                
-                sma_20 = sma_20_series.iloc[-1] if len(closes) >= 20 else None
-                sma_50 = sma_50_series.iloc[-1] if len(closes) >= 50 else None
-                sma_200 = sma_200_series.iloc[-1] if len(closes) >= 200 else None
-                current_close = closes.iloc[-1]
+                sma_20 = metrics['sma_20']
+                sma_50 = metrics['sma_50']
+                sma_200 = metrics['sma_200']
+                current_close = metrics['current_close']
                 
                 # Price vs Moving Averages signals
                 above_sma_20 = current_close > sma_20 if sma_20 else None
                 above_sma_50 = current_close > sma_50 if sma_50 else None
                 above_sma_200 = current_close > sma_200 if sma_200 else None
                 
-                # RSI (14-day) - full series for chart
-                delta = closes.diff()
-                gain = delta.where(delta > 0, 0).rolling(window=14).mean()
-                loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-                rs = gain / loss
-                rsi = 100 - (100 / (1 + rs))
-                rsi_value = rsi.iloc[-1] if len(rsi) >= 14 else None
+                # RSI (14 periods)
+                rsi_value = metrics['rsi_value']
                 
                 # RSI interpretation
                 rsi_signal = None
@@ -318,49 +337,36 @@ def analysis(request):
                     else:
                         rsi_signal = 'Neutre'
                 
-                # MACD (12, 26, 9) - full series for chart
-                ema_12 = closes.ewm(span=12, adjust=False).mean()
-                ema_26 = closes.ewm(span=26, adjust=False).mean()
-                macd_line = ema_12 - ema_26
-                signal_line = macd_line.ewm(span=9, adjust=False).mean()
-                macd_histogram = macd_line - signal_line
-                
-                macd_value = macd_line.iloc[-1] if len(macd_line) >= 26 else None
-                macd_signal = signal_line.iloc[-1] if len(signal_line) >= 26 else None
-                macd_hist_value = macd_histogram.iloc[-1] if len(macd_histogram) >= 26 else None
+                # MACD (12, 26, 9)
+                macd_value = metrics['macd_value']
+                macd_signal = metrics['macd_signal']
+                macd_hist_value = metrics['macd_hist_value']
                 macd_crossover = 'Haussier' if macd_value and macd_signal and macd_value > macd_signal else 'Baissier' if macd_value and macd_signal else None
                 
                 # Prepare technical indicator chart data
-                # Replace NaN with None for JSON serialization
-                def clean_series(s):
-                    return [None if np.isnan(x) else round(x, 2) for x in s.tolist()]
-                
                 technical_chart_data = {
                     'dates': dates,
                     'prices': prices,
-                    'sma_20': clean_series(sma_20_series),
-                    'sma_50': clean_series(sma_50_series),
-                    'sma_200': clean_series(sma_200_series),
+                    'sma_20': metrics['sma_20_series'],
+                    'sma_50': metrics['sma_50_series'],
+                    'sma_200': metrics['sma_200_series'],
                 }
                 
                 rsi_chart_data = {
                     'dates': dates,
-                    'rsi': clean_series(rsi),
+                    'rsi': metrics['rsi_series'],
                 }
                 
                 macd_chart_data = {
                     'dates': dates,
-                    'macd_line': clean_series(macd_line),
-                    'signal_line': clean_series(signal_line),
-                    'histogram': clean_series(macd_histogram),
+                    'macd_line': metrics['macd_line_series'],
+                    'signal_line': metrics['signal_line_series'],
+                    'histogram': metrics['macd_histogram_series'],
                 }
                 
-                # Calmar Ratio (annualized return / max drawdown)
-                calmar_ratio = abs(annualized_return / max_drawdown) if max_drawdown != 0 else None
-                
                 # Earnings Calendar
                 try:
-                    calendar = ticker.calendar
+                    calendar = market_data.get_calendar(symbol)
                     if calendar is not None and not calendar.empty:
                         earnings_date = calendar.get('Earnings Date')
                         if earnings_date is not None:
@@ -378,41 +384,38 @@ def analysis(request):
                 # Correlation matrix with ALL stocks in database
                 correlation_matrix = {}
                 correlation_symbols = []
-                
-                all_db_stocks = Stock.objects.all()
-                if all_db_stocks.count() > 1:
-                    stock_returns_dict = {symbol.upper(): returns}
-                    correlation_symbols = [symbol.upper()]
-                    
-                    for other in all_db_stocks:
-                        if other.symbol.upper() != symbol.upper():
-                            try:
-                                other_ticker = yf.Ticker(other.symbol)
-                                other_hist = other_ticker.history(period=period)
-                                if other_hist is not None and not other_hist.empty:
-                                    other_returns = other_hist['Close'].pct_change().dropna()
-                                    stock_returns_dict[other.symbol] = other_returns
-                                    correlation_symbols.append(other.symbol)
-                            except:
-                                pass
-                    
-                    # Build correlation matrix
-                    for sym1 in correlation_symbols:
-                        correlation_matrix[sym1] = {}
-                        for sym2 in correlation_symbols:
-                            if sym1 in stock_returns_dict and sym2 in stock_returns_dict:
-                                common_idx = stock_returns_dict[sym1].index.intersection(stock_returns_dict[sym2].index)
-                                if len(common_idx) > 10:
-                                    corr = stock_returns_dict[sym1].loc[common_idx].corr(stock_returns_dict[sym2].loc[common_idx])
-                                    correlation_matrix[sym1][sym2] = round(corr, 2)
-                                else:
-                                    correlation_matrix[sym1][sym2] = None
-                            else:
-                                correlation_matrix[sym1][sym2] = None
+                correlation_job = None
+                
+                if len(all_stocks) > 1:
+                    other_symbols = [
+                        other['symbol'] for other in all_stocks
+                        if other['symbol'] != symbol.upper()
+                    ]
+                    params = {
+                        'symbol': symbol.upper(), 'period': period, 'interval': interval,
+                        'others': other_symbols,
+                    }
+                    key = 'correlation:{}:{}:{}:{}'.format(
+                        symbol.upper(), period, interval,
+                        hashlib.md5(','.join(other_symbols).encode()).hexdigest(),
+                    )
+                    result = jobs.cached_result(key) if settings.SCREENER_JOB_QUEUE else cache.get('analysis', key)
+                    if result is None:
+                        if settings.SCREENER_JOB_QUEUE:
+                            # Hand the download of the whole universe to run_workers
+                            correlation_job = jobs.enqueue('correlation', params, key=key)
+                        else:
+                            result = jobs.run_now('correlation', params, key=key)
+                    if result is not None:
+                        correlation_symbols, correlation_matrix = result['symbols'], result['matrix']
                 
                 # Prepare chart data
                 context.update({
                     'current_period': period,
+                    'current_interval': interval,
+                    'period_choices': PERIOD_CHOICES[interval],
+                    'interval_choices': INTERVAL_CHOICES,
+                    'rolling_windows': ROLLING_WINDOWS,
                     'price_data': json.dumps({
                         'dates': dates,
                         'prices': prices
@@ -447,6 +450,7 @@ def analysis(request):
                     'dividend_yield': dividend_yield,
                     'correlation_matrix': correlation_matrix,
                     'correlation_symbols': correlation_symbols,
+                    'correlation_job': correlation_job,
                     # New Fundamental Metrics
                     'roe': roe,
                     'roa': roa,
@@ -474,13 +478,14 @@ def analysis(request):
                     'macd_chart_data': json.dumps(macd_chart_data),
                     # Additional Risk Metric
                     'calmar_ratio': calmar_ratio,
+                    'risk': risk_profile,
                     # Earnings
                     'next_earnings': next_earnings,
                 })
                 
                 # Fetch news for the stock
                 try:
-                    news = ticker.news
+                    news = market_data.get_news(symbol)
                     news_list = []
                     if news:
                         for item in news[:10]:  # Limit to 10 news items
@@ -545,10 +550,360 @@ def analysis(request):
                 
         except Stock.DoesNotExist:
             messages.error(request, f'Action {symbol} non trouvée.')
+        except compute.ComputeTimeout:
+            messages.error(request, 'L\'analyse a pris trop de temps. Veuillez réessayer plus tard.')
         except Exception as e:
             messages.error(request, f'Erreur lors de l\'analyse: {str(e)}')
     
-    return render(request, 'screener/analysis.html', context)
+    response = render(request, 'screener/analysis.html', context)
+    if context.get('correlation_job'):
+        # Re-rendered with the result once the job is done
+        add_never_cache_headers(response)
+    return response
+
+
+@versions.versioned_page(versions.global_version, _bars_lifetime)
+def compare_stocks(request):
+    """Performance, risk and technical metrics of several stocks side by side"""
+    all_stocks = queries.universe()
+    requested = list(dict.fromkeys(
+        s.strip().upper() for value in request.GET.getlist('symbols') for s in value.split(',') if s.strip()
+    ))
+    period, interval = _period_and_interval(request)
+    benchmark = request.GET.get('benchmark', comparison.DEFAULT_BENCHMARK).upper()
+    if benchmark not in comparison.BENCHMARKS:
+        benchmark = comparison.DEFAULT_BENCHMARK
+
+    known = {stock['symbol'] for stock in all_stocks}
+    symbols = [symbol for symbol in requested if symbol in known]
+    unknown = [symbol for symbol in requested if symbol not in known]
+    context = {
+        'all_stocks': all_stocks,
+        'symbols': symbols,
+        'symbols_input': ', '.join(requested),
+        'current_period': period,
+        'current_interval': interval,
+        'period_choices': PERIOD_CHOICES[interval],
+        'interval_choices': INTERVAL_CHOICES,
+        'benchmark': benchmark,
+        'benchmark_choices': comparison.BENCHMARKS.items(),
+        'min_symbols': comparison.MIN_SYMBOLS,
+        'max_symbols': comparison.MAX_SYMBOLS,
+        'comparison': None,
+    }
+    if unknown:
+        messages.warning(request, f'Actions non trouvées : {", ".join(unknown)}.')
+
+    if requested and not comparison.MIN_SYMBOLS <= len(symbols) <= comparison.MAX_SYMBOLS:
+        messages.error(
+            request, f'Indiquez entre {comparison.MIN_SYMBOLS} et {comparison.MAX_SYMBOLS} actions à comparer.'
+        )
+    elif symbols:
+        key = 'comparison:{}:{}:{}:{}'.format(
+            benchmark, period, interval, hashlib.md5(','.join(symbols).encode()).hexdigest(),
+        )
+        try:
+            result = cache.get_or_set(
+                'analysis', key,
+                lambda: comparison.compare(symbols, period, interval, benchmark),
+                market_data.HISTORY_TIMEOUT,
+            )
+        except compute.ComputeTimeout:
+            messages.error(request, 'La comparaison a pris trop de temps. Veuillez réessayer plus tard.')
+        except Exception as e:
+            messages.error(request, f'Erreur lors de la comparaison: {str(e)}')
+        else:
+            if result['missing']:
+                messages.warning(request, f'Aucun historique pour : {", ".join(result["missing"])}.')
+            if result['rows']:
+                context['comparison'] = result
+                context['chart_data'] = json.dumps({
+                    'dates': result['dates'],
+                    'normalized': result['normalized'],
+                    'drawdown': result['drawdown'],
+                    'benchmark': {
+                        'label': result['benchmark']['name'],
+                        'values': result['benchmark']['normalized'],
+                    },
+                })
+
+    return render(request, 'screener/compare.html', context)
+
+
+def _similarity_k(request):
+    try:
+        return min(max(int(request.GET.get('k', 10)), 1), max(SIMILARITY_K_CHOICES))
+    except ValueError:
+        return 10
+
+
+def similar_stocks(request):
+    """Stocks most and least correlated with a symbol, and clusters of the universe"""
+    symbol = request.GET.get('symbol', '').strip().upper()
+    k = _similarity_k(request)
+    index = similarity.get_index()
+    
+    context = {
+        'title': 'Similarité',
+        'all_stocks': queries.universe(),
+        'selected_symbol': symbol,
+        'k': k,
+        'k_choices': SIMILARITY_K_CHOICES,
+        'index': index,
+        'clusters': index.clusters(),
+    }
+    if not index.built:
+        if settings.SCREENER_JOB_QUEUE:
+            messages.info(request, 'L\'index de similarité est en cours de construction, revenez dans quelques minutes.')
+        else:
+            messages.info(request, 'L\'index de similarité n\'est pas encore construit. Lancez `manage.py build_similarity`.')
+    elif symbol:
+        if symbol in index:
+            context['similar'] = index.similar(symbol, k)
+            context['cluster'] = index.cluster_of(symbol)
+        else:
+            messages.warning(
+                request,
+                f'{symbol} n\'a pas assez d\'historique de prix indexé. '
+                f'Lancez `manage.py refresh_prices` puis `manage.py build_similarity`.',
+            )
+    
+    return render(request, 'screener/similarity.html', context)
+
+
+@require_GET
+def similar_stocks_api(request):
+    """API endpoint returning the K most and least correlated stocks to a symbol"""
+    symbol = request.GET.get('symbol', '').strip().upper()
+    index = similarity.get_index()
+    if not index.built:
+        return JsonResponse({'success': False, 'error': 'Index de similarité pas encore construit.'}, status=503)
+    if symbol not in index:
+        return JsonResponse({'success': False, 'error': f'{symbol or "Symbole"} non indexé.'}, status=404)
+    
+    similar = index.similar(symbol, _similarity_k(request))
+    return JsonResponse({
+        'success': True,
+        'symbol': symbol,
+        'cluster': index.cluster_of(symbol),
+        'most': [{'symbol': s, 'correlation': c} for s, c in similar['most']],
+        'least': [{'symbol': s, 'correlation': c} for s, c in similar['least']],
+        'observations': index.observations,
+        'built_at': datetime.fromtimestamp(index.built_at, tz=timezone.utc).isoformat(),
+    })
+
+
+@require_GET
+def clusters_api(request):
+    """API endpoint returning the clusters of the universe by return correlation"""
+    index = similarity.get_index()
+    if not index.built:
+        return JsonResponse({'success': False, 'error': 'Index de similarité pas encore construit.'}, status=503)
+    return JsonResponse({
+        'success': True,
+        'clusters': [{'id': i, 'symbols': members} for i, members in enumerate(index.clusters())],
+        'observations': index.observations,
+        'built_at': datetime.fromtimestamp(index.built_at, tz=timezone.utc).isoformat(),
+    })
+
+
+def _optional_history(symbol, period, interval):
+    """History of a benchmark, or None if the provider is unavailable"""
+    try:
+        return price_store.get_history(symbol, period, interval)
+    except Exception:
+        return None
+
+
+@require_GET
+def rolling_api(request):
+    """API endpoint with rolling beta, correlation, volatility and Sharpe series against a benchmark"""
+    symbols = list(dict.fromkeys(
+        s.strip().upper() for s in request.GET.get('symbols', '').split(',') if s.strip()
+    ))
+    period, interval = _period_and_interval(request)
+    benchmark = request.GET.get('benchmark', rolling.DEFAULT_BENCHMARK).upper()
+    try:
+        window = int(request.GET.get('window', 63))
+        min_periods = int(request.GET.get('min_periods') or window)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Fenêtre invalide.'}, status=400)
+    
+    if not symbols or len(symbols) > ROLLING_MAX_SYMBOLS:
+        return JsonResponse({
+            'success': False,
+            'error': f'Indiquez entre 1 et {ROLLING_MAX_SYMBOLS} symboles.',
+        }, status=400)
+    if not 2 <= min_periods <= window <= 1000:
+        return JsonResponse({'success': False, 'error': 'Fenêtre invalide.'}, status=400)
+    
+    key = 'rolling:{}:{}:{}:{}:{}:{}'.format(
+        benchmark, period, interval, window, min_periods,
+        hashlib.md5(','.join(symbols).encode()).hexdigest(),
+    )
+    try:
+        data = cache.get_or_set(
+            'analysis', key,
+            lambda: rolling.rolling_series(symbols, window, period, interval, benchmark, min_periods),
+            market_data.HISTORY_TIMEOUT,
+        )
+    except compute.ComputeTimeout:
+        return JsonResponse({'success': False, 'error': 'Le calcul a pris trop de temps.'}, status=503)
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=502)
+    if data is None:
+        return JsonResponse({'success': False, 'error': f'Aucune donnée pour {benchmark}.'}, status=404)
+    
+    return JsonResponse({
+        'success': True,
+        'benchmark': benchmark,
+        'window': window,
+        'period': period,
+        'interval': interval,
+        **data,
+    })
+
+
+@require_GET
+def job_status(request, job_id):
+    """API endpoint polled by pages waiting on a background job"""
+    try:
+        job = AnalysisJob.objects.get(pk=job_id)
+    except AnalysisJob.DoesNotExist:
+        return JsonResponse({'success': False, 'error': 'Tâche introuvable.'}, status=404)
+    
+    data = {
+        'success': True,
+        'id': job.pk,
+        'kind': job.kind,
+        'status': job.status,
+        'progress': job.progress,
+        'message': job.message,
+        'finished': job.finished,
+    }
+    if job.status == AnalysisJob.DONE:
+        data['result'] = job.result
+    elif job.status == AnalysisJob.FAILED:
+        # The traceback stays in the admin; only its last line is shown
+        data['error'] = job.error.strip().splitlines()[-1] if job.error else ''
+    return JsonResponse(data)
+
+
+@require_POST
+def enqueue_job(request):
+    """API endpoint queueing a backtest or bulk import for run_workers"""
+    try:
+        payload = json.loads(request.body)
+        kind = payload['kind']
+        params = payload.get('params', {})
+        symbols = params['symbols']
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return JsonResponse({'success': False, 'error': 'Requête invalide.'}, status=400)
+    
+    if kind not in ('backtest', 'import'):
+        return JsonResponse({'success': False, 'error': f'Type de tâche inconnu: {kind}'}, status=400)
+    if not isinstance(symbols, list) or not symbols or not all(isinstance(s, str) for s in symbols):
+        return JsonResponse({'success': False, 'error': 'Liste de symboles invalide.'}, status=400)
+    
+    job = jobs.enqueue(kind, params)
+    return JsonResponse({'success': True, 'id': job.pk, 'status': job.status}, status=202)
+
+
+def screen_alerts(request):
+    """Saved screen rules and the alerts they raised"""
+    form = {'name': request.GET.get('name', ''), 'expression': request.GET.get('expression', '')}
+    
+    if request.method == 'POST':
+        action = request.POST.get('action')
+        if action == 'create':
+            form = {
+                'name': request.POST.get('name', '').strip(),
+                'expression': request.POST.get('expression', '').strip(),
+            }
+            try:
+                compile_rule(form['expression'])
+            except RuleError as e:
+                messages.error(request, f'Règle invalide : {e}.')
+            else:
+                rule = ScreenRule.objects.create(
+                    name=form['name'][:100] or form['expression'][:100],
+                    expression=form['expression'],
+                )
+                alerts.evaluate_rule(rule)
+                messages.success(
+                    request,
+                    f'Règle « {rule.name} » enregistrée : {len(rule.matches)} action(s) correspondent.',
+                )
+                return redirect('screener:alerts')
+        else:
+            rule = ScreenRule.objects.filter(pk=request.POST.get('rule') or None).first()
+            if rule is None:
+                messages.error(request, 'Règle introuvable.')
+            elif action == 'delete':
+                rule.delete()
+                messages.info(request, f'Règle « {rule.name} » supprimée.')
+            elif action == 'toggle':
+                rule.enabled = not rule.enabled
+                rule.save(update_fields=['enabled'])
+                if rule.enabled:
+                    # Matches are stale after a pause; start again from the current state
+                    alerts.evaluate_rule(rule)
+            return redirect('screener:alerts')
+    
+    recent = Alert.objects.select_related('rule')
+    selected_rule = request.GET.get('rule', '')
+    if selected_rule.isdigit():
+        recent = recent.filter(rule_id=int(selected_rule))
+    
+    context = {
+        'title': 'Alertes',
+        'rules': ScreenRule.objects.annotate(alert_count=Count('alerts')),
+        'alerts': recent[:ALERTS_LIMIT],
+        'selected_rule': int(selected_rule) if selected_rule.isdigit() else None,
+        'form': form,
+        'numeric_features': NUMERIC_FEATURES,
+        'text_features': TEXT_FEATURES,
+    }
+    return render(request, 'screener/alerts.html', context)
+
+
+@require_GET
+def alerts_api(request):
+    """API endpoint returning the latest alerts, optionally for one rule or since a time"""
+    recent = Alert.objects.select_related('rule')
+    if request.GET.get('rule'):
+        if not request.GET['rule'].isdigit():
+            return JsonResponse({'success': False, 'error': 'Règle invalide.'}, status=400)
+        recent = recent.filter(rule_id=int(request.GET['rule']))
+    if request.GET.get('since'):
+        since = parse_datetime(request.GET['since'])
+        if since is None:
+            return JsonResponse({'success': False, 'error': 'Date invalide (format ISO 8601).'}, status=400)
+        recent = recent.filter(triggered_at__gt=since)
+    
+    return JsonResponse({
+        'success': True,
+        'alerts': [
+            {
+                'id': alert.pk,
+                'rule': {'id': alert.rule_id, 'name': alert.rule.name, 'expression': alert.rule.expression},
+                'symbol': alert.symbol,
+                'values': alert.values,
+                'triggered_at': alert.triggered_at.isoformat(),
+            }
+            for alert in recent[:ALERTS_LIMIT]
+        ],
+    })
+
+
+@require_GET
+def provider_status(request):
+    """API endpoint exposing Yahoo Finance call metrics and circuit breaker states"""
+    return JsonResponse({
+        'rate': settings.SCREENER_PROVIDER_RATE,
+        'burst': settings.SCREENER_PROVIDER_BURST,
+        'endpoints': provider_stats(),
+    })
 
 
 @require_GET
@@ -565,8 +920,7 @@ def summarize_news(request, symbol):
     
     try:
         # Fetch news from yfinance
-        ticker = yf.Ticker(symbol)
-        news = ticker.news
+        news = market_data.get_news(symbol)
         
         if not news:
             return JsonResponse({
@@ -588,11 +942,7 @@ def summarize_news(request, symbol):
         combined_news = "\n\n".join(news_texts)
         
         # Get stock info
-        try:
-            stock = Stock.objects.get(symbol=symbol.upper())
-            stock_name = stock.name
-        except Stock.DoesNotExist:
-            stock_name = symbol
+        stock_name = queries.stock_name(symbol)
         
         # Call Claude API
         import anthropic
@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 
 from pathlib import Path
 import os
+
+import django
 from dotenv import load_dotenv
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -35,6 +37,34 @@ ALLOWED_HOSTS = os.environ.get('DJANGO_ALLOWED_HOSTS', 'localhost,127.0.0.1').sp
 ANTHROPIC_API_KEY = os.environ.get('ANTHROPIC_API_KEY', '')
 
 
+# In-memory columnar screening index for the home screener
+SCREENER_COLUMNAR_INDEX = os.environ.get('SCREENER_COLUMNAR_INDEX', 'False') == 'True'
+SCREENER_INDEX_REFRESH_SECONDS = float(os.environ.get('SCREENER_INDEX_REFRESH_SECONDS', '5'))
+
+# Process pool for heavy analytics (0 runs them in the request thread)
+SCREENER_COMPUTE_WORKERS = int(os.environ.get('SCREENER_COMPUTE_WORKERS', '0'))
+SCREENER_COMPUTE_TIMEOUT = float(os.environ.get('SCREENER_COMPUTE_TIMEOUT', '30'))
+
+# Yahoo Finance rate limit (requests per second, burst size) shared by the
+# threads of a process, or by every process on the host when
+# SCREENER_PROVIDER_RATE_FILE names a lock file. A call waits at most
+# SCREENER_PROVIDER_MAX_WAIT seconds for a token.
+SCREENER_PROVIDER_RATE = float(os.environ.get('SCREENER_PROVIDER_RATE', '2'))
+SCREENER_PROVIDER_BURST = int(os.environ.get('SCREENER_PROVIDER_BURST', '10'))
+SCREENER_PROVIDER_MAX_WAIT = float(os.environ.get('SCREENER_PROVIDER_MAX_WAIT', '1'))
+SCREENER_PROVIDER_RATE_FILE = os.environ.get('SCREENER_PROVIDER_RATE_FILE', '')
+# Consecutive failures that open an endpoint's circuit breaker, and how long
+# it stays open before a trial call
+SCREENER_BREAKER_THRESHOLD = int(os.environ.get('SCREENER_BREAKER_THRESHOLD', '5'))
+SCREENER_BREAKER_RESET_SECONDS = float(os.environ.get('SCREENER_BREAKER_RESET_SECONDS', '60'))
+# How long the last good response is kept to serve while the provider fails
+SCREENER_PROVIDER_STALE_TIMEOUT = int(os.environ.get('SCREENER_PROVIDER_STALE_TIMEOUT', str(24 * 60 * 60)))
+
+# Queue slow analyses (correlation matrix) for `manage.py run_workers` instead
+# of computing them in the request
+SCREENER_JOB_QUEUE = os.environ.get('SCREENER_JOB_QUEUE', 'False') == 'True'
+
+
 # Application definition
 
 INSTALLED_APPS = [
@@ -54,6 +84,7 @@ MIDDLEWARE = [
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'screener.db.ReadConnectionMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
@@ -81,13 +112,93 @@ WSGI_APPLICATION = 'stockscreener.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# SQLite production profile (see screener.db): WAL and tuned pragmas on
+# every connection, a busy timeout in seconds before "database is locked",
+# write transactions started with BEGIN IMMEDIATE, and a read-only 'replica'
+# connection to the same file that GET requests read from.
+SCREENER_DB_PATH = Path(os.environ.get('SCREENER_DB_PATH', BASE_DIR / 'db.sqlite3')).resolve()
+SCREENER_SQLITE_TUNING = os.environ.get('SCREENER_SQLITE_TUNING', 'True') == 'True'
+SCREENER_SQLITE_TIMEOUT = float(os.environ.get('SCREENER_SQLITE_TIMEOUT', '20'))
+SCREENER_READ_REPLICA = os.environ.get('SCREENER_READ_REPLICA', 'True') == 'True'
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': SCREENER_DB_PATH,
+        'OPTIONS': {'timeout': SCREENER_SQLITE_TIMEOUT},
+    }
+}
+
+if SCREENER_SQLITE_TUNING:
+    if django.VERSION >= (5, 1):
+        DATABASES['default']['OPTIONS']['transaction_mode'] = 'IMMEDIATE'
+    else:
+        DATABASES['default']['ENGINE'] = 'screener.sqlite_backend'
+
+if SCREENER_READ_REPLICA:
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': f'{SCREENER_DB_PATH.as_uri()}?mode=ro',
+        'OPTIONS': {'timeout': SCREENER_SQLITE_TIMEOUT, 'uri': True},
+        'TEST': {'MIRROR': 'default'},
     }
+
+DATABASE_ROUTERS = ['screener.db.ReadReplicaRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Shared across worker processes so market data is fetched once. Set
+# SCREENER_CACHE_BACKEND to 'file' (default), 'db' (run `createcachetable`),
+# 'redis' (uses REDIS_URL, requires the redis package) or 'locmem'.
+
+SCREENER_CACHE_BACKEND = os.environ.get('SCREENER_CACHE_BACKEND', 'file')
+
+if SCREENER_CACHE_BACKEND == 'redis':
+    _default_cache = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/0'),
+    }
+elif SCREENER_CACHE_BACKEND == 'db':
+    _default_cache = {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'screener_cache',
+    }
+elif SCREENER_CACHE_BACKEND == 'locmem':
+    _default_cache = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+else:
+    _default_cache = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('SCREENER_CACHE_DIR', str(BASE_DIR / '.cache')),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+
+# Small shared state (data versions, circuit breakers, hit/miss counters) gets
+# its own alias on the same backend, so culling market data never evicts it.
+_no_culling = {'OPTIONS': {'MAX_ENTRIES': 10 ** 9}}
+if SCREENER_CACHE_BACKEND == 'redis':
+    _state_cache = {**_default_cache, 'KEY_PREFIX': 'state'}
+elif SCREENER_CACHE_BACKEND == 'db':
+    _state_cache = {**_default_cache, 'LOCATION': 'screener_state', **_no_culling}
+elif SCREENER_CACHE_BACKEND == 'locmem':
+    _state_cache = {**_default_cache, 'LOCATION': 'state', **_no_culling}
+else:
+    _state_cache = {**_default_cache, 'LOCATION': str(Path(_default_cache['LOCATION']) / 'state'), **_no_culling}
+
+CACHES = {
+    'default': {**_default_cache, 'TIMEOUT': 900},
+    'state': {**_state_cache, 'TIMEOUT': None},
 }
 
+# Lifetime of cached full responses of the read-only pages (0 disables).
+# They are also dropped as soon as the stock or price data behind them changes.
+SCREENER_PAGE_CACHE_SECONDS = int(os.environ.get('SCREENER_PAGE_CACHE_SECONDS', '900'))
+
+# Market data cache entries larger than this many bytes are compressed
+SCREENER_CACHE_COMPRESS_MIN_BYTES = int(os.environ.get('SCREENER_CACHE_COMPRESS_MIN_BYTES', '1024'))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators